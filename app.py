@@ -1,25 +1,40 @@
-from flask import Flask, render_template, request, redirect, url_for, flash
-from flask_sqlalchemy import SQLAlchemy
-from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
+from flask import Blueprint, Flask, current_app, render_template, request, redirect, url_for, flash, abort, jsonify
+from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 import os
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import secrets
 from config import config
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from functools import wraps
+from functools import partial, wraps
+from outbox import create_outbox
+from email_templates import AlertEmailRenderer
+from metrics import ALERT_BACKLOG, CONTENT_TYPE, REGISTRY, token_matches
+from models import db, User, JobAlert, EmailDelivery, count_due_alerts
 
 load_dotenv()
 
-app = Flask(__name__)
-app.config.from_object(config['production'])
-db = SQLAlchemy(app)
+web = Blueprint('web', __name__)
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'web.login'
+
+def create_app(config_name='production'):
+    """Maak de web app: configuratie, database, login, routes, mail outbox en metrics"""
+    app = Flask(__name__)
+    app.config.from_object(config[config_name])
+    db.init_app(app)
+    login_manager.init_app(app)
+    app.register_blueprint(web)
+    
+    # Gedeelde SMTP outbox, zodat verbindingen tussen requests hergebruikt worden
+    app.extensions['mail_outbox'] = create_outbox(app.config, pool_size=1)
+    
+    # Prometheus metrics; uitgeschakeld kost de instrumentatie vrijwel niets
+    REGISTRY.enable(app.config['METRICS_ENABLED'])
+    ALERT_BACKLOG.set_function(partial(due_alert_backlog, app))
+    return app
 
 # Admin check decorator
 def admin_required(f):
@@ -27,39 +42,27 @@ def admin_required(f):
     def decorated_function(*args, **kwargs):
         if not current_user.is_authenticated or current_user.email != os.getenv('ADMIN_EMAIL'):
             flash('U heeft geen toegang tot deze pagina.')
-            return redirect(url_for('index'))
+            return redirect(url_for('web.index'))
         return f(*args, **kwargs)
     return decorated_function
 
-# Database modellen
-class User(UserMixin, db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
-    reset_token = db.Column(db.String(100), unique=True)
-    reset_token_expiry = db.Column(db.DateTime)
-    job_alerts = db.relationship('JobAlert', backref='user', lazy=True)
-
-class JobAlert(db.Model):
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    search_query = db.Column(db.String(200), nullable=False)
-    location = db.Column(db.String(100))
-    frequency = db.Column(db.String(20), default='daily')
-    last_check = db.Column(db.DateTime, default=datetime.utcnow)
-    is_active = db.Column(db.Boolean, default=True)
+def due_alert_backlog(app):
+    """Aantal actieve alerts dat aan de beurt is maar nog niet gecontroleerd"""
+    with app.app_context():
+        return count_due_alerts(datetime.utcnow())
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    # session.get gebruikt de identity map, zodat de gebruiker binnen een request maar één keer geladen wordt
+    return db.session.get(User, int(user_id))
 
-@app.route('/')
+@web.route('/')
 def index():
     if current_user.is_authenticated:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('web.dashboard'))
     return render_template('index.html')
 
-@app.route('/register', methods=['GET', 'POST'])
+@web.route('/register', methods=['GET', 'POST'])
 def register():
     if request.method == 'POST':
         email = request.form.get('email')
@@ -67,16 +70,16 @@ def register():
         
         if User.query.filter_by(email=email).first():
             flash('Email is al geregistreerd')
-            return redirect(url_for('register'))
+            return redirect(url_for('web.register'))
             
         user = User(email=email, password_hash=generate_password_hash(password))
         db.session.add(user)
         db.session.commit()
         
-        return redirect(url_for('login'))
+        return redirect(url_for('web.login'))
     return render_template('register.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@web.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         email = request.form.get('email')
@@ -85,17 +88,18 @@ def login():
         
         if user and check_password_hash(user.password_hash, password):
             login_user(user)
-            return redirect(url_for('dashboard'))
+            return redirect(url_for('web.dashboard'))
         flash('Ongeldige email of wachtwoord')
     return render_template('login.html')
 
-@app.route('/dashboard')
+@web.route('/dashboard')
 @login_required
 def dashboard():
-    alerts = JobAlert.query.filter_by(user_id=current_user.id).all()
+    # De alerts via de relatie van de al geladen gebruiker; alert.user komt daardoor uit de identity map
+    alerts = current_user.job_alerts
     return render_template('dashboard.html', alerts=alerts)
 
-@app.route('/alert/new', methods=['GET', 'POST'])
+@web.route('/alert/new', methods=['GET', 'POST'])
 @login_required
 def new_alert():
     if request.method == 'POST':
@@ -108,26 +112,26 @@ def new_alert():
         db.session.add(alert)
         db.session.commit()
         flash('Nieuwe job alert aangemaakt!')
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('web.dashboard'))
     return render_template('new_alert.html')
 
-@app.route('/alert/<int:alert_id>/toggle')
+@web.route('/alert/<int:alert_id>/toggle')
 @login_required
 def toggle_alert(alert_id):
     alert = JobAlert.query.get_or_404(alert_id)
     if alert.user_id != current_user.id:
-        return redirect(url_for('dashboard'))
+        return redirect(url_for('web.dashboard'))
     alert.is_active = not alert.is_active
     db.session.commit()
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('web.dashboard'))
 
-@app.route('/logout')
+@web.route('/logout')
 @login_required
 def logout():
     logout_user()
-    return redirect(url_for('index'))
+    return redirect(url_for('web.index'))
 
-@app.route('/forgot_password', methods=['GET', 'POST'])
+@web.route('/forgot_password', methods=['GET', 'POST'])
 def forgot_password():
     if request.method == 'POST':
         email = request.form.get('email')
@@ -141,17 +145,17 @@ def forgot_password():
             db.session.commit()
             
             # Stuur e-mail met reset link
-            reset_url = url_for('reset_password', token=token, _external=True)
+            reset_url = url_for('web.reset_password', token=token, _external=True)
             send_reset_email(user.email, reset_url)
             
             flash('Er is een e-mail verstuurd met instructies om uw wachtwoord te resetten.')
-            return redirect(url_for('login'))
+            return redirect(url_for('web.login'))
         else:
             flash('Geen account gevonden met dit e-mailadres.')
     
     return render_template('forgot_password.html')
 
-@app.route('/reset_password/<token>', methods=['GET', 'POST'])
+@web.route('/reset_password/<token>', methods=['GET', 'POST'])
 def reset_password(token):
     if request.method == 'POST':
         password = request.form.get('password')
@@ -164,16 +168,40 @@ def reset_password(token):
             db.session.commit()
             
             flash('Uw wachtwoord is succesvol gewijzigd. U kunt nu inloggen.')
-            return redirect(url_for('login'))
+            return redirect(url_for('web.login'))
         else:
             flash('De reset link is ongeldig of verlopen.')
-            return redirect(url_for('forgot_password'))
+            return redirect(url_for('web.forgot_password'))
     
     return render_template('reset_password.html')
 
+def record_delivery(app, delivery_id, future):
+    """Leg de uitkomst van een aflevering vast; draait in de outbox thread zodra de Future klaar is"""
+    error = future.exception()
+    with app.app_context():
+        delivery = db.session.get(EmailDelivery, delivery_id)
+        delivery.status = 'failed' if error else 'sent'
+        delivery.error = str(error) if error else None
+        delivery.finished_at = datetime.utcnow()
+        if error:
+            app.logger.error("Fout bij het verzenden van %s e-mail %s: %s", delivery.kind, delivery_id, error)
+        db.session.commit()
+
+def queue_email(msg, kind):
+    """Zet een e-mail in de outbox zonder op de aflevering te wachten
+    
+    De status wordt bijgehouden in EmailDelivery; de request wacht alleen op
+    het aanmaken van die rij, niet op de SMTP server. Geeft de delivery terug.
+    """
+    delivery = EmailDelivery(kind=kind, recipient=msg['To'])
+    db.session.add(delivery)
+    db.session.commit()
+    outbox = current_app.extensions['mail_outbox']
+    outbox.put(msg).add_done_callback(partial(record_delivery, current_app._get_current_object(), delivery.id))
+    return delivery
+
 def send_reset_email(email, reset_url):
-    sender_email = os.getenv('EMAIL_USER')
-    password = os.getenv('EMAIL_PASSWORD')
+    sender_email = current_app.config['MAIL_DEFAULT_SENDER']
     
     msg = MIMEMultipart()
     msg['From'] = sender_email
@@ -195,17 +223,10 @@ Kayak Job Alerts Team
     
     msg.attach(MIMEText(body, 'plain'))
     
-    try:
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(sender_email, password)
-        server.send_message(msg)
-        server.quit()
-        print(f"Reset e-mail succesvol verzonden naar {email}")
-    except Exception as e:
-        print(f"Fout bij het verzenden van de reset e-mail: {str(e)}")
+    delivery = queue_email(msg, 'password_reset')
+    current_app.logger.info("Reset e-mail %s in de wachtrij gezet voor %s", delivery.id, email)
 
-@app.route('/test/email')
+@web.route('/test/email')
 @login_required
 @admin_required
 def test_email():
@@ -217,14 +238,49 @@ def test_email():
             'location': 'Test Locatie'
         }]
         
-        send_job_alert(current_user.email, 'TEST ALERT', test_jobs)
-        flash('Test e-mail succesvol verzonden!')
+        msg = MIMEMultipart('alternative')
+        msg['From'] = current_app.config['MAIL_DEFAULT_SENDER']
+        msg['To'] = current_user.email
+        msg['Subject'] = 'TEST ALERT'
+        text_content, html_content = AlertEmailRenderer(current_app.jinja_env).render(test_jobs)
+        msg.attach(MIMEText(text_content, 'plain'))
+        msg.attach(MIMEText(html_content, 'html'))
+        delivery = queue_email(msg, 'test')
+        flash(f'Test e-mail in de wachtrij gezet (aflevering {delivery.id})')
     except Exception as e:
         flash(f'Fout bij versturen test e-mail: {str(e)}')
     
-    return redirect(url_for('dashboard'))
+    return redirect(url_for('web.dashboard'))
+
+@web.route('/admin/email_deliveries')
+@login_required
+@admin_required
+def email_deliveries():
+    """Afleverstatus van e-mails uit de web app: aantallen per status en de laatste mislukte"""
+    counts = dict(db.session.query(EmailDelivery.status, db.func.count()).group_by(EmailDelivery.status))
+    failures = EmailDelivery.query.filter_by(status='failed').order_by(EmailDelivery.id.desc()).limit(20)
+    return jsonify({
+        'counts': counts,
+        'recent_failures': [
+            {'id': d.id, 'kind': d.kind, 'recipient': d.recipient, 'error': d.error,
+             'created_at': d.created_at.isoformat()}
+            for d in failures
+        ],
+    })
+
+@web.route('/metrics')
+def metrics():
+    if not REGISTRY.enabled:
+        abort(404)
+    # Backlog, quota en aflevering zijn intern: alleen voor de scraper (METRICS_TOKEN) of de beheerder
+    is_admin = current_user.is_authenticated and current_user.email == os.getenv('ADMIN_EMAIL')
+    if not is_admin and not token_matches(request.headers.get('Authorization'), current_app.config['METRICS_TOKEN']):
+        abort(401)
+    return REGISTRY.render(), 200, {'Content-Type': CONTENT_TYPE}
+
 
 if __name__ == '__main__':
+    app = create_app()
     with app.app_context():
         db.create_all()
     app.run(debug=True) 
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""Benchmark voor het due-filter en de commits van de worker
+
+Gebruik:
+    python benchmarks/bench_due_query.py --alerts 20000 --due 0.05
+
+Vergelijkt de oude aanpak (alle actieve alerts laden, in Python op due-tijd
+filteren en per alert committen) met check_jobs (due-filter in SQL op de
+(is_active, next_check_at) index en commits per batch). Rapporteert het
+aantal geladen rijen, commits en SQL statements.
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from query_count import count_queries
+from smtp_sink import SMTPSink
+
+sink = SMTPSink().start()
+db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{db_path}",
+    MAIL_SERVER="127.0.0.1",
+    MAIL_PORT=str(sink.port),
+    MAIL_USE_TLS="false",
+    MAIL_USERNAME="",
+    EMAIL_USER="alerts@example.com",
+)
+
+from sqlalchemy import event, text
+
+import worker
+from models import db, User, JobAlert, check_interval
+from worker import app
+from job_sources import MockSource
+from outbox import create_outbox
+from scheduler import utcnow
+
+
+class Counter:
+    def __init__(self):
+        self.rows = 0
+        self.commits = 0
+
+    def install(self):
+        event.listen(JobAlert, "load", self.on_load)
+        event.listen(db.session, "after_commit", self.on_commit)
+
+    def remove(self):
+        event.remove(JobAlert, "load", self.on_load)
+        event.remove(db.session, "after_commit", self.on_commit)
+
+    def on_load(self, target, context):
+        self.rows += 1
+
+    def on_commit(self, session):
+        self.commits += 1
+
+
+def seed(alerts, due_fraction):
+    db.drop_all()
+    db.create_all()
+    user = User(email="bench@example.com")
+    db.session.add(user)
+    db.session.commit()
+    now = utcnow()
+    due_every = max(1, round(1 / due_fraction)) if due_fraction else alerts + 1
+    db.session.execute(JobAlert.__table__.insert(), [
+        {
+            "user_id": user.id,
+            "search_query": f"zoekterm {i % 50}",
+            "location": "Amsterdam",
+            "frequency": "daily",
+            "is_active": True,
+            "last_check": now - timedelta(days=2 if i % due_every == 0 else 0),
+            "next_check_at": now - timedelta(hours=1) if i % due_every == 0 else now + timedelta(hours=12),
+            "updated_at": now,
+        }
+        for i in range(alerts)
+    ])
+    db.session.commit()
+
+
+def legacy_run():
+    """De oude aanpak: alles laden, in Python filteren, per alert committen"""
+    jobs = list(MockSource().jobs())
+    outbox = create_outbox(app.config)
+    now = utcnow()
+    for alert in JobAlert.query.filter_by(is_active=True).all():
+        if alert.last_check and now - alert.last_check < timedelta(hours=24):
+            continue
+        new_jobs = worker.filter_new_jobs(alert, jobs)
+        if new_jobs:
+            worker.send_job_alert_email(outbox, alert.user.email, alert.search_query, alert.location, new_jobs)
+            worker.record_sent_jobs(alert, new_jobs)
+            db.session.commit()
+        alert.last_check = now
+        alert.next_check_at = now + check_interval(alert.frequency)
+        db.session.commit()
+    outbox.close()
+
+
+def measure(label, run):
+    counter = Counter()
+    counter.install()
+    start = time.perf_counter()
+    with count_queries(db.engine) as queries, contextlib.redirect_stdout(io.StringIO()):
+        run()
+    elapsed = time.perf_counter() - start
+    counter.remove()
+    print(f"{label:>10}: {counter.rows:>8} rijen geladen, {counter.commits:>6} commits, "
+          f"{queries.count:>7} statements, {elapsed:6.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--alerts", type=int, default=20000)
+    parser.add_argument("--due", type=float, default=0.05, help="fractie van de alerts die due is")
+    args = parser.parse_args()
+
+    with app.app_context():
+        seed(args.alerts, args.due)
+        plan = db.session.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id FROM job_alert WHERE is_active = 1 AND next_check_at <= :now "
+            "ORDER BY next_check_at, id"
+        ), {"now": utcnow()}).fetchall()
+        print("Query plan:", "; ".join(row[-1] for row in plan))
+
+        measure("voorheen", legacy_run)
+        seed(args.alerts, args.due)
+        measure("nu", lambda: worker.check_jobs())
+    sink.stop()
+
+
+if __name__ == "__main__":
+    main()
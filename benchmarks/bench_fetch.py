@@ -0,0 +1,67 @@
+"""Benchmark voor de fetch engine tegen een lokale SerpApi stand-in
+
+Gebruik:
+    python benchmarks/bench_fetch.py --alerts 1000 --rps 200 --concurrency 32
+    python benchmarks/bench_fetch.py --alerts 1000 --cache   # koude en warme run met de response cache
+
+De totale tijd hoort begrensd te zijn door de rate limit
+(alerts × pagina's / rps), niet door de som van latencies en sleeps. Met
+--cache draait dezelfde set zoekopdrachten twee keer tegen een nieuwe
+response cache; de warme run hoort geen API calls meer te doen.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fetch_engine import FetchEngine
+from response_cache import ResponseCache
+from serpapi_stub import SerpApiStub
+
+
+def run(url, searches, args, cache=None):
+    engine = FetchEngine(url, requests_per_second=args.rps, max_concurrency=args.concurrency, cache=cache)
+    start = time.perf_counter()
+    results = engine.search_many(searches)
+    elapsed = time.perf_counter() - start
+    engine.close()
+    return results, elapsed
+
+
+def report(label, results, elapsed, args):
+    api_calls = sum(r[1] for r in results.values() if not isinstance(r, Exception))
+    errors = sum(1 for r in results.values() if isinstance(r, Exception))
+    print(f"{label}Zoekopdrachten: {args.alerts}, API calls: {api_calls}, fouten: {errors}")
+    print(f"{label}Tijd: {elapsed:.2f}s (rate limit ondergrens: {api_calls / args.rps:.2f}s, "
+          f"serieel met sleeps: {api_calls * (args.latency + 2):.0f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--alerts", type=int, default=1000)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--rps", type=float, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--cache", action="store_true", help="koude en warme run met een nieuwe response cache")
+    args = parser.parse_args()
+
+    stub = SerpApiStub(latency=args.latency, pages=args.pages).start()
+    searches = {i: {"q": f"zoekterm {i}", "location": "Amsterdam"} for i in range(args.alerts)}
+
+    if not args.cache:
+        report("", *run(stub.url, searches, args), args)
+    else:
+        cache = ResponseCache(os.path.join(tempfile.mkdtemp(), "cache.db"))
+        for label in ("koud: ", "warm: "):
+            report(label, *run(stub.url, searches, args, cache), args)
+        print(f"Cache: {cache.stats()}")
+        cache.close()
+    stub.stop()
+
+
+if __name__ == "__main__":
+    main()
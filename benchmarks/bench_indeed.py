@@ -0,0 +1,190 @@
+"""Parse- en persist-snelheid van de Indeed scraper op opgeslagen HTML pagina's
+
+Gebruik:
+    python benchmarks/bench_indeed.py
+    python benchmarks/bench_indeed.py --fixtures pagina's/   # eigen opgeslagen resultatenpagina's (*.html)
+    python benchmarks/bench_indeed.py --save-fixtures fixtures/ --history 200000
+
+Parset elke fixture met elke geïnstalleerde parser (bs4 is de oude route)
+en controleert dat ze dezelfde vacatures opleveren. Vergelijkt daarna het
+bijhouden van geziene vacatures: het oude seen_jobs.json dat na elke
+zoekopdracht volledig herschreven wordt tegen het append-only journal,
+bij een historie van `--history` vacatures. Tot slot haalt de scraper
+`--pages` pagina's op van een lokale HTTP stand-in met `--latency` per
+pagina, één voor één en gelijktijdig. Zonder --fixtures worden
+synthetische pagina's in de opmaak van Indeed gegenereerd.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from indeed_parser import available_parsers, get_parser
+from seen_jobs import SeenJobsJournal
+
+TITLES = ["Commercieel Medewerker", "Accountmanager", "Sales Consultant", "Inside Sales", "Binnendienst"]
+CITIES = ["Amsterdam", "Rotterdam", "Utrecht", "Eindhoven", "Den Haag & omgeving"]
+
+
+def fixture(page, jobs=15, noise_kb=250, seed=0):
+    """Eén resultatenpagina zoals Indeed die serveert: veel script en opmaak rond een handvol vacatures"""
+    rng = random.Random(seed * 1000 + page)
+    noise = "".join(f"var _x{i}={{a:{rng.random()},b:'{'x' * 40}'}};" for i in range(noise_kb * 1024 // 70))
+    cards = []
+    for i in range(jobs):
+        job_id = f"{rng.getrandbits(64):016x}"
+        cards.append(f"""
+<li><div class="cardOutline tapItem result"><div class="job_seen_beacon" data-jk="{job_id}">
+<table class="jobCard_mainContent"><tbody><tr><td class="resultContent">
+<div class="css-1m4cuuf e37uo190"><h2 class="jobTitle css-14z7akl eu4oa1w0"><a id="job_{job_id}" href="/rc/clk?jk={job_id}">
+<span title="{rng.choice(TITLES)}">{rng.choice(TITLES)} <b>({page * jobs + i})</b></span></a></h2></div>
+<div class="company_location css-17fky0v"><div><span class="companyName">Bedrijf &amp; Zn {rng.randint(1, 500)}</span>
+<div class="companyLocation">{rng.choice(CITIES)}<span class="remote"> (hybride)</span></div></div></div>
+<div class="metadata"><div class="attribute_snippet"><svg><path d="M0 0h24v24H0z"></path></svg>&euro; {rng.randint(2, 5)}.000 per maand</div></div>
+</td></tr></tbody></table>
+<div class="underShelfFooter"><div class="job-snippet"><ul><li>Ervaring met verkoop.</li><li>Rijbewijs B.</li></ul></div>
+<span class="date">{rng.randint(1, 30)} dagen geleden</span></div></div></div></li>""")
+    return f"""<!DOCTYPE html><html lang="nl"><head><meta charset="utf-8"><title>Vacatures</title>
+<style>{'.c{color:#2d2d2d;margin:0 auto}' * (noise_kb * 4)}</style><script>{noise}</script></head>
+<body><div id="gnav"><nav><ul>{''.join(f'<li><a href="/n{i}">Link {i}</a></li>' for i in range(200))}</ul></nav></div>
+<div id="mosaic-provider-jobcards"><ul class="jobsearch-ResultsList">{''.join(cards)}</ul></div>
+<script type="application/json">{json.dumps({'meta': list(range(2000))})}</script></body></html>"""
+
+
+def load_fixtures(args):
+    if args.fixtures:
+        paths = sorted(glob.glob(os.path.join(args.fixtures, "*.html")))
+        if not paths:
+            sys.exit(f"Geen *.html fixtures in {args.fixtures}")
+        pages = []
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                pages.append(f.read())
+        return pages
+    pages = [fixture(page) for page in range(args.pages)]
+    if args.save_fixtures:
+        os.makedirs(args.save_fixtures, exist_ok=True)
+        for page, html in enumerate(pages):
+            with open(os.path.join(args.save_fixtures, f"indeed-{page:02d}.html"), "w", encoding="utf-8") as f:
+                f.write(html)
+    return pages
+
+
+def bench_parse(pages, rounds):
+    print(f"Parsen van {len(pages)} pagina's ({sum(map(len, pages)) / len(pages) / 1024:.0f} KB gemiddeld), "
+          f"{rounds} rondes:")
+    reference = None
+    timings = {}
+    for name in ["bs4"] + [name for name in available_parsers() if name != "bs4"]:
+        parse = get_parser(name)
+        start = time.perf_counter()
+        for _ in range(rounds):
+            results = [parse(html) for html in pages]
+        timings[name] = (time.perf_counter() - start) / (rounds * len(pages))
+        # Zelfde vacatures als de oude route, na het strippen zoals normalize_job doet
+        jobs = [{key: (value or "").strip() for key, value in job.items()} for page in results for job in page]
+        reference = reference or jobs
+        status = "gelijk aan bs4" if jobs == reference else "AFWIJKEND van bs4"
+        print(f"  {name:>10}: {timings[name] * 1000:8.2f} ms per pagina, {len(jobs)} vacatures, {status}, "
+              f"{timings['bs4'] / timings[name]:.1f}x")
+
+
+def bench_persist(history, searches, new_per_search):
+    directory = tempfile.mkdtemp()
+    rng = random.Random(1)
+    existing = [rng.getrandbits(63) for _ in range(history)]
+    batches = [[rng.getrandbits(63) for _ in range(new_per_search)] for _ in range(searches)]
+
+    # Oude route: de hele set als JSON herschrijven na elke zoekopdracht
+    legacy_path = os.path.join(directory, "seen_jobs.json")
+    with open(legacy_path, "w") as f:
+        json.dump(existing, f)
+    start = time.perf_counter()
+    with open(legacy_path, "r") as f:
+        seen = set(json.load(f))
+    legacy_load = time.perf_counter() - start
+    start = time.perf_counter()
+    for batch in batches:
+        seen.update(batch)
+        with open(legacy_path, "w") as f:
+            json.dump(list(seen), f)
+    legacy_save = (time.perf_counter() - start) / searches
+
+    journal_path = os.path.join(directory, "seen_jobs.journal")
+    SeenJobsJournal(journal_path, legacy_path=None)._write(journal_path, dict.fromkeys(existing, time.time()))
+    journal = SeenJobsJournal(journal_path, legacy_path=None)
+    start = time.perf_counter()
+    journal.load()
+    journal_load = time.perf_counter() - start
+    start = time.perf_counter()
+    for batch in batches:
+        journal.add(batch)
+    journal_save = (time.perf_counter() - start) / searches
+
+    print(f"Bijhouden van geziene vacatures bij {history} in de historie, {searches} zoekopdrachten "
+          f"met elk {new_per_search} nieuwe:")
+    print(f"  seen_jobs.json: laden {legacy_load * 1000:7.1f} ms, opslaan {legacy_save * 1000:8.3f} ms per zoekopdracht")
+    print(f"  journal:        laden {journal_load * 1000:7.1f} ms, opslaan {journal_save * 1000:8.3f} ms per zoekopdracht "
+          f"({legacy_save / journal_save:.0f}x sneller)")
+
+
+def bench_fetch(pages, latency, concurrency):
+    from job_sources import IndeedSource
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            time.sleep(latency)
+            start = int(self.path.partition("start=")[2].split("&")[0] or 0)
+            body = pages[(start // IndeedSource.page_size) % len(pages)].encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Ophalen en parsen van {len(pages)} pagina's met {latency * 1000:.0f} ms latency per pagina:")
+    for workers in (1, concurrency):
+        source = IndeedSource(pages=len(pages), concurrency=workers)
+        source.url = f"http://127.0.0.1:{server.server_address[1]}/jobs"
+        start = time.perf_counter()
+        jobs = list(source.jobs())
+        print(f"  {workers:>2} tegelijk: {time.perf_counter() - start:6.2f}s, {len(jobs)} vacatures")
+    server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fixtures", help="map met opgeslagen resultatenpagina's (*.html)")
+    parser.add_argument("--save-fixtures", metavar="MAP", help="schrijf de gegenereerde pagina's naar deze map")
+    parser.add_argument("--pages", type=int, default=10, help="aantal gegenereerde pagina's")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--history", type=int, default=100000, help="geziene vacatures in de historie")
+    parser.add_argument("--searches", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2, help="latency per pagina van de stand-in (s)")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    pages = load_fixtures(args)
+    bench_parse(pages, args.rounds)
+    bench_persist(args.history, args.searches, 15)
+    bench_fetch(pages, args.latency, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
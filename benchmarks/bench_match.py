@@ -0,0 +1,91 @@
+"""Benchmark voor het matchen van alerts tegen de lokale job store
+
+Gebruik:
+    python benchmarks/bench_match.py --alerts 100000 --jobs 50000
+
+Laadt synthetische vacatures in de job tabel (met FTS5 index) en matcht
+de zoekopdrachten van synthetische alerts er in één pass tegen, met FTS5
+en met de in-memory index. Rapporteert ingest- en matchtijd.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+
+from job_store import ensure_job_index, ingest_jobs, match_searches
+from models import db
+from scheduler import utcnow
+from worker import app
+
+ROLES = ["python", "java", "frontend", "backend", "data", "devops", "test", "security", "cloud", "mobile",
+         "sales", "marketing", "finance", "hr", "product", "support", "logistiek", "zorg", "onderwijs", "legal"]
+LEVELS = ["junior", "medior", "senior", "lead", "stagiair", ""]
+TITLES = ["developer", "engineer", "analist", "manager", "consultant", "specialist", "medewerker", "architect"]
+CITIES = ["Amsterdam", "Rotterdam", "Utrecht", "Eindhoven", "Den Haag", "Groningen", "Tilburg", "Almere",
+          "Breda", "Nijmegen", "Veldhoven", "Zwolle", "Leiden", "Delft", "Arnhem", "Haarlem"]
+COMPANIES = [f"Bedrijf {i}" for i in range(500)]
+
+
+def synthetic_jobs(count, rng):
+    for i in range(count):
+        title = " ".join(part for part in (rng.choice(LEVELS), rng.choice(ROLES), rng.choice(TITLES)) if part)
+        yield {
+            "title": title.capitalize(),
+            "company_name": rng.choice(COMPANIES),
+            "location": f"{rng.choice(CITIES)}, Nederland",
+            "link": f"https://example.com/jobs/{i}",
+        }
+
+
+def synthetic_searches(count, rng):
+    """Zoekopdrachten zoals gebruikers ze invoeren; veel alerts delen dezelfde zoekopdracht"""
+    keys = []
+    for _ in range(count):
+        query = " ".join(rng.sample(ROLES, 1) + ([rng.choice(TITLES)] if rng.random() < 0.7 else []))
+        location = rng.choice(CITIES + ["Netherlands"]).lower()
+        keys.append((query, location))
+    return keys
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--alerts", type=int, default=100000)
+    parser.add_argument("--jobs", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    with app.app_context():
+        db.create_all()
+        ensure_job_index()
+        now = utcnow()
+        jobs = list(synthetic_jobs(args.jobs, rng))
+        start = time.perf_counter()
+        for offset in range(0, len(jobs), 5000):
+            ingest_jobs(jobs[offset:offset + 5000], "bench", now)
+        db.session.commit()
+        print(f"Ingest: {len(jobs)} vacatures in {time.perf_counter() - start:.2f}s")
+
+        alerts = synthetic_searches(args.alerts, rng)
+        since = now - timedelta(days=1)
+        for method in ("fts", "index"):
+            start = time.perf_counter()
+            # Zoals check_jobs: alerts groeperen per zoekopdracht en elke unieke zoekopdracht één keer matchen
+            searches = dict.fromkeys(alerts, since)
+            matches = match_searches(searches, method=method)
+            per_alert = sum(len(matches[key]) for key in alerts)
+            elapsed = time.perf_counter() - start
+            print(f"{method:>6}: {len(alerts)} alerts ({len(searches)} unieke zoekopdrachten), "
+                  f"{per_alert} matches in {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
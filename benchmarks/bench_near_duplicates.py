@@ -0,0 +1,165 @@
+"""Snelheid en kwaliteit van de near-duplicate clustering (MinHash/LSH)
+
+Gebruik:
+    python benchmarks/bench_near_duplicates.py
+    python benchmarks/bench_near_duplicates.py --jobs 1000000 --batch 2000
+    python benchmarks/bench_near_duplicates.py --threshold 0.8 --sample 5000
+
+Genereert `--jobs` synthetische vacatures waarvan een fractie
+`--variant-rate` een variant van een eerdere vacature is (toevoeging aan de
+titel zoals "(m/v)", een extra titelwoord, een andere rechtsvorm of
+", Nederland" achter de plaats) en voert ze in batches van `--batch` door
+een lege index, zoals de worker dat per run doet. De synthetische bron kent
+maar een paar honderd bedrijven; een echte stroom heeft er tienduizenden,
+dus de originelen krijgen een bedrijf uit `--companies` gegenereerde namen
+(0 houdt de bedrijven van de synthetische bron). Rapporteert vacatures/s,
+kandidaten per vacature en de grootte van de index, en daarna dezelfde
+stroom nog eens (alle vacatures al bekend). Tot slot wordt een steekproef
+van `--sample` vacatures ook met alle paren geclusterd, om te zien wat de
+LSH kandidaten missen, en wordt gemeten hoeveel varianten bij hun origineel
+terechtkomen.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_sources import SyntheticSource
+from near_duplicates import NearDuplicateIndex, profile, similar
+
+EXTRA_WORDS = ["Security", "Software", "Sales", "Technisch", "Commercieel", "Allround"]
+LEGAL_FORMS = [" B.V.", " BV", " N.V.", " Nederland", ""]
+SYLLABLES = ["ber", "kor", "van", "meer", "dal", "hof", "ter", "lin", "vel", "zand", "bro", "wijk", "sta", "den",
+             "hol", "mark", "rijn", "gel", "ven", "dor", "tex", "lum", "nor", "plex", "vis", "tra", "mon", "sol"]
+
+
+def company_names(count, rng):
+    """`count` verschillende bedrijfsnamen: een verzonnen naam plus een sector"""
+    names = set()
+    while len(names) < count:
+        name = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 3))).title()
+        names.add(f"{name} {rng.choice(SyntheticSource.COMPANY_SECTORS)}")
+    return sorted(names)
+
+
+def variant(rng, original):
+    """Een bijna-dubbele versie van een vacature, zoals een andere bron of aggregator hem plaatst"""
+    job = dict(original)
+    for mutation in rng.sample(["suffix", "word", "company", "location"], rng.randint(1, 2)):
+        if mutation == "suffix":
+            job["title"] += rng.choice(SyntheticSource.NEAR_DUPLICATE_SUFFIXES)
+        elif mutation == "word":
+            words = job["title"].split()
+            words.insert(rng.randrange(len(words) + 1), rng.choice(EXTRA_WORDS))
+            job["title"] = " ".join(words)
+        elif mutation == "company":
+            company = job["company_name"]
+            for form in LEGAL_FORMS[:-1]:
+                company = company.removesuffix(form)
+            job["company_name"] = company + rng.choice(LEGAL_FORMS)
+        else:
+            job["location"] += ", Nederland"
+    job["link"] = f"{original['link']}?via={rng.randrange(1000)}"
+    return job
+
+
+def generate(count, variant_rate, companies=0, seed=0):
+    """[(vacature, nummer van het origineel)]"""
+    rng = random.Random(seed)
+    names = company_names(companies, rng) if companies else None
+    originals = SyntheticSource(count=count, seed=seed, duplicate_rate=0, near_duplicate_rate=0).jobs()
+    jobs = []
+    recent = []
+    for number in range(count):
+        if recent and rng.random() < variant_rate:
+            origin = rng.choice(recent)
+            jobs.append((variant(rng, jobs[origin][0]), origin))
+            continue
+        job = next(originals)
+        if names:
+            job["company_name"] = rng.choice(names)
+        jobs.append((job, number))
+        if len(recent) < 10000:
+            recent.append(number)
+        else:
+            recent[rng.randrange(10000)] = number
+    return jobs
+
+
+def run(index, jobs, batch):
+    start = time.perf_counter()
+    cluster_ids = []
+    for offset in range(0, len(jobs), batch):
+        cluster_ids += index.assign([job for job, _ in jobs[offset:offset + batch]])
+    return cluster_ids, time.perf_counter() - start
+
+
+def all_pairs(jobs, threshold):
+    """Dezelfde toewijzing als de index, maar elke vacature vergeleken met alle clusters"""
+    clusters = []
+    assigned = []
+    for job, _ in jobs:
+        job_profile = profile(job)
+        best = next((cluster for cluster, cluster_profile in enumerate(clusters)
+                     if similar(job_profile, cluster_profile, threshold)), None)
+        if best is None:
+            best = len(clusters)
+            clusters.append(job_profile)
+        assigned.append(best)
+    return assigned
+
+
+def same_partition(first, second):
+    """Fractie vacatures die in beide clusteringen bij hetzelfde eerste lid van hun cluster horen"""
+    def leaders(assignment):
+        first_member = {}
+        return [first_member.setdefault(cluster, position) for position, cluster in enumerate(assignment)]
+    return sum(a == b for a, b in zip(leaders(first), leaders(second))) / len(first)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=200000)
+    parser.add_argument("--variant-rate", type=float, default=0.2, help="fractie vacatures die een variant is")
+    parser.add_argument("--companies", type=int, default=20000, help="aantal bedrijven (0: die van de synthetische bron)")
+    parser.add_argument("--batch", type=int, default=1000, help="vacatures per aanroep van de index")
+    parser.add_argument("--threshold", type=float, default=0.7)
+    parser.add_argument("--permutations", type=int, default=256)
+    parser.add_argument("--sample", type=int, default=10000, help="vacatures voor de vergelijking met alle paren")
+    args = parser.parse_args()
+
+    jobs = generate(args.jobs, args.variant_rate, args.companies)
+    path = os.path.join(tempfile.mkdtemp(), "near_duplicates.db")
+    index = NearDuplicateIndex(path, threshold=args.threshold, num_perm=args.permutations)
+    print(f"{args.jobs} vacatures ({args.variant_rate:.0%} varianten, {args.companies or 'synthetische'} bedrijven), drempel {args.threshold}, "
+          f"{args.permutations} permutaties = {index.bands} banden van {index.rows}")
+
+    cluster_ids, elapsed = run(index, jobs, args.batch)
+    stats = index.stats()
+    size = sum(os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix))
+    print(f"  nieuwe vacatures: {elapsed:6.2f}s, {args.jobs / elapsed:8.0f} vacatures/s, "
+          f"{stats.get('candidates', 0) / args.jobs:.2f} kandidaten per vacature, {stats.get('clusters', 0)} clusters, "
+          f"index {size / 1024 / 1024:.0f} MB")
+    _, elapsed = run(index, jobs, args.batch)
+    print(f"  al bekend:        {elapsed:6.2f}s, {args.jobs / elapsed:8.0f} vacatures/s")
+
+    variants = [(position, origin) for position, (_, origin) in enumerate(jobs) if origin != position]
+    recall = sum(cluster_ids[position] == cluster_ids[origin] for position, origin in variants) / len(variants)
+    print(f"  varianten bij hun origineel: {recall:.1%} van {len(variants)}")
+
+    sample = jobs[:args.sample]
+    sample_index = NearDuplicateIndex(os.path.join(tempfile.mkdtemp(), "sample.db"), args.threshold, args.permutations)
+    lsh, lsh_seconds = run(sample_index, sample, args.batch)
+    start = time.perf_counter()
+    exact = all_pairs(sample, args.threshold)
+    exact_seconds = time.perf_counter() - start
+    print(f"Steekproef van {len(sample)} vacatures: LSH {lsh_seconds:.2f}s, alle paren {exact_seconds:.2f}s, "
+          f"{same_partition(lsh, exact):.2%} gelijk ingedeeld")
+
+
+if __name__ == "__main__":
+    main()
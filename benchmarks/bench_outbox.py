@@ -0,0 +1,58 @@
+"""Benchmark voor de SMTP outbox tegen een lokale SMTP sink
+
+Gebruik:
+    python benchmarks/bench_outbox.py --messages 500 --handshake-latency 0.05
+
+Vergelijkt een nieuwe verbinding per bericht (het oude gedrag) met een
+pool van langlevende sessies.
+"""
+import argparse
+import os
+import sys
+import time
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from outbox import create_outbox
+from smtp_sink import SMTPSink
+
+
+def run(sink, messages, pool_size, max_messages):
+    outbox = create_outbox(sink.config(MAIL_MAX_MESSAGES_PER_CONNECTION=max_messages), pool_size=pool_size)
+    start = time.perf_counter()
+    futures = []
+    for i in range(messages):
+        msg = MIMEText(f"Bericht {i}", "plain")
+        msg["From"] = "alerts@example.com"
+        msg["To"] = f"gebruiker{i}@example.com"
+        msg["Subject"] = "Benchmark"
+        futures.append(outbox.put(msg))
+    outbox.close()
+    elapsed = time.perf_counter() - start
+    failed = sum(1 for f in futures if f.exception() is not None)
+    return elapsed, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--handshake-latency", type=float, default=0.05)
+    parser.add_argument("--message-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    sink = SMTPSink(args.handshake_latency, args.message_latency).start()
+    for label, pool_size, max_messages in (
+        ("verbinding per bericht", 1, 1),
+        (f"pool van {args.pool_size} sessies", args.pool_size, 100),
+    ):
+        before = sink.connections
+        elapsed, failed = run(sink, args.messages, pool_size, max_messages)
+        print(f"{label:>28}: {elapsed:6.2f}s, {args.messages / elapsed:8.1f} berichten/s, "
+              f"{sink.connections - before} verbindingen, {failed} mislukt")
+    sink.stop()
+
+
+if __name__ == "__main__":
+    main()
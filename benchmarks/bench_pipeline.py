@@ -0,0 +1,281 @@
+"""End-to-end benchmark van de alert pipeline (check_jobs)
+
+Gebruik:
+    python benchmarks/bench_pipeline.py --users 200 --alerts 2000 --searches 100 --output resultaat.json
+    python benchmarks/bench_pipeline.py --alerts 2000 --compare resultaat.json
+    python benchmarks/bench_pipeline.py --matching store --store-jobs 50000
+    python benchmarks/bench_pipeline.py --database postgresql://localhost/bench_wegwerp
+    python benchmarks/bench_pipeline.py --record archief/ && python benchmarks/bench_pipeline.py --replay archief/
+
+Seedt N gebruikers en M due alerts in een wegwerp database (standaard een
+tijdelijke SQLite database; een opgegeven database wordt leeggemaakt),
+serveert SerpApi pagina's vanaf een lokale HTTP stand-in met instelbare
+latency en vangt e-mail op met een lokale SMTP sink. Eén check_jobs run
+draait in een apart proces, zodat het piekgeheugen alleen de run zelf
+meet. Rapporteert alerts/s, p50/p99 latency per alert (van het claimen van
+de batch tot de alert verwerkt is), het aantal SQL statements en de piek
+RSS, en schrijft de resultaten optioneel als JSON weg om versies te
+vergelijken.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Metrics die bij --compare naast elkaar gezet worden; True als hoger beter is
+COMPARED_METRICS = {
+    "alerts_per_second": True,
+    "p50_ms": False,
+    "p99_ms": False,
+    "queries": False,
+    "queries_per_alert": False,
+    "peak_rss_mb": False,
+}
+
+
+def percentile(values, fraction):
+    """Percentiel met nearest-rank, zonder numpy"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def search_terms(count):
+    from job_sources import SyntheticSource
+
+    terms = []
+    for role in SyntheticSource.ROLES:
+        for title in SyntheticSource.TITLES:
+            terms.append(f"{role} {title}".lower())
+    return [terms[i % len(terms)] + (f" {i // len(terms)}" if i >= len(terms) else "") for i in range(count)]
+
+
+def seed(users, alerts, searches, store_jobs):
+    from job_sources import SyntheticSource
+    from job_store import ensure_job_index, ingest_source
+    from models import db, User, JobAlert
+    from scheduler import utcnow
+    from worker import app, enable_sqlite_wal
+
+    cities = [city for city, _ in SyntheticSource.CITIES]
+    terms = search_terms(searches)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        enable_sqlite_wal()
+        db.session.execute(User.__table__.insert(), [
+            {"email": f"gebruiker{i}@example.com", "password_hash": "x"} for i in range(users)
+        ])
+        db.session.commit()
+        user_ids = [user_id for (user_id,) in db.session.query(User.id).order_by(User.id)]
+        now = utcnow()
+        # Verschuif de zoekterm per ronde over de gebruikers, zodat een gebruiker verschillende zoektermen heeft
+        term_indexes = [(i + i // len(user_ids)) % len(terms) for i in range(alerts)]
+        db.session.execute(JobAlert.__table__.insert(), [
+            {
+                "user_id": user_ids[i % len(user_ids)],
+                "search_query": terms[term],
+                # Elke zoekterm hoort bij één locatie, zodat er precies `searches` unieke zoekopdrachten zijn
+                "location": cities[term % len(cities)] if term % 3 else None,
+                "frequency": "daily",
+                "is_active": True,
+                "last_check": now - timedelta(days=1),
+                "next_check_at": now - timedelta(minutes=5),
+                "updated_at": now,
+            }
+            for i, term in enumerate(term_indexes)
+        ])
+        db.session.commit()
+        if store_jobs:
+            ensure_job_index()
+            ingest_source(SyntheticSource(count=store_jobs, seed=1), now)
+
+
+def measure_run():
+    """Eén check_jobs run met latency per alert, SQL statements en piek RSS (draait in een eigen proces)"""
+    import resource
+
+    import worker
+    from models import db
+    from worker import app
+    from query_count import count_queries
+
+    latencies = []
+    batch_started = [None]
+    claim_due_alerts = worker.claim_due_alerts
+    process_alert = worker.process_alert
+
+    def timed_claim(*args, **kwargs):
+        batch_started[0] = time.perf_counter()
+        return claim_due_alerts(*args, **kwargs)
+
+    def timed_process(*args, **kwargs):
+        process_alert(*args, **kwargs)
+        latencies.append(time.perf_counter() - batch_started[0])
+
+    worker.claim_due_alerts = timed_claim
+    worker.process_alert = timed_process
+
+    with app.app_context():
+        engine = db.engine
+    output = io.StringIO()
+    with count_queries(engine) as queries, contextlib.redirect_stdout(output):
+        start = time.perf_counter()
+        stats = worker.check_jobs()
+        elapsed = time.perf_counter() - start
+
+    alerts = stats["alerts"]
+    return {
+        "alerts": alerts,
+        "seconds": round(elapsed, 3),
+        "alerts_per_second": round(alerts / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1),
+        "queries": queries.count,
+        "queries_per_alert": round(queries.count / alerts, 2) if alerts else 0.0,
+        # ru_maxrss is in KB op Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "worker_stats": stats,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(result, path):
+    with open(path, "r", encoding="utf-8") as f:
+        previous = json.load(f)
+    print(f"\nVergeleken met {path} ({previous.get('revision')}):")
+    for metric, higher_is_better in COMPARED_METRICS.items():
+        old, new = previous["results"].get(metric), result["results"][metric]
+        if not old:
+            continue
+        change = (new - old) / old
+        better = change > 0 if higher_is_better else change < 0
+        verdict = "beter" if better else "slechter" if change else "gelijk"
+        print(f"  {metric:>18}: {old:>10} -> {new:>10} ({change:+.1%}, {verdict})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--alerts", type=int, default=2000)
+    parser.add_argument("--searches", type=int, default=100, help="aantal unieke zoektermen over de alerts")
+    parser.add_argument("--latency", type=float, default=0.05, help="latency per SerpApi request (s)")
+    parser.add_argument("--rate", type=float, default=1000, help="SERPAPI_REQUESTS_PER_SECOND voor de run")
+    parser.add_argument("--pages", type=int, default=2, help="pagina's per zoekopdracht")
+    parser.add_argument("--jobs-per-page", type=int, default=10)
+    parser.add_argument("--mail-latency", type=float, default=0.0, help="latency per bericht van de SMTP sink (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fractie SerpApi requests die een 503 geeft")
+    parser.add_argument("--mail-error-rate", type=float, default=0.0, help="fractie berichten die de SMTP sink weigert (451)")
+    parser.add_argument("--source", default="serpapi", help="JOB_SOURCE voor de run (serpapi gebruikt de stand-in)")
+    parser.add_argument("--matching", choices=["search", "store"], default="search")
+    parser.add_argument("--email-mode", choices=["digest", "alert"], default="alert", help="ALERT_EMAIL_MODE voor de run")
+    parser.add_argument("--store-jobs", type=int, default=20000, help="synthetische vacatures in de store (--matching store)")
+    parser.add_argument("--cache", action="store_true", help="gebruik de SerpApi response cache (SERPAPI_CACHE) in een tijdelijk bestand")
+    parser.add_argument("--record", metavar="MAP", help="archiveer de SerpApi responses (SERPAPI_ARCHIVE_DIR)")
+    parser.add_argument("--replay", metavar="ARCHIEF", help="speel SerpApi responses terug uit een archief (SERPAPI_REPLAY)")
+    parser.add_argument("--near-duplicates", action="store_true",
+                        help="zet het samenvoegen van bijna-dubbele vacatures (NEAR_DUPLICATES) aan; standaard de config")
+    parser.add_argument("--profile", choices=["stacks", "cprofile"], help="profileer de run (PROFILE_MODE) om de overhead te meten")
+    parser.add_argument("--database", help="wegwerp database URL; standaard een tijdelijke SQLite database")
+    parser.add_argument("--output", help="schrijf de resultaten als JSON naar dit bestand")
+    parser.add_argument("--compare", metavar="JSON", help="vergelijk met een eerder weggeschreven resultaat")
+    args = parser.parse_args()
+
+    from serpapi_stub import SerpApiStub
+    from smtp_sink import SMTPSink
+
+    stub = SerpApiStub(
+        latency=args.latency, pages=args.pages, jobs_per_page=args.jobs_per_page, error_rate=args.error_rate
+    ).start()
+    sink = SMTPSink(message_latency=args.mail_latency, failure_rate=args.mail_error_rate).start()
+    database = args.database or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    # Het meetproces (spawn) leest zijn configuratie uit de environment
+    os.environ.update(
+        DATABASE_URL=database,
+        JOB_SOURCE=args.source,
+        JOB_MATCHING=args.matching,
+        ALERT_EMAIL_MODE=args.email_mode,
+        SERPAPI_URL=stub.url,
+        SERPAPI_KEY="bench",
+        SERPAPI_REQUESTS_PER_SECOND=str(args.rate),
+        SERPAPI_CACHE="true" if args.cache else "false",
+        SERPAPI_CACHE_PATH=os.path.join(tempfile.mkdtemp(), "serpapi_cache.db"),
+        SERPAPI_ARCHIVE_DIR=args.record or "",
+        SERPAPI_REPLAY=args.replay or "",
+        SERPAPI_REPLAY_DATABASE=database,
+        NEAR_DUPLICATES_PATH=os.path.join(tempfile.mkdtemp(), "near_duplicates.db"),
+        MAIL_SERVER="127.0.0.1",
+        MAIL_PORT=str(sink.port),
+        MAIL_USE_TLS="false",
+        MAIL_USERNAME="",
+        EMAIL_USER="alerts@example.com",
+        PROFILE_MODE=args.profile or "",
+        PROFILE_DIR=os.path.join(tempfile.mkdtemp(), "profiles"),
+    )
+    # Zonder --near-duplicates geldt de standaard uit de config, zoals bij een gewone worker
+    if args.near_duplicates:
+        os.environ["NEAR_DUPLICATES"] = "true"
+    else:
+        os.environ.pop("NEAR_DUPLICATES", None)
+
+    seed(args.users, args.alerts, args.searches, args.store_jobs if args.matching == "store" else 0)
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as pool:
+        results = pool.submit(measure_run).result()
+    results["serpapi_requests"] = stub.requests
+    results["serpapi_errors"] = stub.errors
+    results["emails_delivered"] = len(sink.messages)
+    results["emails_refused"] = sink.failures
+    stub.stop()
+    sink.stop()
+
+    params = vars(args).copy()
+    for key in ("output", "compare", "record", "replay"):
+        params.pop(key)
+    params["database"] = database.split(":", 1)[0]
+    result = {
+        "benchmark": "pipeline",
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "params": params,
+        "results": results,
+    }
+
+    print(f"{results['alerts']} alerts in {results['seconds']:.2f}s: {results['alerts_per_second']} alerts/s, "
+          f"p50 {results['p50_ms']} ms, p99 {results['p99_ms']} ms, {results['queries']} SQL statements "
+          f"({results['queries_per_alert']} per alert), piek RSS {results['peak_rss_mb']} MB, "
+          f"{results['serpapi_requests']} SerpApi requests ({results['serpapi_errors']} fouten), "
+          f"{results['emails_delivered']} e-mails ({results['emails_refused']} geweigerd)")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Resultaten weggeschreven naar {args.output}")
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""Simulatie van het quotabudget: verdeelstrategieën naast elkaar op dezelfde opbrengsten
+
+Gebruik:
+    python benchmarks/bench_quota.py
+    python benchmarks/bench_quota.py --searches 20000 --days 60 --budget 15000
+    python benchmarks/bench_quota.py --archive archive/ --frequency daily
+
+Speelt per zoekopdracht een reeks momenten af waarop nieuwe vacatures
+verschijnen en controleert de zoekopdrachten volgens elke strategie:
+
+- vast:     het huidige gedrag, elke alert volgens zijn frequentie met alle pagina's
+- uniform:  alle intervallen met dezelfde factor opgerekt tot het budget past
+- budget:   het quotaplan (quota_budget), dat de opbrengst per zoekopdracht
+            meet en het budget elke `--plan-hours` opnieuw verdeelt
+
+Een controle levert de vacatures op die sinds de vorige controle
+verschenen, tot de capaciteit van de opgehaalde pagina's (de rest wordt
+gemist), en kost een call per opgehaalde pagina, zoals de fetch engine met
+de date_posted filter. Zonder `--archive` zijn de opbrengsten synthetisch:
+een deel van de zoekopdrachten levert nooit iets op, de rest een
+lognormaal verdeeld aantal per uur, en een deel valt halverwege stil of
+leeft juist op. Met `--archive` komen ze uit een archief met ruwe SerpApi
+responses (zie response_archive): een vacature verschijnt op het moment
+dat hij voor het eerst in een response van zijn zoekopdracht stond. Het
+budget is standaard de helft van wat 'vast' per dag gebruikt.
+"""
+import argparse
+import heapq
+import math
+import os
+import random
+import statistics
+import sys
+import time
+from bisect import bisect_right
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fingerprint import job_fingerprint
+from quota_budget import MAX_PAGES, PAGE_SIZE, allocate, capacity, observe, rate, spread
+from response_archive import read_records, segment_paths
+
+FREQUENCY_HOURS = {'hourly': 1, 'daily': 24, 'weekly': 168}
+
+
+def poisson(rng, jobs_per_hour, start, end):
+    """Tijdstippen (uren) van een Poisson proces tussen `start` en `end`"""
+    moments = []
+    moment = start
+    while jobs_per_hour > 0:
+        moment += rng.expovariate(jobs_per_hour)
+        if moment >= end:
+            break
+        moments.append(moment)
+    return moments
+
+
+def synthetic(searches, days, seed=0, dead=0.35, drift=0.2):
+    """{sleutel: (interval in uren, [tijdstippen in uren])} met willekeurige opbrengsten"""
+    rng = random.Random(seed)
+    middle, horizon = days * 12, days * 24
+    trace = {}
+    for number in range(searches):
+        frequency = rng.choices([1, 24, 168], weights=[5, 85, 10])[0]
+        jobs_per_hour = 0.0 if rng.random() < dead else min(10.0, rng.lognormvariate(math.log(0.1), 1.5))
+        # Halverwege stil of juist druk, zodat het plan moet bijsturen
+        later = jobs_per_hour
+        if rng.random() < drift:
+            later = 0.0 if rng.random() < 0.5 else max(jobs_per_hour, 0.05) * 5
+        arrivals = poisson(rng, jobs_per_hour, 0, middle) + poisson(rng, later, middle, horizon)
+        trace[(f"zoekopdracht {number}", "netherlands")] = (frequency, arrivals)
+    return trace
+
+
+def from_archive(spec, frequency_hours):
+    """{sleutel: (interval in uren, [tijdstippen in uren])} uit een archief met SerpApi responses"""
+    first_seen = {}
+    start = None
+    for record in read_records(segment_paths(spec)):
+        if record['status'] != 200 or not record.get('response'):
+            continue
+        moment = datetime.fromisoformat(record['ts'])
+        start = start or moment
+        params = record['params']
+        key = (" ".join((params.get('q') or "").split()).lower(), " ".join((params.get('location') or "").split()).lower())
+        seen = first_seen.setdefault(key, {})
+        for job in record['response'].get('jobs_results', []):
+            seen.setdefault(job_fingerprint(job), (moment - start).total_seconds() / 3600)
+    return {key: (frequency_hours, sorted(seen.values())) for key, seen in first_seen.items()}
+
+
+class Fixed:
+    """Elke zoekopdracht volgens zijn frequentie keer `stretch`, met alle pagina's"""
+
+    def __init__(self, stretch=1.0):
+        self.stretch = stretch
+
+    def next_check(self, key, frequency, now):
+        return frequency * self.stretch, MAX_PAGES
+
+    def observe(self, key, new_jobs, calls, hours, pages):
+        pass
+
+
+class Budgeted:
+    """Het quotaplan: gemeten opbrengst per zoekopdracht, elke `plan_hours` opnieuw verdeeld"""
+
+    def __init__(self, trace, daily_calls, half_life_hours, max_hours, freshness_hours, min_gain, plan_hours):
+        self.frequencies = {key: frequency for key, (frequency, _) in trace.items()}
+        self.daily_calls = daily_calls
+        self.half_life_hours = half_life_hours
+        self.max_hours = max_hours
+        self.freshness_hours = freshness_hours
+        self.min_gain = min_gain
+        self.plan_hours = plan_hours
+        self.yields = {}
+        self.plan = {}
+        self.planned_at = None
+        self.plan_seconds = 0.0
+        self.rng = random.Random(0)
+
+    def next_check(self, key, frequency, now):
+        if self.planned_at is None or now - self.planned_at >= self.plan_hours:
+            start = time.perf_counter()
+            searches = {key: (hours, rate(self.yields.get(key))) for key, hours in self.frequencies.items()}
+            self.plan = allocate(searches, self.daily_calls, self.max_hours, self.freshness_hours, self.min_gain)
+            self.plan_seconds += time.perf_counter() - start
+            self.planned_at = now
+        allocation = self.plan[key]
+        return spread(allocation.hours, frequency, self.rng), allocation.pages
+
+    def observe(self, key, new_jobs, calls, hours, pages):
+        self.yields[key] = observe(self.yields.get(key), new_jobs, calls, hours, self.half_life_hours, pages)
+
+
+def simulate(trace, policy, days, freshness_hours, seed=0):
+    """Speel de trace af met een strategie; geeft de totalen en calls per dag terug"""
+    rng = random.Random(seed)
+    horizon = days * 24
+    heap = []
+    for key, (frequency, _) in trace.items():
+        # Spreid de eerste controles over het eerste interval
+        heap.append((rng.uniform(0, frequency), key))
+    heapq.heapify(heap)
+    # De eerste controle ziet alles sinds het begin van de trace
+    last_check = {key: 0.0 for key in trace}
+    next_arrival = {key: 0 for key in trace}
+    daily_calls = [0] * days
+    found = missed = 0
+    delays = []
+    value = 0.0
+
+    while heap:
+        now, key = heapq.heappop(heap)
+        if now >= horizon:
+            continue
+        frequency, arrivals = trace[key]
+        interval, pages = policy.next_check(key, frequency, now)
+        start = next_arrival[key]
+        end = bisect_right(arrivals, now, lo=start)
+        arrived = end - start
+        captured = min(arrived, capacity(pages))
+        calls = min(pages, max(1, math.ceil(arrived / PAGE_SIZE)))
+        # De nieuwste vacatures staan bovenaan; wat niet op de pagina's past wordt gemist
+        for moment in arrivals[end - captured:end]:
+            delays.append(now - moment)
+            value += 0.5 ** ((now - moment) / freshness_hours)
+        found += captured
+        missed += arrived - captured
+        daily_calls[int(now // 24)] += calls
+        next_arrival[key] = end
+        policy.observe(key, captured, calls, max(now - last_check[key], 1 / 60), pages)
+        last_check[key] = now
+        heapq.heappush(heap, (now + interval, key))
+
+    calls = sum(daily_calls)
+    return {
+        'daily': daily_calls,
+        'calls': calls,
+        'calls_per_day': calls / days,
+        'peak_day': max(daily_calls),
+        'found': found,
+        'missed': missed,
+        'per_call': found / calls if calls else 0.0,
+        'value_per_call': value / calls if calls else 0.0,
+        'delay': statistics.median(delays) if delays else 0.0,
+    }
+
+
+def report(name, result, budget):
+    over = f", {result['peak_day'] - budget:+.0f} op de drukste dag" if budget and result['peak_day'] > budget else ""
+    print(f"  {name:8s} {result['calls_per_day']:9.0f} calls/dag{over:24s} {result['found']:9d} gevonden "
+          f"{result['missed']:8d} gemist  {result['per_call']:5.2f} per call  "
+          f"{result['value_per_call']:5.2f} vers per call  mediane vertraging {result['delay']:5.1f} uur")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--searches', type=int, default=5000, help="aantal synthetische zoekopdrachten")
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--archive', help="opbrengsten uit een archief met SerpApi responses (map, segment of glob)")
+    parser.add_argument('--frequency', choices=FREQUENCY_HOURS, default='daily',
+                        help="frequentie van de alerts bij --archive")
+    parser.add_argument('--budget', type=float, help="calls per dag (standaard de helft van 'vast')")
+    parser.add_argument('--half-life', type=float, default=7, help="halfwaardetijd van de opbrengst in dagen")
+    parser.add_argument('--max-interval', type=float, default=7, help="langste interval in dagen")
+    parser.add_argument('--freshness', type=float, default=24, help="uren waarna een vacature half zoveel waard is")
+    parser.add_argument('--min-yield', type=float, default=0.05)
+    parser.add_argument('--plan-hours', type=float, default=6, help="hoe vaak het plan herberekend wordt (uren)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.archive:
+        trace = from_archive(args.archive, FREQUENCY_HOURS[args.frequency])
+        days = max(1, math.ceil(max((arrivals[-1] for _, arrivals in trace.values() if arrivals), default=0) / 24))
+    else:
+        trace = synthetic(args.searches, args.days, args.seed)
+        days = args.days
+    arrivals = sum(len(moments) for _, moments in trace.values())
+    dead = sum(not moments for _, moments in trace.values())
+    print(f"{len(trace)} zoekopdrachten ({dead} zonder nieuwe vacatures), {arrivals} nieuwe vacatures in {days} dagen")
+
+    fixed = simulate(trace, Fixed(), days, args.freshness, args.seed)
+    budget = args.budget or fixed['calls_per_day'] / 2
+    print(f"Budget {budget:.0f} calls per dag, versheid halveert na {args.freshness:g} uur")
+    report('vast', fixed, budget)
+    report('uniform', simulate(trace, Fixed(max(1.0, fixed['calls_per_day'] / budget)), days, args.freshness,
+                               args.seed), budget)
+    budgeted = Budgeted(trace, budget, args.half_life * 24, args.max_interval * 24, args.freshness, args.min_yield,
+                        args.plan_hours)
+    report('budget', simulate(trace, budgeted, days, args.freshness, args.seed), budget)
+    print(f"  (plan {len(trace)} zoekopdrachten: {budgeted.plan_seconds / max(1, days * 24 / args.plan_hours) * 1000:.0f} ms "
+          f"per herberekening)")
+
+
+if __name__ == "__main__":
+    main()
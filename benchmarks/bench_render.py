@@ -0,0 +1,91 @@
+"""Micro-benchmark voor het renderen van alert e-mails
+
+Gebruik:
+    python benchmarks/bench_render.py
+
+Vergelijkt per e-mail de rendertijd van de oude f-string opbouw met de
+voorgecompileerde Jinja templates (zonder en met cache hit) voor 5, 50 en
+500 vacatures.
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from worker import app
+from email_templates import AlertEmailRenderer
+
+
+def legacy_render(jobs):
+    """De oude opbouw uit send_job_alert_email, ingekort tot de kern: += per vacature"""
+    html_content = f"""
+    <html><head><style>
+        body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
+        .job {{ margin-bottom: 20px; padding: 15px; border: 1px solid #ddd; }}
+    </style></head><body>
+    <p>Er zijn {len(jobs)} nieuwe vacatures gevonden die voldoen aan uw zoekcriteria.</p>
+    """
+    for job in jobs:
+        apply_link = None
+        if 'apply_options' in job and len(job['apply_options']) > 0:
+            apply_link = job['apply_options'][0].get('link', '')
+        final_link = apply_link or job.get('link', '')
+        safe_link = final_link.replace('"', '&quot;')
+        html_content += f"""
+            <div class="job">
+                <div class="job-title">{job.get('title', 'Geen titel')}</div>
+                <div class="job-company">{job.get('company_name', 'Onbekend bedrijf')}</div>
+                <div class="job-location">{job.get('location', 'Onbekende locatie')}</div>
+                <a href="{safe_link}" class="button">Bekijk vacature →</a>
+            </div>
+        """
+    html_content += "</body></html>"
+    text_content = f"Er zijn {len(jobs)} nieuwe vacatures gevonden.\n"
+    for job in jobs:
+        text_content += f"""
+    Titel: {job.get('title', 'Geen titel')}
+    Bedrijf: {job.get('company_name', 'Onbekend bedrijf')}
+    Locatie: {job.get('location', 'Onbekende locatie')}
+    Link: {job.get('link', '')}
+    """
+    return text_content, html_content
+
+
+def make_jobs(count):
+    return [
+        {
+            "title": f"Consultant <Data & AI> {i}",
+            "company_name": f"Bedrijf {i % 13}",
+            "location": "Amsterdam",
+            "link": f"https://example.com/vacature/{i}",
+            "apply_options": [{"link": f"https://example.com/solliciteer/{i}"}],
+        }
+        for i in range(count)
+    ]
+
+
+def per_call(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e6
+
+
+def main():
+    renderer = AlertEmailRenderer(app.jinja_env)
+    print(f"{'vacatures':>10} {'f-string':>12} {'jinja':>12} {'jinja cache':>12}  (µs per e-mail)")
+    for count in (5, 50, 500):
+        jobs = make_jobs(count)
+        number = max(10, 5000 // count)
+
+        def uncached():
+            renderer.cache.clear()
+            renderer.render(jobs)
+
+        legacy = per_call(lambda: legacy_render(jobs), number)
+        jinja = per_call(uncached, number)
+        renderer.render(jobs)
+        cached = per_call(lambda: renderer.render(jobs), number)
+        print(f"{count:>10} {legacy:>12.1f} {jinja:>12.1f} {cached:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
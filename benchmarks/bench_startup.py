@@ -0,0 +1,80 @@
+"""Cold-start tijd en geheugen van de entry points (worker, web app, scraper)
+
+Gebruik:
+    python benchmarks/bench_startup.py --runs 10
+    python benchmarks/bench_startup.py --importtime worker   # top 15 van python -X importtime
+
+Start per entry point `--runs` keer een nieuw Python proces dat alleen de
+module importeert en meet de wall time en de piek RSS van dat proces (via
+wait4). Met --importtime worden de traagste imports (cumulatief) van één
+module getoond.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_pipeline import percentile
+
+# Module die elk entry point bij het opstarten importeert
+ENTRY_POINTS = {
+    "worker": "worker",
+    "web": "app",
+    "scraper": "job_alert",
+}
+
+
+def measure(module):
+    """Wall time (s) en piek RSS (MB) van één proces dat `module` importeert"""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-c", f"import {module}"], cwd=ROOT)
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        raise RuntimeError(f"import {module} mislukte met exit code {process.returncode}")
+    # ru_maxrss is in KB op Linux
+    return elapsed, usage.ru_maxrss / 1024
+
+
+def importtime(module, top=15):
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in output.splitlines():
+        match = re.match(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)", line)
+        if match:
+            rows.append((int(match.group(2)), len(match.group(3)), match.group(4)))
+    print(f"Traagste imports van {module} (cumulatief):")
+    for cumulative, depth, name in sorted(rows, reverse=True)[:top]:
+        print(f"  {cumulative / 1000:>8.1f} ms  {' ' * (depth - 1)}{name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--importtime", metavar="ENTRY_POINT", choices=ENTRY_POINTS)
+    args = parser.parse_args()
+
+    if args.importtime:
+        importtime(ENTRY_POINTS[args.importtime])
+        return
+
+    # Zonder import van de benchmarks zelf als baseline
+    for name, module in {"python": "sys", **ENTRY_POINTS}.items():
+        runs = [measure(module) for _ in range(args.runs)]
+        seconds = [elapsed for elapsed, _ in runs]
+        rss = [peak for _, peak in runs]
+        print(f"{name:>8}: p50 {percentile(seconds, 0.5) * 1000:7.1f} ms, "
+              f"min {min(seconds) * 1000:7.1f} ms, piek RSS {max(rss):6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Regressiecheck voor N+1 user queries in de worker
+
+Gebruik:
+    python benchmarks/bench_user_queries.py --alerts 10000
+
+Seedt alerts met elk een eigen gebruiker, draait check_jobs met elke
+laadstrategie uit ALERT_USER_LOADING en telt de SELECTs op de user tabel.
+Met eager loading moet dat aantal per batch constant zijn; anders faalt
+het script.
+"""
+import argparse
+import contextlib
+import io
+import math
+import os
+import sys
+import tempfile
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from query_count import assert_max_queries, count_queries
+from smtp_sink import SMTPSink
+
+sink = SMTPSink().start()
+db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{db_path}",
+    MAIL_SERVER="127.0.0.1",
+    MAIL_PORT=str(sink.port),
+    MAIL_USE_TLS="false",
+    MAIL_USERNAME="",
+    EMAIL_USER="alerts@example.com",
+)
+
+import worker
+from models import db, User, JobAlert
+from worker import app
+from scheduler import utcnow
+
+USER_SELECT = r"\bFROM user\b"
+
+
+def seed(alerts):
+    db.drop_all()
+    db.create_all()
+    now = utcnow()
+    db.session.execute(User.__table__.insert(), [
+        {"id": i + 1, "email": f"gebruiker{i}@example.com"} for i in range(alerts)
+    ])
+    db.session.execute(JobAlert.__table__.insert(), [
+        {
+            "user_id": i + 1,
+            "search_query": f"zoekterm {i % 50}",
+            "location": "Amsterdam",
+            "frequency": "daily",
+            "is_active": True,
+            "next_check_at": now - timedelta(hours=1),
+            "updated_at": now,
+        }
+        for i in range(alerts)
+    ])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--alerts", type=int, default=10000)
+    args = parser.parse_args()
+
+    batches = math.ceil(args.alerts / app.config["WORKER_BATCH_SIZE"])
+    with app.app_context():
+        for loading in ("select", "selectin", "joined"):
+            seed(args.alerts)
+            app.config["ALERT_USER_LOADING"] = loading
+            with count_queries(db.engine, USER_SELECT) as users, contextlib.redirect_stdout(io.StringIO()):
+                worker.check_jobs()
+            print(f"{loading:>9}: {users.count:>6} user queries")
+
+        # Regressiecheck voor de standaard strategie: hoogstens één user query per batch
+        seed(args.alerts)
+        app.config["ALERT_USER_LOADING"] = "selectin"
+        with assert_max_queries(db.engine, batches, USER_SELECT), contextlib.redirect_stdout(io.StringIO()):
+            worker.check_jobs()
+        print(f"OK: hoogstens {batches} user queries voor {args.alerts} alerts")
+    sink.stop()
+
+
+if __name__ == "__main__":
+    main()
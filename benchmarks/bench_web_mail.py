@@ -0,0 +1,116 @@
+"""Request latency van /forgot_password met een snelle en een trage SMTP server
+
+Gebruik:
+    python benchmarks/bench_web_mail.py --requests 60 --concurrency 4 --mail-latency 0.5
+    python benchmarks/bench_web_mail.py --blocking   # ter vergelijking: wachten op de aflevering
+
+Stuurt eerst reset requests terwijl de lokale SMTP sink direct antwoordt en
+daarna terwijl elk bericht `--mail-latency` seconden duurt, via de Flask
+test client vanuit meerdere threads. Rapporteert p50/p99 per fase en de
+afleverstatus uit EmailDelivery nadat de outbox leeg is. Eindigt met
+exit code 1 als de p99 met de trage server niet vlak blijft.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pipeline import percentile
+from smtp_sink import SMTPSink
+
+
+def run_phase(app, users, requests, concurrency):
+    """Stuur `requests` POSTs naar /forgot_password verdeeld over `concurrency` threads"""
+    latencies = []
+    lock = threading.Lock()
+
+    def client(index):
+        with app.test_client() as http:
+            for i in range(index, requests, concurrency):
+                start = time.perf_counter()
+                response = http.post("/forgot_password", data={"email": f"gebruiker{i % users}@example.com"})
+                elapsed = time.perf_counter() - start
+                assert response.status_code == 302, response.status_code
+                with lock:
+                    latencies.append(elapsed)
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=60, help="requests per fase")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--mail-latency", type=float, default=0.5, help="latency per bericht in de trage fase (s)")
+    parser.add_argument("--blocking", action="store_true", help="wacht in de request op de aflevering (oude gedrag)")
+    args = parser.parse_args()
+
+    sink = SMTPSink().start()
+    # config.py leest de configuratie bij het importeren
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'web.db')}",
+        MAIL_SERVER="127.0.0.1",
+        MAIL_PORT=str(sink.port),
+        MAIL_USE_TLS="false",
+        MAIL_USERNAME="",
+        EMAIL_USER="noreply@example.com",
+    )
+    from werkzeug.security import generate_password_hash
+    from app import create_app
+    from models import db, EmailDelivery, User
+
+    app = create_app()
+    app.config["SERVER_NAME"] = "localhost"
+    outbox = app.extensions["mail_outbox"]
+    with app.app_context():
+        db.create_all()
+        password_hash = generate_password_hash("x")
+        db.session.add_all([
+            User(email=f"gebruiker{i}@example.com", password_hash=password_hash) for i in range(args.users)
+        ])
+        db.session.commit()
+
+    if args.blocking:
+        put = outbox.put
+
+        def blocking_put(msg):
+            future = put(msg)
+            future.exception()
+            return future
+        outbox.put = blocking_put
+
+    results = {}
+    for phase, latency in (("snel", 0.0), ("traag", args.mail_latency)):
+        sink.message_latency = latency
+        results[phase] = run_phase(app, args.users, args.requests, args.concurrency)
+        p50, p99 = percentile(results[phase], 0.50), percentile(results[phase], 0.99)
+        print(f"{phase:>5} SMTP ({latency * 1000:.0f} ms per bericht): p50 {p50 * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    outbox.flush()
+    with app.app_context():
+        counts = dict(db.session.query(EmailDelivery.status, db.func.count()).group_by(EmailDelivery.status))
+    print(f"Outbox leeg na {time.perf_counter() - start:.1f}s, afleverstatus: {counts}, "
+          f"{len(sink.messages)} berichten ontvangen")
+    sink.stop()
+
+    fast_p99, slow_p99 = percentile(results["snel"], 0.99), percentile(results["traag"], 0.99)
+    # Vlak: hooguit twee keer de snelle p99, met wat marge voor ruis bij zeer korte requests
+    if slow_p99 > max(2 * fast_p99, fast_p99 + 0.02):
+        print(f"p99 niet vlak: {fast_p99 * 1000:.1f} ms -> {slow_p99 * 1000:.1f} ms")
+        sys.exit(1)
+    print(f"p99 vlak: {fast_p99 * 1000:.1f} ms -> {slow_p99 * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Schaalbenchmark voor meerdere worker processen met lease-based claiming
+
+Gebruik:
+    python benchmarks/bench_workers.py --alerts 400 --workers 1 2 4
+
+Seedt een SQLite database in WAL modus, laat 1, 2, ... worker processen
+elk één run doen tegen een lokale SerpApi stand-in en SMTP sink, en
+rapporteert de doorvoer. Controleert ook dat geen enkele alert dubbel
+verwerkt is.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from multiprocessing import get_context
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def seed(alerts):
+    from models import db, User, JobAlert
+    from worker import app
+    from scheduler import utcnow
+    from worker import enable_sqlite_wal
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        enable_sqlite_wal()
+        user = User(email="bench@example.com")
+        db.session.add(user)
+        db.session.commit()
+        now = utcnow()
+        db.session.execute(JobAlert.__table__.insert(), [
+            {
+                "user_id": user.id,
+                "search_query": f"zoekterm {i}",
+                "location": "Amsterdam",
+                "frequency": "daily",
+                "is_active": True,
+                "next_check_at": now - timedelta(hours=1),
+                "updated_at": now,
+            }
+            for i in range(alerts)
+        ])
+        db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--alerts", type=int, default=400)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--latency", type=float, default=0.05, help="latency per SerpApi request (s)")
+    parser.add_argument("--batch-size", type=int, default=20, help="alerts per claim")
+    args = parser.parse_args()
+
+    from serpapi_stub import SerpApiStub
+    from smtp_sink import SMTPSink
+
+    stub = SerpApiStub(latency=args.latency, pages=1).start()
+    sink = SMTPSink().start()
+    db_path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    # Spawn-processen lezen hun configuratie uit de environment
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{db_path}",
+        USE_MOCK_DATA="false",
+        SERPAPI_URL=stub.url,
+        SERPAPI_REQUESTS_PER_SECOND="10000",
+        SERPAPI_MAX_CONCURRENCY="1",
+        WORKER_BATCH_SIZE=str(args.batch_size),
+        MAIL_SERVER="127.0.0.1",
+        MAIL_PORT=str(sink.port),
+        MAIL_USE_TLS="false",
+        MAIL_USERNAME="",
+        EMAIL_USER="alerts@example.com",
+    )
+
+    import worker
+
+    baseline = None
+    for workers in args.workers:
+        seed(args.alerts)
+        sink.messages.clear()
+        start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+            futures = [pool.submit(worker.run_worker, None, True) for _ in range(workers)]
+            processed = [future.result()["alerts"] for future in futures]
+        elapsed = time.perf_counter() - start
+        throughput = args.alerts / elapsed
+        baseline = baseline or throughput / workers
+        duplicates = sum(processed) - args.alerts
+        print(f"{workers:>2} workers: {elapsed:6.2f}s, {throughput:7.1f} alerts/s "
+              f"({throughput / (baseline * workers):.0%} van lineair), verdeling {processed}, "
+              f"{len(sink.messages)} e-mails, {duplicates} dubbel")
+
+    stub.stop()
+    sink.stop()
+
+
+if __name__ == "__main__":
+    main()
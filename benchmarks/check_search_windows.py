@@ -0,0 +1,108 @@
+"""Regressiecheck voor het venster van gedeelde zoekopdrachten over batches heen
+
+Gebruik:
+    python benchmarks/check_search_windows.py
+
+Een dagelijkse en een wekelijkse alert op dezelfde zoekterm, beide op
+schema aan de beurt. De dagelijkse alert heeft de vacatures van de stand-in
+al ontvangen. Met WORKER_BATCH_SIZE=1 en 10 moet de zoekopdracht dezelfde
+date_posted filter krijgen (die van de wekelijkse alert) en moet de
+wekelijkse alert dezelfde vacatures ontvangen; anders faalt het script.
+Controleert ook de filter bij een controle precies één interval na de vorige.
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+from datetime import timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from serpapi_stub import SerpApiStub
+from smtp_sink import SMTPSink
+
+stub = SerpApiStub(pages=3, jobs_per_page=10).start()
+sink = SMTPSink().start()
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'check.db')}",
+    JOB_SOURCE="serpapi",
+    SERPAPI_URL=stub.url,
+    SERPAPI_KEY="check",
+    SERPAPI_CACHE="false",
+    SERPAPI_REQUESTS_PER_SECOND="1000",
+    QUOTA_DAILY_CALLS="0",
+    MAIL_SERVER="127.0.0.1",
+    MAIL_PORT=str(sink.port),
+    MAIL_USE_TLS="false",
+    MAIL_USERNAME="",
+    EMAIL_USER="alerts@example.com",
+)
+
+import worker
+from fingerprint import job_fingerprint
+from models import db, User, JobAlert, SentJob
+from scheduler import utcnow
+from search_state import date_posted_chip
+from worker import app
+
+QUERY = "python developer"
+
+
+def seed():
+    db.drop_all()
+    db.create_all()
+    now = utcnow()
+    # Twee gebruikers, anders komen beide alerts in digest mode in dezelfde batch
+    users = [User(email=f"gebruiker{i}@example.com", password_hash="x") for i in range(2)]
+    db.session.add_all(users)
+    db.session.flush()
+    # De dagelijkse alert komt als eerste aan de beurt, dus met batch size 1 in een eigen batch
+    daily = JobAlert(user_id=users[0].id, search_query=QUERY, frequency="daily",
+                     last_check=now - timedelta(days=1, minutes=5), next_check_at=now - timedelta(minutes=5))
+    weekly = JobAlert(user_id=users[1].id, search_query=QUERY, frequency="weekly",
+                      last_check=now - timedelta(days=7, minutes=1), next_check_at=now - timedelta(minutes=1))
+    db.session.add_all([daily, weekly])
+    db.session.flush()
+    first_page = stub.page({"q": QUERY, "location": "Netherlands"})["jobs_results"]
+    db.session.add_all(SentJob(alert_id=daily.id, job_fingerprint=job_fingerprint(job), sent_at=now - timedelta(days=1))
+                       for job in first_page)
+    db.session.commit()
+    return weekly.id
+
+
+def run(batch_size):
+    weekly_id = seed()
+    app.config["WORKER_BATCH_SIZE"] = batch_size
+    stub.chips.clear()
+    with contextlib.redirect_stdout(io.StringIO()):
+        worker.check_jobs()
+    received = SentJob.query.filter_by(alert_id=weekly_id).count()
+    return dict(stub.chips), received
+
+
+def main():
+    now = utcnow()
+    for frequency, interval, chip in (("daily", timedelta(days=1), "date_posted:today"),
+                                      ("weekly", timedelta(weeks=1), "date_posted:week")):
+        # Een controle op schema, iets na precies één interval
+        actual = date_posted_chip(now - interval - timedelta(minutes=5), now)
+        if actual != chip:
+            raise AssertionError(f"{frequency}: {actual} in plaats van {chip}")
+
+    with app.app_context():
+        results = {batch_size: run(batch_size) for batch_size in (1, 10)}
+    for batch_size, (chips, received) in results.items():
+        print(f"batch size {batch_size:>2}: filters {chips}, wekelijkse alert ontving {received} vacatures")
+    if results[1] != results[10]:
+        raise AssertionError("het venster van de zoekopdracht hangt af van de batchgrenzen")
+    if results[1][0] != {"date_posted:week": 3}:
+        raise AssertionError(f"verwacht drie pagina's met date_posted:week, kreeg {results[1][0]}")
+    print("OK: zelfde venster en vacatures ongeacht de batchgrootte")
+    stub.stop()
+    sink.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Hulpmiddelen om SQL statements te tellen in benchmarks en regressiechecks"""
+import re
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+class QueryCounter:
+    def __init__(self, pattern=None):
+        self.pattern = re.compile(pattern, re.IGNORECASE) if pattern else None
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.pattern is None or self.pattern.search(statement):
+            self.statements.append(statement)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries(engine, pattern=None):
+    """Tel de statements (optioneel alleen die op `pattern` matchen) binnen het blok"""
+    counter = QueryCounter(pattern)
+    event.listen(engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
+
+
+@contextmanager
+def assert_max_queries(engine, limit, pattern=None):
+    """Faal als het blok meer dan `limit` statements uitvoert"""
+    with count_queries(engine, pattern) as counter:
+        yield counter
+    if counter.count > limit:
+        raise AssertionError(
+            f"{counter.count} queries uitgevoerd, maximaal {limit} verwacht"
+            + (f" (patroon {counter.pattern.pattern!r})" if counter.pattern else "")
+        )
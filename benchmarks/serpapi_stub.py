@@ -0,0 +1,104 @@
+"""Lokale stand-in voor de SerpApi google_jobs endpoint
+
+Serveert deterministische pagina's met vacatures per zoekterm, met een
+instelbare latency. Ondersteunt keep-alive (HTTP/1.1) zodat connection
+pooling van de client gemeten kan worden. Met `error_rate` geeft een deel
+van de requests een 503, met `down` alle requests (een storing). `chips`
+telt de gevraagde date_posted filters.
+"""
+import json
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# Verschillende woorden per vacature, zodat ze ook voor de near-duplicate detectie verschillen
+ROLES = ["Python", "Java", "Data", "Sales", "Marketing", "Finance", "HR", "Support", "Cloud", "Security"]
+TITLES = ["Developer", "Analist", "Manager", "Consultant", "Adviseur", "Medewerker", "Teamleider"]
+COMPANIES = ["Van Dijk", "De Vries", "Jansen", "Bakker", "Visser", "Smit", "Meijer", "Mulder", "Bos", "Vos", "Peters"]
+SECTORS = ["Logistiek", "Software", "Techniek", "Zorggroep", "Consultancy", "Bouw", "Media", "Energie", "Retail"]
+
+
+class SerpApiStub:
+    def __init__(self, latency=0.0, pages=3, jobs_per_page=10, port=0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.pages = pages
+        self.jobs_per_page = jobs_per_page
+        self.error_rate = error_rate
+        self.down = False
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.chips = Counter()
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with stub.lock:
+                    stub.requests += 1
+                    failed = stub.down or stub.random.random() < stub.error_rate
+                    if failed:
+                        stub.errors += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if failed:
+                    self.send_response(503)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                params = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+                with stub.lock:
+                    stub.chips[params.get("chips")] += 1
+                body = json.dumps(stub.page(params)).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}/search"
+
+    def page(self, params):
+        query = params.get("q", "")
+        # Elke zoekterm zijn eigen bedrijven
+        offset = zlib.crc32(query.encode("utf-8"))
+        page = int(params.get("next_page_token", "0"))
+        jobs = [
+            {
+                "title": f"{query} {ROLES[n % len(ROLES)]} {TITLES[n // len(ROLES) % len(TITLES)]} {n}",
+                "company_name": f"{COMPANIES[(offset + n) % len(COMPANIES)]} "
+                                f"{SECTORS[(offset // len(COMPANIES) + n) % len(SECTORS)]}",
+                "location": params.get("location", ""),
+                "link": f"https://example.com/{query}/{page}/{n % self.jobs_per_page}",
+            }
+            for n in range(page * self.jobs_per_page, (page + 1) * self.jobs_per_page)
+        ]
+        data = {"jobs_results": jobs}
+        if page + 1 < self.pages:
+            data["serpapi_pagination"] = {"next_page_token": str(page + 1)}
+        return data
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
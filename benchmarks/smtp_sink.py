@@ -0,0 +1,103 @@
+"""Lokale SMTP stand-in die berichten opvangt in plaats van ze te versturen
+
+Spreekt net genoeg SMTP (EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT) voor
+smtplib zonder STARTTLS of login. Met `handshake_latency` en `message_latency`
+kan een trage mailserver nagebootst worden, met `failure_rate` een server
+die een deel van de berichten tijdelijk weigert (451).
+"""
+import random
+import socketserver
+import threading
+import time
+
+
+class SMTPSink:
+    def __init__(self, handshake_latency=0.0, message_latency=0.0, failure_rate=0.0, port=0, seed=0):
+        self.handshake_latency = handshake_latency
+        self.message_latency = message_latency
+        self.failure_rate = failure_rate
+        self.failures = 0
+        self.random = random.Random(seed)
+        self.messages = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            disable_nagle_algorithm = True
+
+            def reply(self, line):
+                self.wfile.write(line.encode("ascii") + b"\r\n")
+
+            def handle(self):
+                with sink.lock:
+                    sink.connections += 1
+                if sink.handshake_latency:
+                    time.sleep(sink.handshake_latency)
+                self.reply("220 sink ESMTP")
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    command = line.decode("ascii", "replace").strip().upper()
+                    if command.startswith(("EHLO", "HELO")):
+                        self.reply("250 sink")
+                    elif command.startswith("DATA"):
+                        self.reply("354 einde met <CRLF>.<CRLF>")
+                        data = []
+                        while True:
+                            chunk = self.rfile.readline()
+                            if not chunk or chunk in (b".\r\n", b".\n"):
+                                break
+                            data.append(chunk)
+                        if sink.message_latency:
+                            time.sleep(sink.message_latency)
+                        with sink.lock:
+                            failed = sink.random.random() < sink.failure_rate
+                            if failed:
+                                sink.failures += 1
+                            else:
+                                sink.messages.append(b"".join(data))
+                        self.reply("451 tijdelijk niet beschikbaar" if failed else "250 OK")
+                    elif command.startswith("QUIT"):
+                        self.reply("221 tot ziens")
+                        return
+                    else:
+                        self.reply("250 OK")
+
+        self.server = socketserver.ThreadingTCPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def config(self, **overrides):
+        """Mail configuratie (zoals in config.py) die naar deze sink wijst"""
+        settings = {
+            "MAIL_SERVER": "127.0.0.1",
+            "MAIL_PORT": self.port,
+            "MAIL_USE_TLS": False,
+            "MAIL_DEFAULT_SENDER": "alerts@example.com",
+            "MAIL_USERNAME": None,
+            "MAIL_PASSWORD": None,
+            "MAIL_POOL_SIZE": 2,
+            "MAIL_MAX_MESSAGES_PER_CONNECTION": 100,
+            "MAIL_TIMEOUT": 10,
+            "RETRY_ATTEMPTS": 3,
+            "RETRY_BASE_DELAY": 0.05,
+            "RETRY_MAX_DELAY": 1,
+            "CIRCUIT_FAILURE_THRESHOLD": 5,
+            "CIRCUIT_RESET_SECONDS": 5,
+        }
+        settings.update(overrides)
+        return settings
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -1,4 +1,7 @@
-from app import app, db, User, JobAlert
+from app import create_app
+from models import db, User, JobAlert, SentJob
+
+app = create_app()
 
 def cleanup_alerts():
     with app.app_context():
@@ -6,7 +9,9 @@ def cleanup_alerts():
         test_user = User.query.filter_by(email='test@example.com').first()
         
         if test_user:
-            # Verwijder alle alerts van deze gebruiker
+            # Verwijder alle alerts van deze gebruiker, inclusief verstuurde vacatures
+            alert_ids = [alert.id for alert in test_user.job_alerts]
+            SentJob.query.filter(SentJob.alert_id.in_(alert_ids)).delete(synchronize_session=False)
             JobAlert.query.filter_by(user_id=test_user.id).delete()
             
             # Verwijder de gebruiker
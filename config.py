@@ -7,6 +7,138 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Bron van vacatures: 'serpapi', 'mock', 'indeed' of 'synthetic' (USE_MOCK_DATA=true kiest 'mock')
+    JOB_SOURCE = os.getenv('JOB_SOURCE', 'mock' if os.getenv('USE_MOCK_DATA', 'true').lower() == 'true' else 'serpapi')
+    MOCK_DATA_FILE = os.getenv('MOCK_DATA_FILE', 'mock_jobs.json')
+    INDEED_QUERY = os.getenv('INDEED_QUERY', 'commercieel')
+    INDEED_LOCATION = os.getenv('INDEED_LOCATION', 'nederland')
+    # Indeed scraper: aantal resultatenpagina's, hoeveel tegelijk, en de HTML parser
+    # ('auto' kiest selectolax of lxml als die geïnstalleerd zijn, anders de streaming parser)
+    INDEED_PAGES = int(os.getenv('INDEED_PAGES', '1'))
+    INDEED_CONCURRENCY = int(os.getenv('INDEED_CONCURRENCY', '4'))
+    INDEED_PARSER = os.getenv('INDEED_PARSER', 'auto')
+    # Journal van verstuurde vacatures van job_alert.py, en hoe lang een vacature als gezien telt (dagen)
+    SEEN_JOBS_PATH = os.getenv('SEEN_JOBS_PATH', 'seen_jobs.journal')
+    SEEN_JOBS_RETENTION_DAYS = int(os.getenv('SEEN_JOBS_RETENTION_DAYS', '365'))
+    # Synthetische bron voor load tests: aantal vacatures, seed en fractie (bijna-)dubbele vacatures
+    SYNTHETIC_JOBS = int(os.getenv('SYNTHETIC_JOBS', '1000'))
+    SYNTHETIC_SEED = int(os.getenv('SYNTHETIC_SEED', '0'))
+    SYNTHETIC_DUPLICATE_RATE = float(os.getenv('SYNTHETIC_DUPLICATE_RATE', '0.1'))
+    SYNTHETIC_NEAR_DUPLICATE_RATE = float(os.getenv('SYNTHETIC_NEAR_DUPLICATE_RATE', '0.05'))
+
+    # SerpApi fetch engine
+    SERPAPI_URL = os.getenv('SERPAPI_URL', 'https://serpapi.com/search')
+    SERPAPI_REQUESTS_PER_SECOND = float(os.getenv('SERPAPI_REQUESTS_PER_SECOND', '5'))
+    SERPAPI_MAX_CONCURRENCY = int(os.getenv('SERPAPI_MAX_CONCURRENCY', '8'))
+    # Cache van SerpApi responses, gedeeld tussen runs en workers (SQLite bestand); standaard uit
+    SERPAPI_CACHE = os.getenv('SERPAPI_CACHE', 'false').lower() == 'true'
+    SERPAPI_CACHE_PATH = os.getenv('SERPAPI_CACHE_PATH', 'instance/serpapi_cache.db')
+    # Hoe lang een response vers is en hoe lang hij daarna nog stale gebruikt wordt (seconden)
+    SERPAPI_CACHE_TTL = float(os.getenv('SERPAPI_CACHE_TTL', '3600'))
+    SERPAPI_CACHE_STALE = float(os.getenv('SERPAPI_CACHE_STALE', '3600'))
+    SERPAPI_CACHE_MAX_MB = float(os.getenv('SERPAPI_CACHE_MAX_MB', '200'))
+    # Niet uit de cache lezen (wel nieuwe responses opslaan), bijv. om een zoekopdracht te forceren
+    SERPAPI_CACHE_BYPASS = os.getenv('SERPAPI_CACHE_BYPASS', 'false').lower() == 'true'
+    # Archief van ruwe SerpApi responses (leeg is uit): roterende JSONL segmenten, gzip of zstd
+    SERPAPI_ARCHIVE_DIR = os.getenv('SERPAPI_ARCHIVE_DIR', '')
+    SERPAPI_ARCHIVE_SEGMENT_MB = float(os.getenv('SERPAPI_ARCHIVE_SEGMENT_MB', '64'))
+    SERPAPI_ARCHIVE_COMPRESSION = os.getenv('SERPAPI_ARCHIVE_COMPRESSION', 'gzip')
+    # Speel responses terug uit het archief (map, segment of glob) in plaats van SerpApi aan te roepen
+    SERPAPI_REPLAY = os.getenv('SERPAPI_REPLAY', '')
+    # Terugspelen schrijft naar de database en verstuurt e-mail: alleen als deze URL gelijk is aan
+    # DATABASE_URL (een wegwerp kopie) en MAIL_SERVER lokaal is, tenzij SERPAPI_REPLAY_UNSAFE
+    SERPAPI_REPLAY_DATABASE = os.getenv('SERPAPI_REPLAY_DATABASE', '')
+    SERPAPI_REPLAY_UNSAFE = os.getenv('SERPAPI_REPLAY_UNSAFE', 'false').lower() == 'true'
+    # Hoe lang bijgehouden wordt welke vacatures een zoekopdracht al opleverde (dagen)
+    SEARCH_HISTORY_DAYS = int(os.getenv('SEARCH_HISTORY_DAYS', '30'))
+    # Hoe alerts aan vacatures gekoppeld worden: 'search' (remote zoekopdracht per unieke
+    # zoekopdracht) of 'store' (matchen tegen de lokale job store, gevuld door job_store.py)
+    JOB_MATCHING = os.getenv('JOB_MATCHING', 'search')
+    # Dagbudget aan SerpApi calls (0 is uit): zoekopdrachten die weinig nieuwe vacatures opleveren
+    # worden minder vaak en met minder pagina's gecontroleerd, nooit vaker dan de frequentie van
+    # hun alerts. De opbrengst per zoekopdracht vervalt met QUOTA_HALF_LIFE_DAYS; een zoekopdracht
+    # wordt minstens eens per QUOTA_MAX_INTERVAL_DAYS gecontroleerd (of volgens zijn frequentie,
+    # als die langer is) en het plan wordt elke QUOTA_PLAN_SECONDS herberekend
+    QUOTA_DAILY_CALLS = int(os.getenv('QUOTA_DAILY_CALLS', '0'))
+    QUOTA_HALF_LIFE_DAYS = float(os.getenv('QUOTA_HALF_LIFE_DAYS', '7'))
+    QUOTA_MAX_INTERVAL_DAYS = float(os.getenv('QUOTA_MAX_INTERVAL_DAYS', '7'))
+    QUOTA_PLAN_SECONDS = float(os.getenv('QUOTA_PLAN_SECONDS', '600'))
+    # Na hoeveel uur een gevonden vacature nog half zoveel waard is, en hoeveel van die vacatures
+    # een extra call minstens moet opleveren
+    QUOTA_FRESHNESS_HOURS = float(os.getenv('QUOTA_FRESHNESS_HOURS', '24'))
+    QUOTA_MIN_YIELD = float(os.getenv('QUOTA_MIN_YIELD', '0.05'))
+    # Bijna-dubbele vacatures (zelfde vacature via andere bronnen of met een iets andere titel)
+    # samenvoegen tot één vacature met alle links: MinHash/LSH index in een eigen SQLite bestand,
+    # Jaccard similariteit vanaf NEAR_DUPLICATE_THRESHOLD, signatures van NEAR_DUPLICATE_PERMUTATIONS
+    # waarden (veelvoud van 32); clusters die SEARCH_HISTORY_DAYS niet gezien zijn vervallen.
+    # Staat standaard uit: samengevoegde vacatures krijgen de titel en links van hun cluster
+    NEAR_DUPLICATES = os.getenv('NEAR_DUPLICATES', 'false').lower() == 'true'
+    NEAR_DUPLICATES_PATH = os.getenv('NEAR_DUPLICATES_PATH', 'instance/near_duplicates.db')
+    NEAR_DUPLICATE_THRESHOLD = float(os.getenv('NEAR_DUPLICATE_THRESHOLD', '0.7'))
+    NEAR_DUPLICATE_PERMUTATIONS = int(os.getenv('NEAR_DUPLICATE_PERMUTATIONS', '256'))
+
+    # Uitgaande calls (SerpApi, Indeed, SMTP): timeouts (seconden), retries met exponentiële
+    # backoff en jitter bij tijdelijke fouten, en een circuit breaker per doel
+    HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+    HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '30'))
+    RETRY_ATTEMPTS = int(os.getenv('RETRY_ATTEMPTS', '3'))
+    RETRY_BASE_DELAY = float(os.getenv('RETRY_BASE_DELAY', '0.5'))
+    RETRY_MAX_DELAY = float(os.getenv('RETRY_MAX_DELAY', '10'))
+    # Aantal opeenvolgende fouten waarna de breaker opengaat, en hoe lang hij open blijft
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+    CIRCUIT_RESET_SECONDS = float(os.getenv('CIRCUIT_RESET_SECONDS', '30'))
+
+    # Worker: hoe vaak de scheduler op nieuwe of gewijzigde alerts controleert (seconden)
+    WORKER_POLL_INTERVAL = float(os.getenv('WORKER_POLL_INTERVAL', '5'))
+    # Worker: marge waarmee de scheduler wijzigingen opnieuw leest (trage transacties, klokverschil
+    # tussen servers) en hoe vaak hij alle alerts opnieuw inleest (seconden)
+    WORKER_SYNC_MARGIN = float(os.getenv('WORKER_SYNC_MARGIN', '60'))
+    WORKER_FULL_SYNC_INTERVAL = float(os.getenv('WORKER_FULL_SYNC_INTERVAL', '900'))
+    # Worker: aantal alerts dat per keer geladen en in één transactie gecommit wordt
+    WORKER_BATCH_SIZE = int(os.getenv('WORKER_BATCH_SIZE', '500'))
+    # Worker: hoe lang een geclaimde batch alerts bij deze worker blijft (seconden)
+    WORKER_LEASE_SECONDS = int(os.getenv('WORKER_LEASE_SECONDS', '600'))
+    # Worker: hoe gebruikers bij alerts geladen worden ('selectin', 'joined' of 'select' voor lazy)
+    ALERT_USER_LOADING = os.getenv('ALERT_USER_LOADING', 'selectin')
+    # Worker: 'digest' bundelt de nieuwe vacatures van alle due alerts van een gebruiker in
+    # één e-mail per batch, 'alert' (standaard) stuurt één e-mail per alert
+    ALERT_EMAIL_MODE = os.getenv('ALERT_EMAIL_MODE', 'alert')
+    # Worker: hoe lang een batch op de aflevering van zijn e-mails wacht (seconden); vacatures
+    # gelden pas als verstuurd als de aflevering bevestigd is
+    WORKER_DELIVERY_TIMEOUT = float(os.getenv('WORKER_DELIVERY_TIMEOUT', '300'))
+
+    # Prometheus metrics op /metrics (web app) en op een eigen poort per worker proces. De web app
+    # toont ze alleen met METRICS_TOKEN als bearer token of aan de beheerder; de worker luistert
+    # standaard alleen lokaal en vraagt het token als dat gezet is
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+    WORKER_METRICS_HOST = os.getenv('WORKER_METRICS_HOST', '127.0.0.1')
+    WORKER_METRICS_PORT = int(os.getenv('WORKER_METRICS_PORT', '9100'))
+    # Logniveau van de worker (DEBUG toont elke alert)
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+
+    # Profileren van worker runs (--profile): 'stacks' of 'cprofile', leeg is uit
+    PROFILE_MODE = os.getenv('PROFILE_MODE', '')
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+    # Fractie van de runs die geprofileerd wordt en het sample interval van de stack sampler
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '1.0'))
+    PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '10'))
+    # Aantal traagste alerts waarvan ook een eigen collapsed stack bestand geschreven wordt
+    PROFILE_ALERT_FILES = int(os.getenv('PROFILE_ALERT_FILES', '0'))
+    # Ook de stacks van de andere threads (SMTP, fetch pool) bemonsteren; duurder per sample
+    PROFILE_ALL_THREADS = os.getenv('PROFILE_ALL_THREADS', 'false').lower() == 'true'
+
+    # SMTP outbox
+    MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
+    MAIL_PORT = int(os.getenv('MAIL_PORT', '587'))
+    MAIL_USE_TLS = os.getenv('MAIL_USE_TLS', 'true').lower() == 'true'
+    MAIL_DEFAULT_SENDER = os.getenv('EMAIL_USER')
+    MAIL_USERNAME = os.getenv('MAIL_USERNAME', os.getenv('EMAIL_USER'))
+    MAIL_PASSWORD = os.getenv('EMAIL_PASSWORD')
+    MAIL_POOL_SIZE = int(os.getenv('MAIL_POOL_SIZE', '2'))
+    MAIL_MAX_MESSAGES_PER_CONNECTION = int(os.getenv('MAIL_MAX_MESSAGES_PER_CONNECTION', '100'))
+    MAIL_TIMEOUT = float(os.getenv('MAIL_TIMEOUT', '30'))
+
 class DevelopmentConfig(Config):
     SQLALCHEMY_DATABASE_URI = 'sqlite:///kayak_jobs.db'
     DEBUG = True
@@ -1,7 +1,10 @@
-from app import app, db, User, JobAlert
+from app import create_app
+from models import db, User, JobAlert
 from datetime import datetime, UTC
 from werkzeug.security import generate_password_hash
 
+app = create_app()
+
 def create_test_alert():
     with app.app_context():
         # Controleer of de test gebruiker bestaat
@@ -30,8 +33,7 @@ def create_test_alert():
                 search_query='Python',
                 location='Amsterdam',
                 is_active=True,
-                last_check=datetime.now(UTC),
-                sent_job_ids='[]'
+                last_check=datetime.now(UTC)
             )
             db.session.add(test_alert)
             db.session.commit()
@@ -0,0 +1,91 @@
+from collections import OrderedDict, namedtuple
+
+from metrics import CACHE_HITS, CACHE_MISSES
+
+EmailJob = namedtuple('EmailJob', ['title', 'company', 'location', 'link', 'other_links'], defaults=((),))
+DigestSection = namedtuple('DigestSection', ['title', 'jobs'])
+
+
+def job_link(job):
+    """De sollicitatielink uit apply_options, anders de link van de vacature zelf"""
+    apply_options = job.get('apply_options') or []
+    if apply_options:
+        link = apply_options[0].get('link')
+        if link:
+            return link
+    return job.get('link', '')
+
+
+def other_links(job, link):
+    """De overige links van een samengevoegde vacature (zie near_duplicates), zonder `link` zelf"""
+    links = [option.get('link') for option in (job.get('apply_options') or [])[1:]] + (job.get('links') or [])
+    return tuple(other for other in dict.fromkeys(links) if other and other != link)
+
+
+def email_job(job):
+    """Vacature in de vorm die de e-mail templates verwachten"""
+    link = job_link(job)
+    return EmailJob(
+        job.get('title') or 'Geen titel',
+        job.get('company_name') or job.get('company') or 'Onbekend bedrijf',
+        job.get('location') or 'Onbekende locatie',
+        link,
+        other_links(job, link) if job.get('links') else (),
+    )
+
+
+class AlertEmailRenderer:
+    """Rendert alert e-mails met voorgecompileerde Jinja templates
+
+    De templates worden één keer uit de Jinja environment van de Flask app
+    geladen (autoescape voor .html, niet voor .txt). Gerenderde bodies worden
+    per joblijst gecachet, zodat alerts met dezelfde nieuwe vacatures één
+    render delen. Digests bundelen de vacatures van meerdere alerts van één
+    gebruiker, met een kop per alert.
+    """
+
+    def __init__(self, jinja_env, html_template='email/job_alert.html',
+                 text_template='email/job_alert.txt', cache_size=256,
+                 digest_html_template='email/job_digest.html',
+                 digest_text_template='email/job_digest.txt'):
+        self.html_template = jinja_env.get_template(html_template)
+        self.text_template = jinja_env.get_template(text_template)
+        self.digest_html_template = jinja_env.get_template(digest_html_template)
+        self.digest_text_template = jinja_env.get_template(digest_text_template)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, jobs):
+        """Geef (plain text, html) voor een lijst vacatures terug"""
+        key = tuple(email_job(job) for job in jobs)
+        return self._cached(key, lambda: (
+            self.text_template.render(jobs=key),
+            self.html_template.render(jobs=key),
+        ))
+
+    def render_digest(self, sections):
+        """Geef (plain text, html) voor een digest: [(kop, vacatures)] per alert"""
+        key = tuple(DigestSection(title, tuple(email_job(job) for job in jobs)) for title, jobs in sections)
+        total = sum(len(section.jobs) for section in key)
+        return self._cached(('digest',) + key, lambda: (
+            self.digest_text_template.render(sections=key, total=total),
+            self.digest_html_template.render(sections=key, total=total),
+        ))
+
+    def _cached(self, key, render):
+        bodies = self.cache.get(key)
+        if bodies is not None:
+            self.cache.move_to_end(key)
+            self.hits += 1
+            CACHE_HITS.labels('email_render').inc()
+            return bodies
+
+        self.misses += 1
+        CACHE_MISSES.labels('email_render').inc()
+        bodies = render()
+        self.cache[key] = bodies
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return bodies
@@ -0,0 +1,236 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from fingerprint import job_fingerprint
+from metrics import API_CALLS
+from resilience import CircuitBreaker, RetryPolicy, TransientError, call_with_retries
+from response_cache import STALE
+
+logger = logging.getLogger(__name__)
+
+
+class SearchError(Exception):
+    """SerpApi gaf een blijvende foutstatus (bijv. 401 of 400); de zoekopdracht is niet gelukt"""
+
+
+class TokenBucket:
+    """Globale rate limiter: maximaal `rate` requests per seconde, met bursts tot `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blokkeer tot er een token beschikbaar is"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_transient(error):
+    """Verbindingsfouten, timeouts en 429/5xx responses zijn het opnieuw proberen waard"""
+    return isinstance(error, (TransientError, requests.ConnectionError, requests.Timeout))
+
+
+class FetchEngine:
+    """Haalt zoekopdrachten gelijktijdig op via één gedeelde HTTP sessie
+
+    Pagina's binnen één zoekopdracht worden op volgorde opgehaald (de
+    next_page_token komt uit de vorige pagina); verschillende zoekopdrachten
+    lopen parallel, begrensd door `max_concurrency` en de globale token bucket.
+    Met een `cache` (ResponseCache) worden pagina's eerst in de cache gezocht;
+    stale pagina's worden gebruikt en op de achtergrond ververst. Met een
+    `archive` (ResponseArchive) wordt elke response van de API ook ruw
+    weggeschreven; met een `replay` (ResponseReplay) komen de responses uit
+    het archief, zonder netwerk en zonder rate limit.
+
+    Elk request heeft een (connect, read) `timeout`; verbindingsfouten, 429
+    en 5xx worden volgens `retry` (RetryPolicy) opnieuw geprobeerd en tellen
+    mee voor de `breaker`, zodat zoekopdrachten direct falen zolang SerpApi
+    onbereikbaar is.
+    """
+
+    def __init__(self, url, requests_per_second=5, max_concurrency=8, max_pages=3, max_jobs=25, cache=None,
+                 archive=None, replay=None, timeout=(5, 30), breaker=None, retry=None):
+        self.url = url
+        self.max_concurrency = max_concurrency
+        self.max_pages = max_pages
+        self.max_jobs = max_jobs
+        self.limiter = TokenBucket(requests_per_second)
+        self.cache = cache
+        self.archive = archive
+        self.replay = replay
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker('serpapi')
+        self.retry = retry or RetryPolicy()
+        self.revalidator = ThreadPoolExecutor(max_workers=2) if cache else None
+        self.revalidating = set()
+        self.lock = threading.Lock()
+
+        # Keep-alive connection pool, groot genoeg voor alle threads
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, params):
+        """Eén HTTP request; 429 en 5xx worden een TransientError"""
+        self.limiter.acquire()
+        response = self.session.get(self.url, params=params, timeout=self.timeout)
+        API_CALLS.inc()
+        if response.status_code == 429 or response.status_code >= 500:
+            if self.archive is not None:
+                self.archive.write(params, response.status_code, error=response.text)
+            retry_after = response.headers.get('Retry-After')
+            raise TransientError(
+                f"SerpApi gaf {response.status_code} voor {params.get('q')}",
+                float(retry_after) if retry_after and retry_after.isdigit() else None,
+            )
+        return response
+
+    def request(self, params):
+        """Eén API call met retries; geeft de JSON response terug
+
+        Blijft SerpApi na de retries onbereikbaar (of staat de breaker open),
+        of geeft hij een andere foutstatus, dan komt de fout naar de aanroeper
+        in plaats van een lege pagina. Bij teruggespelen is een ontbrekende of
+        foutieve response None.
+        """
+        if self.replay is not None:
+            return self.replay.get(params)
+
+        response = call_with_retries(lambda: self.get(params), self.breaker, self.retry, is_transient)
+        if response.status_code != 200:
+            logger.error("Error response voor %s: %s %s", params.get('q'), response.status_code, response.text)
+            if self.archive is not None:
+                self.archive.write(params, response.status_code, error=response.text)
+            raise SearchError(f"SerpApi gaf {response.status_code} voor {params.get('q')}")
+        data = response.json()
+        if self.archive is not None:
+            self.archive.write(params, response.status_code, data)
+        return data
+
+    def fetch_page(self, params, ttl=None):
+        """Eén pagina uit de cache of van de API; geeft (data of None, api_calls) terug"""
+        if self.cache is not None:
+            data, status = self.cache.get(params)
+            if data is not None:
+                if status == STALE:
+                    self.revalidate(params, ttl)
+                return data, 0
+
+        data = self.request(params)
+        if data is not None and self.cache is not None:
+            self.cache.put(params, data, ttl)
+        # Een teruggespeelde response kost geen API call
+        return data, 0 if self.replay is not None else 1
+
+    def revalidate(self, params, ttl):
+        """Ververs een stale pagina op de achtergrond (één keer per pagina tegelijk)"""
+        params = dict(params)
+        key = tuple(sorted(params.items()))
+        with self.lock:
+            if key in self.revalidating:
+                return
+            self.revalidating.add(key)
+
+        def refresh():
+            try:
+                data = self.request(params)
+                if data is not None:
+                    self.cache.put(params, data, ttl)
+            except Exception as e:
+                logger.warning("Verversen van %s uit de cache mislukt: %s", params.get('q'), e)
+            finally:
+                with self.lock:
+                    self.revalidating.discard(key)
+        self.revalidator.submit(refresh)
+
+    def search(self, params, known=None, ttl=None, max_pages=None):
+        """Haal alle pagina's van één zoekopdracht op; geeft de vacatures en het aantal API calls terug
+
+        Met `known` (fingerprints die deze zoekopdracht eerder opleverde) stopt
+        de paginering zodra een pagina alleen nog bekende vacatures bevat.
+        `ttl` is de versheid (seconden) van de pagina's in de cache en
+        `max_pages` het aantal pagina's voor deze zoekopdracht (standaard
+        dat van de engine).
+        """
+        params = dict(params)
+        all_jobs = []
+        api_calls = 0
+
+        for page in range(max_pages or self.max_pages):
+            data, calls = self.fetch_page(params, ttl)
+            api_calls += calls
+            if data is None:
+                break
+
+            if "jobs_results" not in data:
+                logger.info("Geen vacatures gevonden in response voor %s", params.get('q'))
+                break
+
+            jobs = data["jobs_results"]
+            all_jobs.extend(jobs)
+
+            # Alles op deze pagina kenden we al: verdere pagina's zijn ouder
+            if known is not None and all(job_fingerprint(job) in known for job in jobs):
+                break
+
+            # Controleer of we genoeg resultaten hebben
+            if len(all_jobs) >= self.max_jobs:
+                all_jobs = all_jobs[:self.max_jobs]
+                break
+
+            # Controleer of er een volgende pagina is
+            next_page_token = data.get("serpapi_pagination", {}).get("next_page_token")
+            if not next_page_token:
+                break
+            params["next_page_token"] = next_page_token
+
+        return all_jobs, api_calls
+
+    def search_many(self, searches, known=None, ttls=None, pages=None):
+        """Voer een dict {sleutel: params} gelijktijdig uit
+
+        `known` is een optionele dict {sleutel: fingerprints} voor vroeg stoppen,
+        `ttls` een optionele dict {sleutel: cache TTL in seconden} en `pages`
+        een optionele dict {sleutel: maximum aantal pagina's}.
+        Geeft {sleutel: (vacatures, api_calls)} terug; een mislukte zoekopdracht
+        levert de exceptie op in plaats van een resultaat.
+        """
+        known = known or {}
+        ttls = ttls or {}
+        pages = pages or {}
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = {
+                key: executor.submit(self.search, params, known.get(key), ttls.get(key), pages.get(key))
+                for key, params in searches.items()
+            }
+            for key, future in futures.items():
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    results[key] = e
+        return results
+
+    def close(self):
+        """Wacht op lopende verversingen van de cache en sluit de HTTP sessie"""
+        if self.revalidator is not None:
+            self.revalidator.shutdown(wait=True)
+        self.session.close()
@@ -0,0 +1,51 @@
+import hashlib
+import re
+import unicodedata
+
+_WHITESPACE = re.compile(r'\s+')
+_SEPARATOR = '\x1f'
+
+
+def canonicalize(value):
+    """Normaliseer een tekstveld: unicode NFKC, hoofdletterongevoelig en witruimte samengevoegd"""
+    value = unicodedata.normalize('NFKC', value or '')
+    return _WHITESPACE.sub(' ', value).strip().casefold()
+
+
+def canonical_job(job):
+    """Genormaliseerde (titel, bedrijf, locatie) van een vacature
+
+    Accepteert zowel SerpApi records (`company_name`) als records van de
+    Indeed scraper (`company`).
+    """
+    return (
+        canonicalize(job.get('title')),
+        canonicalize(job.get('company_name') or job.get('company')),
+        canonicalize(job.get('location')),
+    )
+
+
+def fingerprint_fields(title, company, location):
+    """64-bit fingerprint van genormaliseerde velden, als signed integer (past in een BIGINT kolom)"""
+    data = _SEPARATOR.join((title, company, location)).encode('utf-8')
+    digest = hashlib.blake2b(data, digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+def job_fingerprint(job):
+    """Vaste-breedte fingerprint van een vacature, bruikbaar als set- of indexsleutel"""
+    return fingerprint_fields(*canonical_job(job))
+
+
+def legacy_job_id_fingerprint(legacy_id):
+    """Zet een oud `titel_bedrijf_locatie` ID om naar een fingerprint
+
+    Het oude formaat had geen escaping, dus bij extra underscores gaan we
+    ervan uit dat die in de titel staan.
+    """
+    parts = legacy_id.split('_')
+    if len(parts) < 3:
+        parts = parts + [''] * (3 - len(parts))
+    title = '_'.join(parts[:-2])
+    company, location = parts[-2], parts[-1]
+    return fingerprint_fields(canonicalize(title), canonicalize(company), canonicalize(location))
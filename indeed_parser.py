@@ -0,0 +1,178 @@
+import logging
+from html.parser import HTMLParser
+
+logger = logging.getLogger(__name__)
+
+# Velden binnen een vacature (div.job_seen_beacon): (tag, class) per veld
+FIELDS = {
+    'title': ('h2', 'jobTitle'),
+    'company': ('span', 'companyName'),
+    'location': ('div', 'companyLocation'),
+}
+BEACON_CLASS = 'job_seen_beacon'
+
+# Snelste eerst; 'html' (de streaming parser hieronder) heeft geen extra packages nodig
+PARSER_PREFERENCE = ('selectolax', 'lxml', 'html')
+
+
+def _has_class(attrs, name):
+    return name in (attrs.get('class') or '').split()
+
+
+class BeaconExtractor(HTMLParser):
+    """Streaming extractie van de job_seen_beacon vacatures met de HTMLParser uit de standaardbibliotheek
+
+    Bouwt geen boom op zoals BeautifulSoup: buiten een vacature wordt alleen
+    naar de openingstag van een beacon gekeken en binnen een vacature alleen
+    de tekst van de gezochte velden verzameld.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.jobs = []
+        self.job = None
+        self.depth = 0
+        self.field = None
+        self.field_tag = None
+        self.field_depth = 0
+        self.text = []
+
+    def handle_starttag(self, tag, attrs):
+        if self.job is None:
+            if tag == 'div':
+                attrs = dict(attrs)
+                if _has_class(attrs, BEACON_CLASS):
+                    self.job = {'id': attrs.get('data-jk')}
+                    self.depth = 1
+            return
+
+        if tag == 'div':
+            self.depth += 1
+        if self.field is not None:
+            if tag == self.field_tag:
+                self.field_depth += 1
+            return
+        attrs = dict(attrs)
+        for field, (field_tag, field_class) in FIELDS.items():
+            if tag == field_tag and field not in self.job and _has_class(attrs, field_class):
+                self.field, self.field_tag, self.field_depth, self.text = field, tag, 1, []
+                break
+
+    def handle_endtag(self, tag):
+        if self.job is None:
+            return
+        if self.field is not None and tag == self.field_tag:
+            self.field_depth -= 1
+            if self.field_depth == 0:
+                self.job[self.field] = ''.join(self.text)
+                self.field = None
+        if tag == 'div':
+            self.depth -= 1
+            if self.depth == 0:
+                self.jobs.append(self.job)
+                self.job = None
+                self.field = None
+
+    def handle_data(self, data):
+        if self.field is not None:
+            self.text.append(data)
+
+
+def parse_html(html):
+    # Alles vóór de eerste vacature (head, scripts, navigatie) hoeft niet door de parser
+    start = html.find(BEACON_CLASS)
+    if start == -1:
+        return []
+    extractor = BeaconExtractor()
+    extractor.feed(html[max(0, html.rfind('<div', 0, start)):])
+    extractor.close()
+    return extractor.jobs
+
+
+def parse_selectolax(html):
+    from selectolax.parser import HTMLParser as LexborParser
+
+    jobs = []
+    for node in LexborParser(html).css(f'div.{BEACON_CLASS}'):
+        job = {'id': node.attributes.get('data-jk')}
+        for field, (tag, field_class) in FIELDS.items():
+            match = node.css_first(f'{tag}.{field_class}')
+            if match is not None:
+                job[field] = match.text()
+        jobs.append(job)
+    return jobs
+
+
+def _class_xpath(tag, name):
+    return f".//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {name} ')]"
+
+
+def parse_lxml(html):
+    import lxml.html
+
+    jobs = []
+    for node in lxml.html.fromstring(html).xpath(_class_xpath('div', BEACON_CLASS)):
+        job = {'id': node.get('data-jk')}
+        for field, (tag, field_class) in FIELDS.items():
+            matches = node.xpath(_class_xpath(tag, field_class))
+            if matches:
+                job[field] = matches[0].text_content()
+        jobs.append(job)
+    return jobs
+
+
+def parse_bs4(html):
+    """De oorspronkelijke BeautifulSoup (html.parser) route, als referentie"""
+    from bs4 import BeautifulSoup
+
+    jobs = []
+    for node in BeautifulSoup(html, 'html.parser').find_all('div', class_=BEACON_CLASS):
+        job = {'id': node.get('data-jk')}
+        for field, (tag, field_class) in FIELDS.items():
+            match = node.find(tag, class_=field_class)
+            if match is not None:
+                job[field] = match.text
+        jobs.append(job)
+    return jobs
+
+
+PARSERS = {
+    'selectolax': parse_selectolax,
+    'lxml': parse_lxml,
+    'html': parse_html,
+    'bs4': parse_bs4,
+}
+PARSER_MODULES = {'selectolax': 'selectolax.parser', 'lxml': 'lxml.html', 'html': None, 'bs4': 'bs4'}
+
+
+def available_parsers():
+    """Namen van de parsers waarvan de packages geïnstalleerd zijn"""
+    import importlib.util
+
+    available = []
+    for name, module in PARSER_MODULES.items():
+        try:
+            if module is None or importlib.util.find_spec(module) is not None:
+                available.append(name)
+        except ModuleNotFoundError:
+            continue
+    return available
+
+
+def get_parser(name='auto'):
+    """Parse functie voor `name`; 'auto' kiest de snelste geïnstalleerde"""
+    if name == 'auto':
+        available = available_parsers()
+        name = next(name for name in PARSER_PREFERENCE if name in available)
+    elif name not in PARSERS:
+        raise ValueError(f"Onbekende HTML parser: {name} (kies uit auto, {', '.join(PARSERS)})")
+    logger.debug("Indeed pagina's parsen met %s", name)
+    return PARSERS[name]
+
+
+def parse_jobs(html, parser='auto'):
+    """Vacatures op een Indeed resultatenpagina als [{id, title, company, location}]
+
+    Tekst is nog niet gestript; vacatures zonder data-jk komen mee met id None.
+    """
+    return get_parser(parser)(html)
@@ -1,71 +1,48 @@
 import os
-import json
-import requests
-from bs4 import BeautifulSoup
-import schedule
 import time
 from datetime import datetime
 from dotenv import load_dotenv
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
+from config import config
+from fingerprint import job_fingerprint
+from job_sources import IndeedSource
+from outbox import create_outbox
+from seen_jobs import SeenJobsJournal
 
 # Laad environment variables
 load_dotenv()
 
 class JobAlert:
     def __init__(self):
-        self.seen_jobs = set()
-        self.load_seen_jobs()
+        settings = config['production']
+        self.settings = {key: getattr(settings, key) for key in dir(settings) if key.isupper()}
+        # Het journal wordt pas bij de eerste zoekopdracht ingelezen
+        self.seen_jobs = SeenJobsJournal(
+            self.settings['SEEN_JOBS_PATH'], retention_days=self.settings['SEEN_JOBS_RETENTION_DAYS']
+        )
+        self.outbox = create_outbox(self.settings, pool_size=1)
         
-    def load_seen_jobs(self):
-        try:
-            with open('seen_jobs.json', 'r') as f:
-                self.seen_jobs = set(json.load(f))
-        except FileNotFoundError:
-            self.seen_jobs = set()
-            
-    def save_seen_jobs(self):
-        with open('seen_jobs.json', 'w') as f:
-            json.dump(list(self.seen_jobs), f)
-            
     def search_jobs(self):
-        # Hier implementeren we de zoeklogica voor vacatures
-        # Dit is een voorbeeld voor Indeed.nl
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        search_url = "https://www.indeed.nl/jobs?q=commercieel&l=nederland"
-        response = requests.get(search_url, headers=headers)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        jobs = []
-        for job in soup.find_all('div', class_='job_seen_beacon'):
-            job_id = job.get('data-jk')
-            if job_id and job_id not in self.seen_jobs:
-                title = job.find('h2', class_='jobTitle').text.strip()
-                company = job.find('span', class_='companyName').text.strip()
-                location = job.find('div', class_='companyLocation').text.strip()
-                
-                jobs.append({
-                    'id': job_id,
-                    'title': title,
-                    'company': company,
-                    'location': location
-                })
-                self.seen_jobs.add(job_id)
-        
-        self.save_seen_jobs()
+        # Haal de vacatures van Indeed.nl op en houd alleen de nog niet geziene over
+        jobs = {}
+        for found_job in IndeedSource.from_config(self.settings).jobs():
+            fingerprint = job_fingerprint(found_job)
+            if fingerprint not in self.seen_jobs:
+                jobs.setdefault(fingerprint, found_job)
         return jobs
     
+    def mark_seen(self, jobs):
+        # Pas na een afgeleverde e-mail gelden vacatures als gezien; alleen deze gaan naar het journal
+        self.seen_jobs.add(jobs)
+    
     def send_email(self, jobs):
+        """Verstuur de vacatures; geeft True terug als de e-mail afgeleverd is"""
         if not jobs:
-            return
+            return False
             
         sender_email = os.getenv('EMAIL_USER')
         receiver_email = os.getenv('EMAIL_RECEIVER')
-        password = os.getenv('EMAIL_PASSWORD')
         
         msg = MIMEMultipart()
         msg['From'] = sender_email
@@ -75,33 +52,40 @@ class JobAlert:
         body = "De volgende nieuwe vacatures zijn gevonden:\n\n"
         for job in jobs:
             body += f"Titel: {job['title']}\n"
-            body += f"Bedrijf: {job['company']}\n"
+            body += f"Bedrijf: {job['company_name']}\n"
             body += f"Locatie: {job['location']}\n"
             body += "-" * 50 + "\n"
             
         msg.attach(MIMEText(body, 'plain'))
         
         try:
-            server = smtplib.SMTP('smtp.gmail.com', 587)
-            server.starttls()
-            server.login(sender_email, password)
-            server.send_message(msg)
-            server.quit()
+            self.outbox.put(msg).result()
             print("E-mail succesvol verzonden!")
+            return True
         except Exception as e:
             print(f"Fout bij het verzenden van de e-mail: {str(e)}")
+            return False
 
 def main():
+    # schedule is alleen nodig voor de dagelijkse planning, niet bij het importeren
+    import schedule
+    
     job_alert = JobAlert()
     
     def check_jobs():
         print(f"Controleren op nieuwe vacatures... {datetime.now()}")
-        jobs = job_alert.search_jobs()
-        if jobs:
-            job_alert.send_email(jobs)
+        try:
+            jobs = job_alert.search_jobs()
+        except Exception as e:
+            print(f"Fout bij het ophalen van vacatures: {e}")
+            return
+        if not jobs:
+            print("Geen nieuwe vacatures gevonden.")
+        elif job_alert.send_email(list(jobs.values())):
+            job_alert.mark_seen(jobs)
             print(f"{len(jobs)} nieuwe vacatures gevonden en verzonden.")
         else:
-            print("Geen nieuwe vacatures gevonden.")
+            print(f"{len(jobs)} nieuwe vacatures gevonden; bij de volgende controle opnieuw versturen.")
     
     # Controleer direct bij het starten
     check_jobs()
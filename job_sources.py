@@ -0,0 +1,489 @@
+import hashlib
+import json
+import logging
+import os
+import random
+from datetime import timedelta
+from functools import lru_cache
+
+from quota_budget import get_quota_budget
+from response_archive import create_response_archive, get_response_replay
+from resilience import (
+    CircuitBreaker, RetryPolicy, TransientError, call_with_retries, create_retry_policy, get_breaker, http_timeout
+)
+from response_cache import create_response_cache
+from scheduler import utcnow
+
+logger = logging.getLogger(__name__)
+
+# Standaard locatie als een alert geen locatie heeft
+DEFAULT_LOCATION = "Netherlands"
+
+# Optionele velden die ongewijzigd in een genormaliseerde vacature meegaan
+PASSTHROUGH_FIELDS = ('description', 'apply_options', 'detected_extensions', 'via', 'posted_at')
+
+
+def normalize_job(job, source):
+    """Vacature in het vaste formaat dat de rest van de applicatie verwacht
+
+    Bronnen gebruiken verschillende veldnamen (`company` bij de Indeed
+    scraper, `company_name` bij SerpApi); na normalisatie heeft elke
+    vacature title, company_name, location, link, job_id en source.
+    """
+    record = {
+        'title': (job.get('title') or '').strip(),
+        'company_name': (job.get('company_name') or job.get('company') or '').strip(),
+        'location': (job.get('location') or '').strip(),
+        'link': job.get('link') or '',
+        'job_id': job.get('job_id') or job.get('id'),
+        'source': source,
+    }
+    for field in PASSTHROUGH_FIELDS:
+        if job.get(field):
+            record[field] = job[field]
+    return record
+
+
+class JobSource:
+    """Een bron van vacatures
+
+    `jobs(groups)` levert een stroom genormaliseerde vacatures op (voor de
+    job store); `search(groups)` geeft per zoekopdracht de vacatures terug in
+    de vorm die de worker verwacht: {sleutel: (vacatures, api_calls) of
+    exceptie}. Bronnen zonder zoekfunctie leveren voor elke zoekopdracht hun
+    volledige aanbod.
+    """
+
+    name = None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls()
+
+    def jobs(self, groups=None):
+        raise NotImplementedError
+
+    def search(self, groups):
+        try:
+            jobs = list(self.jobs(groups))
+        except Exception as e:
+            return {key: e for key in groups}
+        return {key: (jobs, 0) for key in groups}
+
+    def close(self):
+        pass
+
+
+class MockSource(JobSource):
+    """Vacatures uit een JSON bestand, standaard mock_jobs.json"""
+
+    name = 'mock'
+
+    def __init__(self, path='mock_jobs.json'):
+        self.path = path
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config['MOCK_DATA_FILE'])
+
+    def jobs(self, groups=None):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                mock_data = json.load(f)
+            logger.debug("Mock data geladen uit %s", self.path)
+        except Exception as e:
+            logger.error("Fout bij het laden van mock data: %s", e)
+            return
+        for job in mock_data:
+            yield normalize_job(job, self.name)
+
+
+def build_search_params(search_query, location, chips="date_posted:today"):
+    """SerpApi parameters voor één zoekopdracht"""
+    params = {
+        "engine": "google_jobs",
+        "q": f"{search_query}",
+        "location": location,
+        "hl": "nl",
+        "gl": "nl",
+        "api_key": os.getenv("SERPAPI_KEY"),
+        "num": "25",
+        "lrad": "50",  # Zoekradius in kilometers
+    }
+    if chips:
+        params["chips"] = chips  # Alleen vacatures sinds de vorige check
+    return params
+
+
+@lru_cache(maxsize=None)
+def warn_missing_api_key():
+    logger.warning("Geen SERPAPI_KEY ingesteld")
+
+
+class SerpApiSource(JobSource):
+    """Google Jobs via SerpApi, één zoekopdracht per unieke (zoekterm, locatie)
+
+    De date_posted filter volgt uit de alert van de zoekopdracht met de
+    oudste last_check en de paginering stopt zodra een pagina alleen
+    vacatures bevat die al naar alle alerts van de zoekopdracht verstuurd
+    zijn. Een foutstatus van SerpApi laat de zoekopdracht mislukken, zodat
+    zijn alerts later opnieuw gecontroleerd worden. Werkt binnen een app
+    context (alerts, verstuurde vacatures en de opbrengst per zoekopdracht
+    staan in de database).
+
+    Met een `cache` (ResponseCache) worden responses gedeeld tussen runs en
+    workers; een zoekopdracht blijft hooguit de helft van het kortste
+    controle-interval van zijn alerts vers, zodat elke controle nieuwe
+    vacatures kan opleveren.
+
+    Met een `archive` worden alle ruwe responses bewaard; met een `replay`
+    worden ze uit zo'n archief teruggespeeld in plaats van opgehaald. Met
+    een `budget` (QuotaBudget) haalt elke zoekopdracht het aantal pagina's
+    van het quotaplan op en wordt zijn opbrengst bijgehouden.
+    `timeout`, `breaker` en `retry` gaan naar de fetch engine; de breaker
+    hoort bij het proces, zodat een storing ook volgende batches direct laat
+    falen.
+    """
+
+    name = 'serpapi'
+
+    def __init__(self, url, requests_per_second=5, max_concurrency=8, history_days=30, cache=None,
+                 archive=None, replay=None, timeout=(5, 30), breaker=None, retry=None, budget=None):
+        self.url = url
+        self.requests_per_second = requests_per_second
+        self.max_concurrency = max_concurrency
+        self.history_days = history_days
+        self.cache = cache
+        self.archive = archive
+        self.replay = replay
+        self.timeout = timeout
+        self.breaker = breaker
+        self.retry = retry
+        self.budget = budget
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config['SERPAPI_URL'],
+            requests_per_second=config['SERPAPI_REQUESTS_PER_SECOND'],
+            max_concurrency=config['SERPAPI_MAX_CONCURRENCY'],
+            history_days=config['SEARCH_HISTORY_DAYS'],
+            # Een teruggespeelde run leest alleen uit het archief
+            cache=None if config['SERPAPI_REPLAY'] else create_response_cache(config),
+            archive=create_response_archive(config),
+            replay=get_response_replay(config),
+            timeout=http_timeout(config),
+            breaker=get_breaker('serpapi', config),
+            retry=create_retry_policy(config),
+            budget=get_quota_budget(config),
+        )
+
+    def cache_ttl(self, alerts):
+        """Versheid in de cache voor een zoekopdracht: de cache TTL, of korter bij frequente alerts"""
+        from models import check_interval
+
+        shortest = min(check_interval(alert.frequency) for alert in alerts)
+        return min(self.cache.ttl, shortest.total_seconds() / 2)
+
+    def search(self, groups):
+        # fetch_engine laadt requests (en certifi); alleen nodig als er echt remote gezocht wordt
+        from fetch_engine import FetchEngine
+        from search_state import (
+            chip_window, date_posted_chip, group_since, load_delivered_fingerprints, load_known_fingerprints,
+            load_search_states, record_search_results
+        )
+
+        if not os.getenv('SERPAPI_KEY') and self.replay is None:
+            warn_missing_api_key()
+        now = utcnow()
+        states = load_search_states(groups)
+        known = load_known_fingerprints(states, now - timedelta(days=self.history_days))
+        searches = {}
+        window_start = now
+        for key, alerts in groups.items():
+            first = alerts[0]
+            chip = date_posted_chip(group_since(alerts, now), now)
+            window_start = min(window_start, now - chip_window(chip, self.history_days))
+            searches[key] = build_search_params(
+                first.search_query.strip(),
+                first.location or DEFAULT_LOCATION,
+                chip
+            )
+        # Vroeg stoppen alleen op vacatures die al naar alle alerts van de zoekopdracht verstuurd zijn
+        delivered = load_delivered_fingerprints(groups, window_start)
+
+        ttls = {key: self.cache_ttl(alerts) for key, alerts in groups.items()} if self.cache else None
+        pages = {key: self.budget.pages(key) for key in groups} if self.budget else None
+        if self.replay is not None:
+            self.replay.load()
+
+        engine = FetchEngine(
+            self.url, requests_per_second=self.requests_per_second, max_concurrency=self.max_concurrency,
+            cache=self.cache, archive=self.archive, replay=self.replay,
+            timeout=self.timeout, breaker=self.breaker, retry=self.retry
+        )
+        try:
+            results = engine.search_many(searches, delivered, ttls, pages)
+        finally:
+            engine.close()
+
+        for key, result in results.items():
+            if not isinstance(result, Exception):
+                jobs = [normalize_job(job, self.name) for job in result[0]]
+                previous_success = states[key].last_success_at
+                new_jobs = record_search_results(states[key], jobs, known[key], now)
+                if self.budget is not None:
+                    self.budget.observe(states[key], new_jobs, result[1], previous_success, now, pages[key])
+                results[key] = (jobs, result[1])
+        return results
+
+    def jobs(self, groups=None):
+        for key, result in self.search(groups or {}).items():
+            if isinstance(result, Exception):
+                logger.error("Fout bij het ophalen van zoekopdracht %s in %s: %s", key[0], key[1], result)
+                continue
+            yield from result[0]
+
+    def close(self):
+        if self.cache is not None:
+            logger.info("SerpApi cache: %s", self.cache.stats())
+            self.cache.close()
+        if self.archive is not None:
+            self.archive.close()
+        if self.replay is not None:
+            logger.info("SerpApi replay: %s", self.replay.stats())
+
+
+class IndeedSource(JobSource):
+    """Scraper voor de zoekresultaten van Indeed.nl
+
+    Haalt `pages` resultatenpagina's op (10 vacatures per pagina), met
+    hooguit `concurrency` tegelijk over één keep-alive sessie, en parset
+    alleen de job_seen_beacon vacatures met de snelste beschikbare parser
+    (zie indeed_parser). Een vacature die op meerdere pagina's staat
+    (gesponsord) komt één keer mee.
+    """
+
+    name = 'indeed'
+    url = "https://www.indeed.nl/jobs"
+    headers = {
+        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    }
+    page_size = 10
+
+    def __init__(self, query='commercieel', location='nederland', timeout=(5, 30), breaker=None, retry=None,
+                 pages=1, concurrency=4, parser='auto'):
+        self.query = query
+        self.location = location
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker('indeed')
+        self.retry = retry or RetryPolicy()
+        self.pages = pages
+        self.concurrency = concurrency
+        self.parser = parser
+        self.session = None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            config['INDEED_QUERY'], config['INDEED_LOCATION'], timeout=http_timeout(config),
+            breaker=get_breaker('indeed', config), retry=create_retry_policy(config),
+            pages=config['INDEED_PAGES'], concurrency=config['INDEED_CONCURRENCY'], parser=config['INDEED_PARSER'],
+        )
+
+    def get(self, params):
+        response = self.session.get(self.url, params=params, headers=self.headers, timeout=self.timeout)
+        if response.status_code == 429 or response.status_code >= 500:
+            raise TransientError(f"Indeed gaf {response.status_code}")
+        response.raise_for_status()
+        return response
+
+    def fetch_page(self, page):
+        """HTML van één resultatenpagina (vanaf 0)"""
+        from fetch_engine import is_transient
+
+        params = {'q': self.query, 'l': self.location}
+        if page:
+            params['start'] = page * self.page_size
+        return call_with_retries(lambda: self.get(params), self.breaker, self.retry, is_transient).text
+
+    def fetch_pages(self):
+        """HTML van alle pagina's, op volgorde"""
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.session = requests.Session()
+        workers = max(1, min(self.pages, self.concurrency))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=workers))
+        try:
+            if workers == 1:
+                return [self.fetch_page(page) for page in range(self.pages)]
+            from concurrent.futures import ThreadPoolExecutor
+
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(self.fetch_page, range(self.pages)))
+        finally:
+            self.session.close()
+            self.session = None
+
+    def parse(self, html):
+        """Genormaliseerde vacatures van één resultatenpagina"""
+        from indeed_parser import get_parser
+
+        for job in get_parser(self.parser)(html):
+            job_id = job['id']
+            if job_id:
+                yield normalize_job({
+                    'id': job_id,
+                    'title': job.get('title', ''),
+                    'company': job.get('company', ''),
+                    'location': job.get('location', ''),
+                    'link': f"https://www.indeed.nl/viewjob?jk={job_id}",
+                }, self.name)
+
+    def jobs(self, groups=None):
+        seen_ids = set()
+        for html in self.fetch_pages():
+            for job in self.parse(html):
+                if job['job_id'] not in seen_ids:
+                    seen_ids.add(job['job_id'])
+                    yield job
+
+
+class SyntheticSource(JobSource):
+    """Deterministische, realistische vacatures voor load tests zonder netwerk
+
+    `jobs()` levert `count` vacatures als generator, zodat ook miljoenen
+    vacatures in constant geheugen gestreamd kunnen worden. Met kans
+    `duplicate_rate` is een vacature een herplaatsing van een recente
+    vacature (zelfde fingerprint, andere schrijfwijze en link); met kans
+    `near_duplicate_rate` een licht aangepaste titel (andere fingerprint).
+    `search` levert per zoekopdracht `per_search` vacatures die de
+    zoektermen en de locatie bevatten. Dezelfde seed geeft dezelfde stroom.
+    """
+
+    name = 'synthetic'
+
+    LEVELS = ['Junior', 'Medior', 'Senior', 'Lead', 'Stagiair', 'Ervaren', '']
+    ROLES = [
+        'Python', 'Java', 'Frontend', 'Backend', 'Data', 'DevOps', 'Test', 'Security', 'Cloud', 'Mobile',
+        'Sales', 'Marketing', 'Finance', 'HR', 'Product', 'Customer Support', 'Logistiek', 'Zorg',
+        'Onderwijs', 'Juridisch', 'Inkoop', 'Operations', 'Commercieel', 'Technisch',
+    ]
+    TITLES = [
+        'Developer', 'Engineer', 'Analist', 'Manager', 'Consultant', 'Specialist', 'Medewerker',
+        'Architect', 'Adviseur', 'Coördinator', 'Teamleider', 'Recruiter',
+    ]
+    NEAR_DUPLICATE_SUFFIXES = [' (m/v)', ' (m/v/x)', ' - 32-40 uur', ' | Remote', ' NL', ' (fulltime)']
+    # Plaatsen met een grove weging naar aantal vacatures
+    CITIES = [
+        ('Amsterdam', 20), ('Rotterdam', 12), ('Utrecht', 11), ('Den Haag', 9), ('Eindhoven', 8),
+        ('Groningen', 4), ('Tilburg', 3), ('Almere', 3), ('Breda', 3), ('Nijmegen', 3), ('Arnhem', 3),
+        ('Haarlem', 2), ('Zwolle', 2), ('Leiden', 2), ('Delft', 2), ('Veldhoven', 1), ('Amersfoort', 2),
+        ('Apeldoorn', 1), ('Maastricht', 1), ('Enschede', 1),
+    ]
+    COMPANY_PREFIXES = ['Van Dijk', 'De Vries', 'Jansen', 'Bakker', 'Visser', 'Smit', 'Meijer', 'Mulder',
+                        'Bos', 'Vos', 'Peters', 'Hendriks', 'Dekker', 'Brouwer', 'Noord', 'Holland']
+    COMPANY_SECTORS = ['Logistiek', 'Software', 'Techniek', 'Zorggroep', 'Consultancy', 'Bouw', 'Finance',
+                       'Media', 'Energie', 'Retail', 'Data', 'Installatietechniek']
+    COMPANY_SUFFIXES = ['B.V.', 'Groep', 'N.V.', '& Partners', 'Nederland', '']
+    VIA = ['LinkedIn', 'Indeed', 'Nationale Vacaturebank', 'werkzoeken.nl', 'Bedrijfswebsite']
+
+    def __init__(self, count=1000, seed=0, duplicate_rate=0.1, near_duplicate_rate=0.05, per_search=20):
+        self.count = count
+        self.seed = seed
+        self.duplicate_rate = duplicate_rate
+        self.near_duplicate_rate = near_duplicate_rate
+        self.per_search = per_search
+        self.city_names = [city for city, _ in self.CITIES]
+        self.city_weights = [weight for _, weight in self.CITIES]
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            count=config['SYNTHETIC_JOBS'],
+            seed=config['SYNTHETIC_SEED'],
+            duplicate_rate=config['SYNTHETIC_DUPLICATE_RATE'],
+            near_duplicate_rate=config['SYNTHETIC_NEAR_DUPLICATE_RATE'],
+        )
+
+    def company(self, rng):
+        name = f"{rng.choice(self.COMPANY_PREFIXES)} {rng.choice(self.COMPANY_SECTORS)} {rng.choice(self.COMPANY_SUFFIXES)}"
+        return name.strip()
+
+    def posting(self, rng, number, title=None, location=None):
+        if title is None:
+            title = ' '.join(part for part in (
+                rng.choice(self.LEVELS), rng.choice(self.ROLES), rng.choice(self.TITLES)
+            ) if part)
+        location = location or rng.choices(self.city_names, self.city_weights)[0]
+        job_id = f"synthetic-{self.seed}-{number}"
+        return {
+            'title': title,
+            'company_name': self.company(rng),
+            'location': location,
+            'link': f"https://jobs.example.com/{job_id}",
+            'job_id': job_id,
+            'via': rng.choice(self.VIA),
+            'description': f"{title} gezocht in {location}. {rng.randint(24, 40)} uur per week.",
+            'detected_extensions': {'posted_at': f"{rng.randint(1, 23)} uur geleden"},
+        }
+
+    def repost(self, rng, original, number):
+        """Dezelfde vacature opnieuw geplaatst: andere schrijfwijze, zelfde fingerprint"""
+        job = dict(original)
+        job['title'] = rng.choice([str.upper, str.lower, str.title])(original['title'])
+        job['company_name'] = f"  {original['company_name']} "
+        job['job_id'] = f"synthetic-{self.seed}-{number}"
+        job['link'] = f"https://jobs.example.com/{job['job_id']}"
+        job['via'] = rng.choice(self.VIA)
+        return job
+
+    def jobs(self, groups=None):
+        rng = random.Random(self.seed)
+        recent = []
+        for number in range(self.count):
+            roll = rng.random()
+            if recent and roll < self.duplicate_rate:
+                job = self.repost(rng, rng.choice(recent), number)
+            elif recent and roll < self.duplicate_rate + self.near_duplicate_rate:
+                original = rng.choice(recent)
+                job = self.posting(
+                    rng, number, original['title'] + rng.choice(self.NEAR_DUPLICATE_SUFFIXES), original['location']
+                )
+                job['company_name'] = original['company_name']
+            else:
+                job = self.posting(rng, number)
+                # Herplaatsingen komen uit een venster van recente vacatures
+                if len(recent) < 1000:
+                    recent.append(job)
+                else:
+                    recent[rng.randrange(1000)] = job
+            yield normalize_job(job, self.name)
+
+    def search(self, groups):
+        results = {}
+        for key in groups:
+            query, location = key
+            digest = hashlib.blake2b(f"{self.seed}\x1f{query}\x1f{location}".encode('utf-8'), digest_size=8).digest()
+            rng = random.Random(int.from_bytes(digest, 'big'))
+            city = None if location.lower() == DEFAULT_LOCATION.lower() else location.title()
+            jobs = []
+            for number in range(self.per_search):
+                title = ' '.join(part for part in (rng.choice(self.LEVELS), query.title()) if part)
+                jobs.append(normalize_job(self.posting(rng, f"{digest.hex()}-{number}", title, city), self.name))
+            results[key] = (jobs, 0)
+        return results
+
+
+JOB_SOURCES = {source.name: source for source in (MockSource, SerpApiSource, IndeedSource, SyntheticSource)}
+
+
+def create_job_source(config, name=None):
+    """Maak de job source uit de config (JOB_SOURCE), of de bron met de gegeven naam"""
+    name = name or config['JOB_SOURCE']
+    try:
+        source = JOB_SOURCES[name]
+    except KeyError:
+        raise ValueError(f"Onbekende job source: {name} (kies uit {', '.join(JOB_SOURCES)})")
+    return source.from_config(config)
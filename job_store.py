@@ -0,0 +1,197 @@
+import argparse
+import json
+import re
+import unicodedata
+from collections import defaultdict
+
+from sqlalchemy import text
+
+from models import db, Job
+from fingerprint import job_fingerprint
+from search_state import insert_ignore
+
+_TOKEN = re.compile(r'\w+')
+
+# Locaties die geen filter betekenen (heel Nederland)
+ANY_LOCATION = {'netherlands', 'nederland'}
+
+FTS_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS job_fts USING fts5(
+        title, company_name, location,
+        content='job', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS job_fts_insert AFTER INSERT ON job BEGIN
+        INSERT INTO job_fts(rowid, title, company_name, location)
+        VALUES (new.id, new.title, new.company_name, new.location);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS job_fts_delete AFTER DELETE ON job BEGIN
+        INSERT INTO job_fts(job_fts, rowid, title, company_name, location)
+        VALUES ('delete', old.id, old.title, old.company_name, old.location);
+    END""",
+]
+
+
+def tokens(value):
+    """Woorden zonder hoofdletters en accenten, zoals de unicode61 tokenizer van FTS5 ze ziet"""
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return _TOKEN.findall(value.lower())
+
+
+def use_fts():
+    return db.engine.dialect.name == 'sqlite'
+
+
+def ensure_job_index():
+    """Maak de FTS5 index en de triggers die hem bijwerken (alleen SQLite)"""
+    if not use_fts():
+        return
+    for statement in FTS_SCHEMA:
+        db.session.execute(text(statement))
+    db.session.commit()
+
+
+def ingest_jobs(jobs, source, now):
+    """Schrijf vacatures één keer weg in de lokale job tabel; bestaande fingerprints worden overgeslagen"""
+    rows = {}
+    for job in jobs:
+        fingerprint = job_fingerprint(job)
+        if fingerprint not in rows:
+            rows[fingerprint] = {
+                'fingerprint': fingerprint,
+                'title': job.get('title'),
+                'company_name': job.get('company_name') or job.get('company'),
+                'location': job.get('location'),
+                'source': source,
+                'data': json.dumps(job),
+                'ingested_at': now,
+            }
+    if rows:
+        db.session.execute(insert_ignore(Job), list(rows.values()))
+    return len(rows)
+
+
+def match_expression(search_query, location):
+    """FTS5 MATCH expressie: alle woorden van de zoekterm in titel of bedrijf, plus de locatie"""
+    query_tokens = tokens(search_query)
+    if not query_tokens:
+        return None
+    expression = '{title company_name} : (' + ' '.join(f'"{token}"' for token in query_tokens) + ')'
+    location_tokens = tokens(location)
+    if location_tokens and ' '.join(location_tokens) not in ANY_LOCATION:
+        expression += ' AND location : (' + ' '.join(f'"{token}"' for token in location_tokens) + ')'
+    return expression
+
+
+def _match_fts(key, since):
+    expression = match_expression(*key)
+    if expression is None:
+        return []
+    rows = db.session.execute(text(
+        'SELECT job.id FROM job_fts JOIN job ON job.id = job_fts.rowid '
+        'WHERE job_fts MATCH :expression AND job.ingested_at >= :since'
+    ), {'expression': expression, 'since': since})
+    return [job_id for (job_id,) in rows]
+
+
+class _InvertedIndex:
+    """In-memory index voor databases zonder FTS5"""
+
+    def __init__(self, since):
+        self.text = defaultdict(set)
+        self.location = defaultdict(set)
+        self.ingested_at = {}
+        rows = db.session.query(Job.id, Job.title, Job.company_name, Job.location, Job.ingested_at).filter(
+            Job.ingested_at >= since
+        )
+        for job_id, title, company_name, location, ingested_at in rows:
+            for token in tokens(title) + tokens(company_name):
+                self.text[token].add(job_id)
+            for token in tokens(location):
+                self.location[token].add(job_id)
+            self.ingested_at[job_id] = ingested_at
+
+    def match(self, key, since):
+        search_query, location = key
+        query_tokens = tokens(search_query)
+        if not query_tokens:
+            return []
+        postings = [self.text.get(token, set()) for token in query_tokens]
+        location_tokens = tokens(location)
+        if location_tokens and ' '.join(location_tokens) not in ANY_LOCATION:
+            postings += [self.location.get(token, set()) for token in location_tokens]
+        matched = set.intersection(*sorted(postings, key=len))
+        return [job_id for job_id in matched if self.ingested_at[job_id] >= since]
+
+
+def match_searches(searches, method=None):
+    """Zoek voor elke {sleutel: since} de vacatures die sinds `since` zijn binnengekomen
+
+    Eén FTS5 query per unieke zoekopdracht (of één in-memory index voor alle
+    zoekopdrachten op andere databases) in plaats van een remote search per
+    alert. Geeft {sleutel: [vacatures]} terug.
+    """
+    if not searches:
+        return {}
+    if use_fts():
+        matched = {key: _match_fts(key, since) for key, since in searches.items()}
+    else:
+        index = _InvertedIndex(min(searches.values()))
+        matched = {key: index.match(key, since) for key, since in searches.items()}
+
+    job_ids = list({job_id for ids in matched.values() for job_id in ids})
+    records = {}
+    for start in range(0, len(job_ids), 900):
+        rows = db.session.query(Job.id, Job.ingested_at, Job.data).filter(Job.id.in_(job_ids[start:start + 900]))
+        for job_id, ingested_at, data in rows:
+            records[job_id] = (ingested_at, json.loads(data))
+    return {key: [records[job_id] for job_id in sorted(ids)] for key, ids in matched.items()}
+
+
+def prune_jobs(before):
+    """Verwijder vacatures die buiten het matchvenster vallen"""
+    return Job.query.filter(Job.ingested_at < before).delete(synchronize_session=False)
+
+
+def ingest_source(source, now, groups=None, chunk_size=5000):
+    """Stream alle vacatures van een job source de store in, met een commit per `chunk_size`"""
+    total = 0
+    chunk = []
+    for job in source.jobs(groups):
+        chunk.append(job)
+        if len(chunk) >= chunk_size:
+            total += ingest_jobs(chunk, source.name, now)
+            db.session.commit()
+            chunk = []
+    if chunk:
+        total += ingest_jobs(chunk, source.name, now)
+    db.session.commit()
+    return total
+
+
+def main():
+    from job_sources import JOB_SOURCES, create_job_source
+    from models import JobAlert
+    from scheduler import utcnow
+    from worker import app, plan_searches
+
+    parser = argparse.ArgumentParser(description="Laad vacatures in de lokale job store")
+    parser.add_argument('sources', nargs='*', choices=list(JOB_SOURCES), metavar='BRON',
+                        help=f"bronnen om in te laden ({', '.join(JOB_SOURCES)}); standaard JOB_SOURCE")
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        ensure_job_index()
+        for name in args.sources or [app.config['JOB_SOURCE']]:
+            source = create_job_source(app.config, name)
+            # Zoekgebaseerde bronnen (SerpApi) halen de zoekopdrachten van alle actieve alerts op
+            groups = plan_searches(JobAlert.query.filter_by(is_active=True).all()) if name == 'serpapi' else None
+            try:
+                print(f"{ingest_source(source, utcnow(), groups)} vacatures van {name} verwerkt")
+            finally:
+                source.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+import bisect
+import hmac
+import threading
+import time
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Standaard buckets (seconden), van een SQL statement tot een trage SerpApi zoekopdracht
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_NULL_TIMER = nullcontext()
+
+
+class Registry:
+    """Alle metrics van dit proces, uitgeschakeld totdat `enable()` aangeroepen wordt
+
+    Zolang de registry uitgeschakeld is doen inc/set/observe niets en geeft
+    `time()` een gedeelde nullcontext terug, zodat instrumentatie in de
+    worker vrijwel niets kost.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.metrics = []
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Alle metrics in het Prometheus text exposition formaat"""
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.registry = registry
+        self.lock = threading.Lock()
+        self.children = {}
+        if not self.labelnames:
+            self.labels()
+        registry.register(self)
+
+    def labels(self, *values):
+        """Het kind van deze metric voor één combinatie van labelwaarden"""
+        child = self.children.get(values)
+        if child is None:
+            with self.lock:
+                child = self.children.setdefault(values, self._child())
+        return child
+
+    def _default(self):
+        # Metrics zonder labels hebben één kind met lege labels
+        return self.labels()
+
+    def samples(self):
+        for values, child in list(self.children.items()):
+            yield from child.samples(self.name, list(zip(self.labelnames, values)))
+
+
+class _CounterChild:
+    def __init__(self, registry):
+        self.registry = registry
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        if not self.registry.enabled:
+            return
+        with self.lock:
+            self.value += amount
+
+    def samples(self, name, labels):
+        yield f"{name}{_format_labels(labels)} {_format_value(self.value)}"
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def _child(self):
+        return _CounterChild(self.registry)
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class _GaugeChild:
+    def __init__(self, registry):
+        self.registry = registry
+        self.value = 0
+        self.function = None
+
+    def set(self, value):
+        if self.registry.enabled:
+            self.value = value
+
+    def set_function(self, function):
+        """Bereken de waarde pas bij het uitlezen (bijv. de lengte van een wachtrij)"""
+        self.function = function
+
+    def samples(self, name, labels):
+        value = self.value
+        if self.function is not None:
+            try:
+                value = self.function()
+            except Exception:
+                return
+        yield f"{name}{_format_labels(labels)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def _child(self):
+        return _GaugeChild(self.registry)
+
+    def set(self, value):
+        self._default().set(value)
+
+    def set_function(self, function):
+        self._default().set_function(function)
+
+
+class _Timer:
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class _HistogramChild:
+    def __init__(self, registry, buckets):
+        self.registry = registry
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        if not self.registry.enabled:
+            return
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self):
+        """Context manager die de duur van het blok observeert"""
+        if not self.registry.enabled:
+            return _NULL_TIMER
+        return _Timer(self)
+
+    def samples(self, name, labels):
+        with self.lock:
+            counts = list(self.counts)
+            total = self.sum
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            yield f"{name}_bucket{_format_labels(labels + [('le', _format_value(bound))])} {cumulative}"
+        yield f"{name}_sum{_format_labels(labels)} {_format_value(total)}"
+        yield f"{name}_count{_format_labels(labels)} {cumulative}"
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(float(bound) for bound in buckets)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _child(self):
+        return _HistogramChild(self.registry, self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+def token_matches(authorization, token):
+    """Of een Authorization header het bearer token bevat (constante tijd)"""
+    return bool(token) and hmac.compare_digest(
+        (authorization or '').encode('utf-8'), f"Bearer {token}".encode('utf-8')
+    )
+
+
+def start_http_server(port, host='127.0.0.1', registry=REGISTRY, token=None):
+    """Serveer /metrics vanuit een daemon thread (voor de worker, die geen Flask server draait)
+
+    Met een `token` moet de scraper `Authorization: Bearer <token>` meesturen.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            if token and not token_matches(self.headers.get('Authorization'), token):
+                self.send_error(401)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+# Metrics van de alert pipeline
+STAGE_SECONDS = Histogram(
+    'kayak_stage_seconds', 'Duur per stap van de alert pipeline', ['stage']
+)
+API_CALLS = Counter('kayak_api_calls_total', 'Requests naar externe job sources (SerpApi)')
+CACHE_HITS = Counter('kayak_cache_hits_total', 'Cache hits per cache', ['cache'])
+CACHE_MISSES = Counter('kayak_cache_misses_total', 'Cache misses per cache', ['cache'])
+ALERTS_PROCESSED = Counter('kayak_alerts_processed_total', 'Gecontroleerde alerts')
+ALERT_ERRORS = Counter('kayak_alert_errors_total', 'Alerts waarvan de controle mislukte')
+EMAILS_SENT = Counter('kayak_emails_sent_total', 'Afgeleverde e-mails')
+EMAIL_FAILURES = Counter('kayak_email_failures_total', 'E-mails waarvan de aflevering mislukte')
+RETRIES = Counter('kayak_retries_total', 'Herhaalde aanroepen na een tijdelijke fout, per doel', ['target'])
+CIRCUIT_OPEN = Gauge('kayak_circuit_open', 'Circuit breaker open (1) of dicht (0), per doel', ['target'])
+OUTBOX_QUEUE_DEPTH = Gauge('kayak_outbox_queue_depth', 'Berichten in de wachtrij van de outbox')
+ALERT_BACKLOG = Gauge('kayak_alert_backlog', 'Actieve alerts die aan de beurt zijn maar nog niet gecontroleerd')
+QUOTA_PLANNED_CALLS = Gauge('kayak_quota_planned_calls', 'Verwachte SerpApi calls per dag volgens het quotaplan')
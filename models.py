@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+from flask_sqlalchemy import SQLAlchemy
+from flask_login import UserMixin
+
+# De database extensie zonder app; create_app (web) en create_worker_app (worker) koppelen hem
+db = SQLAlchemy()
+
+# Database modellen
+class User(UserMixin, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    password_hash = db.Column(db.String(128))
+    reset_token = db.Column(db.String(100), unique=True)
+    reset_token_expiry = db.Column(db.DateTime)
+    job_alerts = db.relationship('JobAlert', backref='user', lazy=True)
+
+# Hoe vaak een alert gecontroleerd wordt per frequentie
+CHECK_INTERVALS = {
+    'hourly': timedelta(hours=1),
+    'daily': timedelta(days=1),
+    'weekly': timedelta(weeks=1),
+    'monthly': timedelta(days=30),
+}
+
+def check_interval(frequency):
+    return CHECK_INTERVALS.get(frequency, CHECK_INTERVALS['daily'])
+
+def default_next_check_at(context):
+    return datetime.utcnow() + check_interval(context.get_current_parameters().get('frequency'))
+
+class JobAlert(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    search_query = db.Column(db.String(200), nullable=False)
+    location = db.Column(db.String(100))
+    frequency = db.Column(db.String(20), default='daily')
+    last_check = db.Column(db.DateTime, default=datetime.utcnow)
+    next_check_at = db.Column(db.DateTime, default=default_next_check_at)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    is_active = db.Column(db.Boolean, default=True)
+    claimed_by = db.Column(db.String(64))
+    lease_until = db.Column(db.DateTime)
+    sent_jobs = db.relationship('SentJob', backref='alert', lazy='dynamic', cascade='all, delete-orphan')
+    __table_args__ = (
+        # Het due-filter van de worker: is_active = 1 AND next_check_at <= :now
+        db.Index('ix_job_alert_active_next_check', 'is_active', 'next_check_at'),
+    )
+
+def count_due_alerts(now):
+    """Aantal actieve alerts dat aan de beurt is maar nog niet gecontroleerd"""
+    return JobAlert.query.filter(JobAlert.is_active.is_(True), JobAlert.next_check_at <= now).count()
+
+class SentJob(db.Model):
+    """Vacatures die al naar een alert zijn verstuurd, één rij per (alert, vacature)"""
+    id = db.Column(db.Integer, primary_key=True)
+    alert_id = db.Column(db.Integer, db.ForeignKey('job_alert.id'), nullable=False)
+    job_fingerprint = db.Column(db.BigInteger, nullable=False)
+    sent_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (
+        db.Index('ix_sent_job_alert_fingerprint', 'alert_id', 'job_fingerprint', unique=True),
+    )
+
+class Job(db.Model):
+    """Lokale opslag van opgehaalde vacatures uit alle bronnen, één rij per fingerprint"""
+    id = db.Column(db.Integer, primary_key=True)
+    fingerprint = db.Column(db.BigInteger, nullable=False, unique=True)
+    title = db.Column(db.String(300))
+    company_name = db.Column(db.String(200))
+    location = db.Column(db.String(200))
+    source = db.Column(db.String(20))
+    data = db.Column(db.Text)  # Het volledige record als JSON, inclusief links en apply_options
+    ingested_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+class SearchState(db.Model):
+    """High-water mark per unieke zoekopdracht (genormaliseerde zoekterm en locatie)"""
+    id = db.Column(db.Integer, primary_key=True)
+    search_query = db.Column(db.String(200), nullable=False)
+    location = db.Column(db.String(100), nullable=False)
+    last_success_at = db.Column(db.DateTime)
+    # Exponentieel vervallen opbrengst voor het quotabudget: nieuwe vacatures, API calls en uren
+    yield_jobs = db.Column(db.Float)
+    yield_calls = db.Column(db.Float)
+    yield_hours = db.Column(db.Float)
+    __table_args__ = (
+        db.Index('ix_search_state_query_location', 'search_query', 'location', unique=True),
+    )
+
+class SearchSeenJob(db.Model):
+    """Vacatures die een zoekopdracht al eens heeft opgeleverd"""
+    id = db.Column(db.Integer, primary_key=True)
+    search_state_id = db.Column(db.Integer, db.ForeignKey('search_state.id'), nullable=False)
+    job_fingerprint = db.Column(db.BigInteger, nullable=False)
+    seen_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    __table_args__ = (
+        db.Index('ix_search_seen_job_state_fingerprint', 'search_state_id', 'job_fingerprint', unique=True),
+    )
+
+class EmailDelivery(db.Model):
+    """Afleverstatus van e-mails die de web app in de outbox zet (queued, sent of failed)"""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)
+    recipient = db.Column(db.String(120), nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='queued')
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    finished_at = db.Column(db.DateTime)
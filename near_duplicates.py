@@ -0,0 +1,367 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import struct
+import time
+from collections import Counter, namedtuple
+from functools import lru_cache
+
+from fingerprint import canonicalize, job_fingerprint
+
+logger = logging.getLogger(__name__)
+
+_TOKEN = re.compile(r'\w+')
+
+# Woorden die niets over de vacature zelf zeggen: geslacht, uren, werkvorm en rechtsvormen
+TITLE_NOISE = {
+    'mv', 'mvx', 'mvd', 'fulltime', 'parttime', 'uur', 'uren', 'fte', 'remote', 'hybride', 'hybrid',
+    'thuiswerken', 'nl', 'vacature', 'gezocht', 'per', 'week', 'tot', 'en',
+}
+COMPANY_NOISE = {'bv', 'nv', 'vof', 'holding', 'groep', 'group', 'nederland', 'netherlands', 'the', 'de', 'en'}
+LOCATION_NOISE = {'nederland', 'netherlands', 'omgeving', 'en', 'regio', 'provincie'}
+
+# Hoe zwaar de woorden per veld meetellen; door het bedrijf zwaar te laten wegen worden dezelfde
+# titels bij andere bedrijven (veel voorkomend: "medewerker klantenservice") zelden LSH kandidaat
+TITLE_WEIGHT = 2
+COMPANY_WEIGHT = 3
+LOCATION_WEIGHT = 2
+# Titel, bedrijf en plaats moeten elk minstens zo veel overeenkomen (bedrijf en plaats alleen als
+# beide bekend zijn), en het niveau moet gelijk zijn: een junior en een senior vacature zijn twee vacatures
+FIELD_THRESHOLD = 0.5
+LEVELS = {
+    'junior': 'junior', 'jr': 'junior', 'medior': 'medior', 'senior': 'senior', 'sr': 'senior',
+    'lead': 'lead', 'principal': 'principal', 'stagiair': 'stagiair', 'stage': 'stagiair', 'trainee': 'trainee',
+    'starter': 'starter', 'ervaren': 'ervaren',
+}
+
+_NOISE = {'title': TITLE_NOISE, 'company': COMPANY_NOISE, 'location': LOCATION_NOISE}
+
+
+@lru_cache(maxsize=100000)
+def _words(value, field):
+    # (m/v) en b.v. worden eerst één woord, daarna vallen losse letters en getallen weg
+    value = re.sub(r'\b(\w)[/.](?=\w\b)', r'\1', canonicalize(value))
+    noise = _NOISE[field]
+    return frozenset(
+        word for word in _TOKEN.findall(value) if len(word) > 1 and not word.isdigit() and word not in noise
+    )
+
+
+Profile = namedtuple('Profile', ['words', 'shingles', 'levels', 'title', 'company', 'location'])
+_WEIGHTS = {'t': TITLE_WEIGHT, 'c': COMPANY_WEIGHT, 'l': LOCATION_WEIGHT}
+
+
+def weighted(word):
+    """De shingles van een woord met veldprefix ('t:python'): één kopie per gewicht van het veld"""
+    field, _, value = word.partition(':')
+    return [f"{field}{copy}:{value}" for copy in range(_WEIGHTS[field])]
+
+
+def profile(job):
+    """Genormaliseerde woorden van een vacature om bijna-dubbele vacatures te herkennen
+
+    `words` zijn de woorden uit titel, bedrijf en locatie met een prefix per
+    veld, `shingles` dezelfde woorden met een kopie per gewicht van het veld;
+    `levels`, `title`, `company` en `location` worden daarnaast apart
+    vergeleken.
+    """
+    title = _words(job.get('title'), 'title')
+    company = _words(job.get('company_name') or job.get('company'), 'company')
+    location = _words(job.get('location'), 'location')
+    words = frozenset(
+        [f"t:{word}" for word in title] + [f"c:{word}" for word in company] + [f"l:{word}" for word in location]
+    )
+    shingles = frozenset(shingle for word in words for shingle in weighted(word))
+    levels = frozenset(LEVELS[word] for word in title if word in LEVELS)
+    return Profile(words, shingles, levels, title, company, location)
+
+
+def lsh_params(threshold, num_perm, recall=0.95):
+    """(bands, rows) met de minste kandidaten waarbij paren op `threshold` met kans `recall` kandidaat zijn"""
+    for rows in range(num_perm, 0, -1):
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            return bands, rows
+    return num_perm, 1
+
+
+class MinHasher:
+    """MinHash signatures van `num_perm` 16-bit waarden
+
+    Elke positie is het minimum van een eigen hashfunctie over de shingles;
+    de fractie gelijke posities van twee signatures schat hun Jaccard
+    similariteit. De signature wordt berekend uit de woorden van een
+    profiel: per woord wordt het minimum over zijn gewogen kopieën gecachet,
+    zodat veel voorkomende woorden (plaatsen, bedrijven) maar één keer
+    gehasht worden en elk woord maar één rij telt in het minimum.
+    """
+
+    def __init__(self, num_perm=256, cache_size=200000):
+        if num_perm % 32:
+            raise ValueError("num_perm moet een veelvoud van 32 zijn")
+        self.num_perm = num_perm
+        self.salts = [struct.pack('<I', index).ljust(16, b'\0') for index in range(num_perm // 32)]
+        self.unpack = struct.Struct(f'<{num_perm}H').unpack
+        self.cache = {}
+        self.cache_size = cache_size
+
+    def shingle_hashes(self, shingle):
+        data = shingle.encode('utf-8')
+        return self.unpack(b''.join(hashlib.blake2b(data, digest_size=64, salt=salt).digest() for salt in self.salts))
+
+    def hashes(self, word):
+        values = self.cache.get(word)
+        if values is None:
+            values = tuple(map(min, zip(*map(self.shingle_hashes, weighted(word)))))
+            if len(self.cache) >= self.cache_size:
+                self.cache.clear()
+            self.cache[word] = values
+        return values
+
+    def signature(self, words):
+        """Signature van de gewogen shingles van `words` (zie `profile`)"""
+        if not words:
+            return (0,) * self.num_perm
+        return tuple(map(min, zip(*map(self.hashes, words))))
+
+
+def jaccard(first, second):
+    common = len(first & second)
+    union = len(first) + len(second) - common
+    return common / union if union else 0.0
+
+
+def similar(first, second, threshold):
+    """Of twee profielen dezelfde vacature beschrijven"""
+    return (
+        first.levels == second.levels
+        and jaccard(first.title, second.title) >= FIELD_THRESHOLD
+        and (not first.company or not second.company or jaccard(first.company, second.company) >= FIELD_THRESHOLD)
+        and (not first.location or not second.location
+             or jaccard(first.location, second.location) >= FIELD_THRESHOLD)
+        and jaccard(first.shingles, second.shingles) >= threshold
+    )
+
+
+class NearDuplicateIndex:
+    """Clustert bijna-dubbele vacatures met MinHash en een LSH index die tussen runs bewaard blijft
+
+    Een vacature hoort bij het oudste cluster waarvoor de Jaccard
+    similariteit van zijn shingles met die van de eerste vacature van het
+    cluster minstens `threshold` is, met hetzelfde niveau en een
+    vergelijkbaar bedrijf en dezelfde plaats (zie `similar`). Kandidaten komen uit de LSH buckets
+    (banden van de MinHash signature) van de clusters, zodat er nooit alle
+    paren vergeleken worden; alleen die kandidaten worden exact nagerekend.
+    Per cluster worden de velden van de eerste vacature en de buckets
+    bewaard, en per fingerprint het cluster, zodat een bekende vacature
+    zonder MinHash herkend wordt. Een vacature zonder bruikbare woorden
+    blijft een cluster op zich. De index staat in een eigen SQLite bestand
+    (WAL), gedeeld tussen runs en worker processen.
+    """
+
+    def __init__(self, path, threshold=0.7, num_perm=256, cache_size=200000):
+        self.path = path
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm)
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        self.pack = struct.Struct(f'<{num_perm}H').pack
+        self.band_salts = [struct.pack('<H', band) for band in range(self.bands)]
+        self.profiles = {}
+        self.cache_size = cache_size
+        self.counts = Counter()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        # De buckets worden willekeurig gelezen en geschreven; een grotere page cache scheelt veel I/O
+        self.conn.execute('PRAGMA cache_size=-65536')
+        self.conn.executescript(
+            'CREATE TABLE IF NOT EXISTS cluster ('
+            'id INTEGER PRIMARY KEY, fingerprint INTEGER NOT NULL, title TEXT, company_name TEXT, location TEXT, '
+            'size INTEGER NOT NULL, last_seen REAL NOT NULL);'
+            'CREATE INDEX IF NOT EXISTS ix_cluster_last_seen ON cluster (last_seen);'
+            'CREATE TABLE IF NOT EXISTS bucket ('
+            'key INTEGER NOT NULL, cluster_id INTEGER NOT NULL, PRIMARY KEY (key, cluster_id)) WITHOUT ROWID;'
+            'CREATE TABLE IF NOT EXISTS member (fingerprint INTEGER PRIMARY KEY, cluster_id INTEGER NOT NULL) WITHOUT ROWID;'
+        )
+
+    def bucket_keys(self, signature):
+        """Eén 63-bit sleutel per band van de signature (met het bandnummer erin)"""
+        data = self.pack(*signature)
+        width = 2 * self.rows
+        return [
+            int.from_bytes(hashlib.blake2b(data[band * width:(band + 1) * width], digest_size=8,
+                                           person=self.band_salts[band]).digest(), 'big') >> 1
+            for band in range(self.bands)
+        ]
+
+    def _cluster_profiles(self, cluster_ids):
+        """{cluster id: profiel van de eerste vacature}, uit het geheugen of de database"""
+        result = {}
+        missing = []
+        for cluster_id in cluster_ids:
+            cached = self.profiles.get(cluster_id)
+            if cached is None:
+                missing.append(cluster_id)
+            else:
+                result[cluster_id] = cached
+        if missing:
+            if len(self.profiles) + len(missing) > self.cache_size:
+                self.profiles.clear()
+            for cluster_id, title, company_name, location in self.conn.execute(
+                f"SELECT id, title, company_name, location FROM cluster WHERE id IN ({','.join('?' * len(missing))})",
+                missing
+            ):
+                result[cluster_id] = self.profiles[cluster_id] = profile(
+                    {'title': title, 'company_name': company_name, 'location': location}
+                )
+        return result
+
+    def _find_cluster(self, job_profile, keys):
+        if not keys:
+            return None
+        candidates = [cluster_id for (cluster_id,) in self.conn.execute(
+            f"SELECT DISTINCT cluster_id FROM bucket WHERE key IN ({','.join('?' * len(keys))})", keys
+        )]
+        if not candidates:
+            return None
+        self.counts['candidates'] += len(candidates)
+        # Het oudste passende cluster, zodat een later cluster geen varianten van een eerder cluster overneemt
+        matches = [
+            cluster_id for cluster_id, cluster_profile in self._cluster_profiles(candidates).items()
+            if similar(job_profile, cluster_profile, self.threshold)
+        ]
+        return min(matches) if matches else None
+
+    def assign(self, jobs):
+        """Cluster id per vacature (in dezelfde volgorde); onbekende vacatures worden ingedeeld of starten een cluster"""
+        now = time.time()
+        fingerprints = [job_fingerprint(job) for job in jobs]
+        known = {}
+        unique = list(set(fingerprints))
+        for start in range(0, len(unique), 900):
+            chunk = unique[start:start + 900]
+            known.update(self.conn.execute(
+                f"SELECT fingerprint, cluster_id FROM member WHERE fingerprint IN ({','.join('?' * len(chunk))})", chunk
+            ))
+        self.counts['known'] += sum(1 for fingerprint in fingerprints if fingerprint in known)
+
+        self.conn.execute('BEGIN')
+        try:
+            for job, fingerprint in zip(jobs, fingerprints):
+                if fingerprint in known:
+                    continue
+                job_profile = profile(job)
+                keys = self.bucket_keys(self.hasher.signature(job_profile.words)) if job_profile.words else []
+                cluster_id = self._find_cluster(job_profile, keys)
+                if cluster_id is None:
+                    cluster_id = self.conn.execute(
+                        'INSERT INTO cluster (fingerprint, title, company_name, location, size, last_seen) '
+                        'VALUES (?, ?, ?, ?, 1, ?)',
+                        (fingerprint, job.get('title'), job.get('company_name') or job.get('company'),
+                         job.get('location'), now)
+                    ).lastrowid
+                    self.conn.executemany(
+                        'INSERT OR IGNORE INTO bucket (key, cluster_id) VALUES (?, ?)', [(key, cluster_id) for key in keys]
+                    )
+                    self.profiles[cluster_id] = job_profile
+                    self.counts['clusters'] += 1
+                else:
+                    self.conn.execute('UPDATE cluster SET size = size + 1 WHERE id = ?', (cluster_id,))
+                    self.counts['near_duplicates'] += 1
+                self.conn.execute('INSERT OR IGNORE INTO member (fingerprint, cluster_id) VALUES (?, ?)',
+                                  (fingerprint, cluster_id))
+                known[fingerprint] = cluster_id
+            seen = list(set(known[fingerprint] for fingerprint in fingerprints))
+            for start in range(0, len(seen), 900):
+                chunk = seen[start:start + 900]
+                self.conn.execute(
+                    f"UPDATE cluster SET last_seen = ? WHERE id IN ({','.join('?' * len(chunk))})", [now] + chunk
+                )
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        return [known[fingerprint] for fingerprint in fingerprints]
+
+    def representatives(self, cluster_ids):
+        """{cluster id: (titel, bedrijf, locatie)} van de eerste vacature van elk cluster"""
+        result = {}
+        cluster_ids = list(set(cluster_ids))
+        for start in range(0, len(cluster_ids), 900):
+            chunk = cluster_ids[start:start + 900]
+            for cluster_id, title, company_name, location in self.conn.execute(
+                f"SELECT id, title, company_name, location FROM cluster WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            ):
+                result[cluster_id] = (title, company_name, location)
+        return result
+
+    def collapse(self, jobs):
+        """Voeg bijna-dubbele vacatures samen tot één record per cluster, op volgorde van eerste voorkomen
+
+        Het record is de eerste vacature uit `jobs` met de titel, het bedrijf
+        en de locatie van de eerste vacature van het cluster (zodat de
+        fingerprint over runs heen gelijk blijft en een variant niet opnieuw
+        verstuurd wordt), plus alle links en apply_options van de varianten.
+        """
+        return [record for record, _ in self.collapse_groups(jobs)]
+
+    def collapse_groups(self, jobs):
+        """Als `collapse`, maar als [(record, indexen van de samengevoegde vacatures in `jobs`)]"""
+        if not jobs:
+            return []
+        groups = {}
+        for position, cluster_id in enumerate(self.assign(jobs)):
+            groups.setdefault(cluster_id, []).append(position)
+        representatives = self.representatives(groups)
+
+        collapsed = []
+        for cluster_id, positions in groups.items():
+            members = [jobs[position] for position in positions]
+            record = dict(members[0])
+            title, company_name, location = representatives[cluster_id]
+            record.update(title=title, company_name=company_name, location=location)
+            if len(members) > 1:
+                record['links'] = list(dict.fromkeys(job['link'] for job in members if job.get('link')))
+                apply_options = {}
+                for job in members:
+                    for option in job.get('apply_options') or []:
+                        apply_options.setdefault(option.get('link'), option)
+                if apply_options:
+                    record['apply_options'] = list(apply_options.values())
+                self.counts['collapsed'] += len(members) - 1
+            collapsed.append((record, positions))
+        return collapsed
+
+    def prune(self, before):
+        """Verwijder clusters die sinds `before` (unix tijd) niet meer gezien zijn, met hun buckets en leden"""
+        self.conn.execute('BEGIN')
+        stale = 'SELECT id FROM cluster WHERE last_seen < ?'
+        self.conn.execute(f'DELETE FROM bucket WHERE cluster_id IN ({stale})', (before,))
+        self.conn.execute(f'DELETE FROM member WHERE cluster_id IN ({stale})', (before,))
+        removed = self.conn.execute('DELETE FROM cluster WHERE last_seen < ?', (before,)).rowcount
+        self.conn.execute('COMMIT')
+        self.profiles.clear()
+        return removed
+
+    def stats(self):
+        return dict(self.counts)
+
+    def close(self):
+        self.conn.close()
+
+
+def create_near_duplicate_index(config):
+    """NearDuplicateIndex volgens NEAR_DUPLICATES_* in de config, of None als clusteren uit staat"""
+    if not config['NEAR_DUPLICATES']:
+        return None
+    return NearDuplicateIndex(
+        config['NEAR_DUPLICATES_PATH'],
+        threshold=config['NEAR_DUPLICATE_THRESHOLD'],
+        num_perm=config['NEAR_DUPLICATE_PERMUTATIONS'],
+    )
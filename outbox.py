@@ -0,0 +1,215 @@
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import EMAIL_FAILURES, EMAILS_SENT, OUTBOX_QUEUE_DEPTH, STAGE_SECONDS
+from resilience import CircuitBreaker, RetryPolicy, call_with_retries, create_retry_policy, get_breaker
+
+
+def is_transient(error):
+    """Verbindingsfouten, timeouts en 4xx antwoorden van de server zijn het opnieuw proberen waard
+
+    Permanente fouten (5xx, geweigerde ontvangers) worden niet herhaald.
+    """
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    # SMTPException is een OSError, maar de overige SMTP fouten zijn permanent
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class SMTPSession:
+    """Eén langlevende, geauthenticeerde SMTP verbinding
+
+    De verbinding wordt pas bij het eerste bericht opgezet en na
+    `max_messages` berichten ververst. Na `idle_check` seconden stilte wordt
+    eerst met een NOOP gecontroleerd of de server de verbinding nog open
+    heeft (servers sluiten idle verbindingen); zo niet, dan wordt er
+    opnieuw verbonden voordat er iets verstuurd is. Een fout tijdens het
+    versturen zelf wordt niet hier herhaald: die gaat naar de retry policy
+    van de Outbox, want na DATA kan het bericht al afgeleverd zijn.
+    """
+
+    idle_check = 5
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True, timeout=30, max_messages=100):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.timeout = timeout
+        self.max_messages = max_messages
+        self.server = None
+        self.sent = 0
+        self.last_used = 0.0
+
+    def connect(self):
+        self.close()
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.username:
+                server.login(self.username, self.password)
+        except BaseException:
+            # Een half opgezette verbinding (bijv. geweigerde login) niet laten lekken
+            server.close()
+            raise
+        self.server = server
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except (smtplib.SMTPException, OSError):
+                self.server.close()
+            self.server = None
+
+    def alive(self):
+        """Of de server een idle verbinding nog open heeft (NOOP, vóór het versturen)"""
+        try:
+            self.server.noop()
+        except (smtplib.SMTPException, OSError):
+            return False
+        return True
+
+    def send(self, msg):
+        if self.server is not None and time.monotonic() - self.last_used > self.idle_check and not self.alive():
+            self.server.close()
+            self.server = None
+        if self.server is None or self.sent >= self.max_messages:
+            self.connect()
+        self.server.send_message(msg)
+        self.sent += 1
+        self.last_used = time.monotonic()
+
+
+class Outbox:
+    """Wachtrij van opgemaakte e-mails, verstuurd door een kleine pool SMTP sessies
+
+    `put` geeft een Future terug die het resultaat van de aflevering bevat,
+    zodat aanroepers kunnen wachten of fouten kunnen afhandelen. Tijdelijke
+    fouten worden volgens `retry` opnieuw geprobeerd; zolang de `breaker`
+    open staat falen berichten direct, zodat de wachtrij niet vastloopt op
+    een onbereikbare server.
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_tls=True,
+                 pool_size=2, max_messages_per_connection=100, timeout=30, breaker=None, retry=None):
+        self.session_args = dict(
+            host=host, port=port, username=username, password=password,
+            use_tls=use_tls, timeout=timeout, max_messages=max_messages_per_connection
+        )
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker(f"smtp:{host}")
+        self.retry = retry or RetryPolicy()
+        self.queue = queue.Queue()
+        self.threads = []
+        self.lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.started_at = None
+        self.finished_at = None
+
+    def start(self):
+        OUTBOX_QUEUE_DEPTH.set_function(self.queue.qsize)
+        for i in range(self.pool_size):
+            thread = threading.Thread(target=self._run, name=f"outbox-{i}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return self
+
+    def put(self, msg):
+        """Zet een bericht in de wachtrij; geeft een Future terug"""
+        if not self.threads:
+            self.start()
+        with self.lock:
+            if self.started_at is None:
+                self.started_at = time.monotonic()
+        future = Future()
+        self.queue.put((msg, future))
+        return future
+
+    def flush(self):
+        """Wacht tot alle berichten in de wachtrij verwerkt zijn"""
+        self.queue.join()
+
+    def close(self):
+        """Verwerk de resterende berichten en sluit alle SMTP sessies"""
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+    def _deliver(self, session, msg):
+        try:
+            session.send(msg)
+        except Exception as e:
+            # Na een antwoord van de server (4xx/5xx, geweigerde ontvanger) is de verbinding nog
+            # bruikbaar; na een verbroken verbinding of timeout begint een volgende poging opnieuw
+            if isinstance(e, smtplib.SMTPServerDisconnected) or not isinstance(e, smtplib.SMTPException):
+                session.close()
+            raise
+
+    def _run(self):
+        session = SMTPSession(**self.session_args)
+        send_seconds = STAGE_SECONDS.labels('smtp_send')
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    self.queue.task_done()
+                    break
+                msg, future = item
+                try:
+                    with send_seconds.time():
+                        call_with_retries(lambda: self._deliver(session, msg), self.breaker, self.retry, is_transient)
+                except Exception as e:
+                    with self.lock:
+                        self.failed += 1
+                    EMAIL_FAILURES.inc()
+                    future.set_exception(e)
+                else:
+                    with self.lock:
+                        self.sent += 1
+                        self.finished_at = time.monotonic()
+                    EMAILS_SENT.inc()
+                    future.set_result(msg['To'])
+                finally:
+                    self.queue.task_done()
+        finally:
+            session.close()
+
+    def stats(self):
+        """Aantal verstuurde en mislukte berichten en de doorvoer in berichten per seconde"""
+        with self.lock:
+            elapsed = (self.finished_at - self.started_at) if self.finished_at and self.started_at else 0.0
+            return {
+                "sent": self.sent,
+                "failed": self.failed,
+                "queued": self.queue.qsize(),
+                "messages_per_second": self.sent / elapsed if elapsed > 0 else 0.0,
+            }
+
+
+def create_outbox(config, pool_size=None):
+    """Maak een Outbox op basis van een config mapping (bijv. `app.config`)"""
+    return Outbox(
+        config['MAIL_SERVER'],
+        config['MAIL_PORT'],
+        username=config['MAIL_USERNAME'],
+        password=config['MAIL_PASSWORD'],
+        use_tls=config['MAIL_USE_TLS'],
+        pool_size=pool_size or config['MAIL_POOL_SIZE'],
+        max_messages_per_connection=config['MAIL_MAX_MESSAGES_PER_CONNECTION'],
+        timeout=config['MAIL_TIMEOUT'],
+        breaker=get_breaker(f"smtp:{config['MAIL_SERVER']}", config),
+        retry=create_retry_policy(config),
+    )
@@ -0,0 +1,307 @@
+import cProfile
+import heapq
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Categorieën voor de toerekening van tijd, op volgorde van prioriteit per frame
+CATEGORY_MODULES = [
+    ('json', ('json/',)),
+    ('orm', ('sqlalchemy/', 'flask_sqlalchemy/')),
+    ('smtp', ('smtplib.py', 'outbox.py', 'email/')),
+    ('render', ('jinja2/', 'email_templates.py')),
+    ('fetch', ('requests/', 'urllib3/', 'fetch_engine.py', 'job_sources.py')),
+]
+CATEGORIES = [category for category, _ in CATEGORY_MODULES] + ['other']
+
+_NULL = nullcontext()
+
+
+def classify(stack):
+    """Categorie van een stack (leaf eerst): het eerste frame dat bij een categorie hoort
+
+    Generieke I/O frames (socket, ssl, http.client) horen nergens bij, zodat
+    een socket read onder smtplib als smtp telt en onder urllib3 als fetch.
+    """
+    for filename in stack:
+        for category, patterns in CATEGORY_MODULES:
+            if any(pattern in filename for pattern in patterns):
+                return category
+    return 'other'
+
+
+def frame_name(code):
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler(threading.Thread):
+    """Bemonstert periodiek de stack van de worker thread (of van alle threads)
+
+    Samples van de worker thread krijgen het label dat de worker op dat
+    moment gezet heeft (de alert die verwerkt wordt of de stap van de batch);
+    andere threads krijgen hun threadnaam als label. Eén sample van de worker
+    thread kost enkele tientallen microseconden; met `all_threads` groeit dat
+    met het aantal threads (SMTP sessies, fetch pool).
+    """
+
+    def __init__(self, target_thread, interval=0.01, all_threads=False):
+        super().__init__(name='profiler', daemon=True)
+        self.target_id = target_thread.ident
+        self.interval = interval
+        self.all_threads = all_threads
+        self.label = 'run'
+        self.samples = Counter()
+        self.stopped = threading.Event()
+
+    def record(self, label, frame):
+        stack = []
+        while frame is not None:
+            stack.append(frame.f_code)
+            frame = frame.f_back
+        self.samples[(label, tuple(stack))] += 1
+
+    def run(self):
+        own_id = threading.get_ident()
+        while not self.stopped.wait(self.interval):
+            frames = sys._current_frames()
+            if not self.all_threads:
+                frame = frames.get(self.target_id)
+                if frame is not None:
+                    self.record(self.label, frame)
+                continue
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in frames.items():
+                if thread_id != own_id:
+                    self.record(self.label if thread_id == self.target_id else names.get(thread_id, 'thread'), frame)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class RunProfiler:
+    """Profiel van één worker run, met tijd per alert
+
+    `mode` is 'stacks' (sampling, collapsed stacks voor flamegraph.pl of
+    speedscope) of 'cprofile' (cProfile stats van de worker thread). In
+    beide modi bemonstert een sampler de stacks om de tijd van de traagste
+    alerts toe te rekenen aan fetch, JSON, ORM, SMTP, rendering of overig.
+    De tijd van een stap van de batch (ophalen, digests, aflevering) wordt
+    naar rato verdeeld over de alerts die erbij horen. Met `sample_rate` < 1
+    wordt maar een deel van de runs geprofileerd.
+    """
+
+    def __init__(self, mode='stacks', output_dir='profiles', sample_rate=1.0, interval=0.01,
+                 slowest=10, alert_files=0, all_threads=False):
+        self.mode = mode
+        self.all_threads = all_threads
+        self.output_dir = output_dir
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.slowest = slowest
+        self.alert_files = alert_files
+        self.active = False
+        self.sampler = None
+        self.alert_times = {}
+        self.alert_shares = defaultdict(list)
+        self.phase_times = defaultdict(float)
+        self.phase_counts = Counter()
+
+    @contextmanager
+    def run(self):
+        """Profileer het blok (als deze run in de steekproef valt)"""
+        if random.random() >= self.sample_rate:
+            yield self
+            return
+
+        self.active = True
+        self.alert_times = {}
+        self.alert_shares = defaultdict(list)
+        self.phase_times = defaultdict(float)
+        self.phase_counts = Counter()
+        self.sampler = StackSampler(threading.current_thread(), self.interval, self.all_threads)
+        profile = cProfile.Profile() if self.mode == 'cprofile' else None
+        started = time.perf_counter()
+        self.sampler.start()
+        if profile:
+            profile.enable()
+        try:
+            yield self
+        finally:
+            if profile:
+                profile.disable()
+            self.sampler.stop()
+            self.active = False
+            self.write(time.perf_counter() - started, profile)
+
+    def phase(self, name, groups=None):
+        """Markeer een stap van de batch (bijv. fetch) die niet bij één alert hoort
+
+        `groups` zijn de lijsten alerts waarvoor de stap werkt (zoekopdrachten,
+        e-mails): elke groep krijgt een gelijk deel van de tijd en samples,
+        gelijk verdeeld over zijn alerts.
+        """
+        if not self.active:
+            return _NULL
+        self.phase_counts[name] += 1
+        label = f"{name}:{self.phase_counts[name]}"
+        shares = []
+        groups = [group for group in groups or () if group]
+        for group in groups:
+            for alert in group:
+                shares.append((alert.id, alert.search_query, 1 / (len(groups) * len(group))))
+
+        def record(elapsed):
+            self.phase_times[name] += elapsed
+            for alert_id, query, fraction in shares:
+                self._alert_time(alert_id, query)[1] += elapsed * fraction
+                self.alert_shares[alert_id].append((label, fraction))
+        return self._labelled(label, record)
+
+    def alert(self, alert):
+        """Meet de wall time van één alert en reken samples aan die alert toe"""
+        if not self.active:
+            return _NULL
+        alert_id, query = alert.id, alert.search_query
+
+        def record(elapsed):
+            self._alert_time(alert_id, query)[0] += elapsed
+        return self._labelled(f"alert:{alert_id}", record)
+
+    def _alert_time(self, alert_id, query):
+        """[eigen seconden, gedeelde seconden, zoekterm] van een alert"""
+        times = self.alert_times.get(alert_id)
+        if times is None:
+            times = self.alert_times[alert_id] = [0.0, 0.0, query]
+        return times
+
+    @contextmanager
+    def _labelled(self, label, record):
+        previous = self.sampler.label
+        self.sampler.label = label
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            record(time.perf_counter() - started)
+            self.sampler.label = previous
+
+    def attribution(self, label, weights=None):
+        """Tijd per categorie (seconden) op basis van de samples met dit label
+
+        Een stap van de batch telt met al zijn keren (`fetch` omvat `fetch:1`,
+        `fetch:2`, ...). Met `weights` ({label: fractie}) tellen ook die
+        samples mee, naar rato.
+        """
+        weights = dict(weights or {})
+        totals = dict.fromkeys(CATEGORIES, 0.0)
+        for (sample_label, stack), count in self.sampler.samples.items():
+            if sample_label == label or sample_label.split(':')[0] == label:
+                weight = 1.0
+            else:
+                weight = weights.get(sample_label)
+                if weight is None:
+                    continue
+            totals[classify([code.co_filename for code in stack])] += count * weight * self.interval
+        return {category: round(seconds, 4) for category, seconds in totals.items() if seconds}
+
+    def alert_attribution(self, alert_id):
+        """Tijd per categorie van een alert: zijn eigen samples plus zijn deel van de stappen van de batch"""
+        weights = defaultdict(float)
+        for label, fraction in self.alert_shares.get(alert_id, ()):
+            weights[label] += fraction
+        return self.attribution(f"alert:{alert_id}", weights)
+
+    def collapsed(self, label=None):
+        """Stacks in het collapsed formaat (root eerst, `;`-gescheiden, gevolgd door het aantal samples)"""
+        lines = Counter()
+        for (sample_label, stack), count in self.sampler.samples.items():
+            if label is None or sample_label == label:
+                root = sample_label.split(':')[0]
+                lines[';'.join([root] + [frame_name(code) for code in reversed(stack)])] += count
+        return ''.join(f"{stack} {count}\n" for stack, count in sorted(lines.items()))
+
+    def write(self, elapsed, profile):
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, f"run-{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}")
+        if profile:
+            profile.dump_stats(f"{base}.prof")
+        else:
+            with open(f"{base}.collapsed", 'w', encoding='utf-8') as f:
+                f.write(self.collapsed())
+
+        slowest = heapq.nlargest(
+            self.slowest,
+            ((own + shared, own, alert_id, query) for alert_id, (own, shared, query) in self.alert_times.items())
+        )
+        report = {
+            'mode': self.mode,
+            'seconds': round(elapsed, 4),
+            'alerts': len(self.alert_times),
+            'samples': sum(self.sampler.samples.values()),
+            'interval': self.interval,
+            'phases': {name: round(seconds, 4) for name, seconds in self.phase_times.items()},
+            'phase_attribution': {name: self.attribution(name) for name in self.phase_times},
+            'slowest_alerts': [
+                {
+                    'alert_id': alert_id,
+                    'search_query': query,
+                    'seconds': round(seconds, 4),
+                    'own_seconds': round(own, 4),
+                    'attribution': self.alert_attribution(alert_id),
+                }
+                for seconds, own, alert_id, query in slowest
+            ],
+        }
+        with open(f"{base}.json", 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        for _, _, alert_id, _ in slowest[:self.alert_files]:
+            with open(f"{base}-alert-{alert_id}.collapsed", 'w', encoding='utf-8') as f:
+                f.write(self.collapsed(f"alert:{alert_id}"))
+
+        logger.info("Profiel van %.2fs run weggeschreven naar %s.*", elapsed, base)
+        for entry in report['slowest_alerts'][:5]:
+            logger.info("Trage alert %s (%s): %.1f ms %s", entry['alert_id'], entry['search_query'],
+                        entry['seconds'] * 1000, entry['attribution'])
+
+
+class NullProfiler:
+    """Profiler die niets doet, voor runs zonder --profile"""
+
+    active = False
+
+    def run(self):
+        return nullcontext(self)
+
+    def phase(self, name, groups=None):
+        return _NULL
+
+    def alert(self, alert):
+        return _NULL
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def create_profiler(config, mode=None):
+    """Profiler uit de config (PROFILE_MODE), of een NullProfiler als profileren uit staat"""
+    mode = mode or config['PROFILE_MODE']
+    if not mode:
+        return NULL_PROFILER
+    return RunProfiler(
+        mode=mode,
+        output_dir=config['PROFILE_DIR'],
+        sample_rate=config['PROFILE_SAMPLE_RATE'],
+        interval=config['PROFILE_INTERVAL_MS'] / 1000,
+        alert_files=config['PROFILE_ALERT_FILES'],
+        all_threads=config['PROFILE_ALL_THREADS'],
+    )
@@ -0,0 +1,304 @@
+import heapq
+import logging
+import math
+import random
+import threading
+import time
+from collections import namedtuple
+from datetime import timedelta
+from functools import lru_cache
+
+from metrics import QUOTA_PLANNED_CALLS
+
+logger = logging.getLogger(__name__)
+
+# Google Jobs geeft 10 vacatures per pagina; FetchEngine stopt na 3 pagina's of 25 vacatures (num=25)
+PAGE_SIZE = 10
+MAX_PAGES = 3
+MAX_JOBS = 25
+# Controle-intervallen (uren) waaruit het plan kiest, naast het interval van de frequentie zelf
+INTERVALS = (1, 2, 3, 4, 6, 8, 12, 24, 36, 48, 72, 96, 120, 168, 336, 720)
+# Spreiding van opgerekte intervallen (fractie), zodat zoekopdrachten die tegelijk opgerekt
+# worden niet samen blijven vallen
+SPREAD = 0.1
+# Venster van de eerste controle van een zoekopdracht (de date_posted:today filter)
+FIRST_WINDOW_HOURS = 24
+
+# Exponentieel vervallen sommen van nieuwe vacatures, API calls en gecontroleerde uren
+Yield = namedtuple('Yield', 'jobs calls hours')
+# Wat het plan voor één zoekopdracht kiest, met de verwachte calls en nieuwe vacatures per dag
+# (jobs is None voor een zoekopdracht die nog niet gemeten is)
+Allocation = namedtuple('Allocation', 'hours pages calls jobs')
+
+
+def capacity(pages):
+    """Hoeveel vacatures een controle van `pages` pagina's hooguit oplevert"""
+    return min(pages * PAGE_SIZE, MAX_JOBS)
+
+
+def observe(previous, new_jobs, api_calls, hours, half_life_hours, pages=MAX_PAGES):
+    """Yield na een controle die `new_jobs` nieuwe vacatures opleverde over een venster van `hours` uur
+
+    Eerdere metingen wegen mee met een halfwaardetijd van `half_life_hours`,
+    zodat een zoekopdracht die stilvalt (of opleeft) binnen een paar
+    halfwaardetijden anders ingepland wordt. Een controle waarvan alle
+    `pages` pagina's vol nieuwe vacatures stonden heeft er waarschijnlijk
+    gemist: die telt één pagina extra, zodat het plan een diepere of
+    vroegere controle probeert.
+    """
+    if new_jobs >= capacity(pages):
+        new_jobs += PAGE_SIZE
+    if previous is None:
+        return Yield(float(new_jobs), float(api_calls), float(hours))
+    weight = 0.5 ** (hours / half_life_hours)
+    return Yield(previous.jobs * weight + new_jobs, previous.calls * weight + api_calls,
+                 previous.hours * weight + hours)
+
+
+def rate(estimate):
+    """Nieuwe vacatures per uur volgens een Yield, of None zonder metingen"""
+    if estimate is None or not estimate.hours:
+        return None
+    return estimate.jobs / estimate.hours
+
+
+def expected_check(jobs_per_hour, hours, pages):
+    """(nieuwe vacatures, API calls) van één controle na `hours` uur met hooguit `pages` pagina's
+
+    De date_posted filter houdt de resultaten ongeveer bij wat er sinds de
+    vorige controle bij kwam: er worden pagina's opgehaald tot dat op is,
+    met altijd minstens één call. Wat niet op de pagina's past wordt gemist.
+    """
+    arrived = jobs_per_hour * hours
+    return min(arrived, capacity(pages)), min(pages, max(1, math.ceil(arrived / PAGE_SIZE)))
+
+
+def freshness(hours, freshness_hours):
+    """Gemiddelde waarde van een vacature die tot `hours` uur na verschijnen gevonden wordt
+
+    Een vacature is na `freshness_hours` nog half zoveel waard; bij een
+    interval van `hours` wacht hij gemiddeld de helft daarvan.
+    """
+    decay = math.log(2) / freshness_hours
+    return (1 - math.exp(-decay * hours)) / (decay * hours)
+
+
+def _gain(cheaper, dearer):
+    """Extra waarde per extra API call tussen twee opties"""
+    return (dearer[1] - cheaper[1]) / (dearer[0] - cheaper[0])
+
+
+@lru_cache(maxsize=65536)
+def frontier(jobs_per_hour, min_hours, max_hours, freshness_hours=24):
+    """Efficiënte opties [(calls per dag, waarde per dag, uren, pagina's, vacatures per dag)]
+
+    De waarde is het verwachte aantal nieuwe vacatures per dag, gewogen
+    naar hoe vers ze gevonden worden (zie freshness). Alleen de bovenste
+    convexe omhullende, van goedkoop naar duur: elke volgende optie levert
+    meer op, met een dalende meeropbrengst per extra call. Intervallen
+    lopen van `min_hours` (de frequentie van de gebruiker) tot `max_hours`.
+    Gecachet: allocate rondt de opbrengst af, zodat zoekopdrachten met
+    ongeveer dezelfde opbrengst en frequentie één omhullende delen.
+    """
+    longest = max(min_hours, max_hours)
+    intervals = sorted({min_hours, longest, *(hours for hours in INTERVALS if min_hours < hours < longest)})
+    options = []
+    for hours in intervals:
+        for pages in range(1, MAX_PAGES + 1):
+            jobs, calls = expected_check(jobs_per_hour, hours, pages)
+            jobs_per_day = jobs * 24 / hours
+            options.append((calls * 24 / hours, jobs_per_day * freshness(hours, freshness_hours), hours, pages,
+                            jobs_per_day))
+    # Bij gelijke kosten de optie met de meeste waarde, daarna de kortste
+    options.sort(key=lambda option: (option[0], -option[1], option[2]))
+
+    hull = []
+    for option in options:
+        if hull and option[1] <= hull[-1][1]:
+            continue
+        while len(hull) >= 2 and _gain(hull[-2], hull[-1]) <= _gain(hull[-1], option):
+            hull.pop()
+        hull.append(option)
+    return hull
+
+
+def allocate(searches, daily_calls, max_hours=168, freshness_hours=24, min_gain=0.0):
+    """Verdeel een budget van `daily_calls` API calls per dag over zoekopdrachten
+
+    `searches` is {sleutel: (kortste interval in uren, nieuwe vacatures per
+    uur of None)}. Elke gemeten zoekopdracht begint op zijn goedkoopste
+    optie (het langste interval, één pagina); daarna krijgt steeds de stap
+    met de meeste extra (versheid-gewogen) vacatures per extra call het
+    budget, zolang die stap meer dan `min_gain` oplevert en nog past. Zo
+    gaan de calls eerst naar drukke zoekopdrachten en blijven dode
+    zoekopdrachten op het langste interval. Een zoekopdracht die nog
+    niet gemeten is wordt volgens de frequentie van de gebruiker en met
+    alle pagina's gecontroleerd, zodat zijn opbrengst bekend wordt. Geeft
+    {sleutel: Allocation} terug.
+    """
+    plan = {}
+    hulls = {}
+    spent = 0.0
+    for key, (min_hours, jobs_per_hour) in searches.items():
+        if jobs_per_hour is None:
+            plan[key] = Allocation(min_hours, MAX_PAGES, 24 / min_hours * MAX_PAGES, None)
+        else:
+            # Op twee significante cijfers: nauwkeuriger is de gemeten opbrengst toch niet
+            hull = hulls[key] = frontier(float(f"{jobs_per_hour:.2g}"), min_hours, max_hours, freshness_hours)
+            calls, _, hours, pages, jobs = hull[0]
+            plan[key] = Allocation(hours, pages, calls, jobs)
+        spent += plan[key].calls
+
+    heap = [(-_gain(hull[0], hull[1]), key, 1) for key, hull in hulls.items() if len(hull) > 1]
+    heapq.heapify(heap)
+    while heap:
+        gain, key, step = heapq.heappop(heap)
+        if -gain <= min_gain:
+            break
+        hull = hulls[key]
+        extra = hull[step][0] - hull[step - 1][0]
+        # Past deze stap niet meer, dan de volgende stappen van deze zoekopdracht ook niet
+        if spent + extra > daily_calls:
+            continue
+        spent += extra
+        calls, _, hours, pages, jobs = hull[step]
+        plan[key] = Allocation(hours, pages, calls, jobs)
+        if step + 1 < len(hull):
+            heapq.heappush(heap, (-_gain(hull[step], hull[step + 1]), key, step + 1))
+    return plan
+
+
+def spread(hours, min_hours, rng=random):
+    """Een interval uit het plan met ±SPREAD spreiding, als het langer is dan `min_hours`
+
+    Zoekopdrachten die samen op hetzelfde lange interval komen (bijvoorbeeld
+    dode zoekopdrachten na hun eerste meting) zouden anders elke week in
+    dezelfde run vallen, met een piek in calls op die dag.
+    """
+    if hours <= min_hours:
+        return hours
+    return max(min_hours, hours * rng.uniform(1 - SPREAD, 1 + SPREAD))
+
+
+def load_yields():
+    """{(zoekterm, locatie): Yield} van alle zoekopdrachten met metingen"""
+    from models import SearchState, db
+
+    rows = db.session.query(
+        SearchState.search_query, SearchState.location,
+        SearchState.yield_jobs, SearchState.yield_calls, SearchState.yield_hours
+    ).filter(SearchState.yield_hours.isnot(None))
+    return {(query, location): Yield(jobs, calls, hours) for query, location, jobs, calls, hours in rows}
+
+
+class QuotaBudget:
+    """Dagbudget aan SerpApi calls, verdeeld over zoekopdrachten naar hun opbrengst
+
+    Per zoekopdracht (SearchState) wordt bijgehouden hoeveel nieuwe
+    vacatures hij per gecontroleerd uur en per call oplevert, exponentieel
+    vervallen. Het plan (zie allocate) kiest daarmee per zoekopdracht een
+    controle-interval en het aantal pagina's, zodat het budget zoveel
+    mogelijk nieuwe vacatures oplevert; een zoekopdracht wordt nooit vaker
+    gecontroleerd dan de kortste frequentie van zijn alerts en nooit minder
+    vaak dan eens per `max_hours` (of zijn frequentie, als die langer is).
+    Een vacature telt voor de helft als hij `freshness_hours` na verschijnen
+    gevonden wordt, en een stap in het plan moet minstens `min_gain` van
+    zulke vacatures per extra call opleveren. Het plan wordt hooguit elke `plan_seconds` herberekend en gedeeld door
+    alle runs en threads van het proces.
+    """
+
+    def __init__(self, daily_calls, half_life_hours=168, max_hours=168, freshness_hours=24, min_gain=0.0,
+                 plan_seconds=600):
+        self.daily_calls = daily_calls
+        self.half_life_hours = half_life_hours
+        self.max_hours = max_hours
+        self.freshness_hours = freshness_hours
+        self.plan_seconds = plan_seconds
+        self.min_gain = min_gain
+        self.allocations = None
+        self.shortest = {}
+        self.planned_at = None
+        self.lock = threading.Lock()
+
+    def plan(self, load_searches):
+        """Het huidige plan {sleutel: Allocation}; herberekend als het ouder is dan plan_seconds
+
+        `load_searches()` geeft {sleutel: kortste controle-interval} van alle
+        actieve alerts en wordt alleen bij het herberekenen aangeroepen.
+        """
+        with self.lock:
+            if self.planned_at is not None and time.monotonic() - self.planned_at < self.plan_seconds:
+                return self.allocations
+            yields = load_yields()
+            self.shortest = {key: interval.total_seconds() / 3600 for key, interval in load_searches().items()}
+            searches = {key: (hours, rate(yields.get(key))) for key, hours in self.shortest.items()}
+            self.allocations = allocate(searches, self.daily_calls, self.max_hours, self.freshness_hours,
+                                        self.min_gain)
+            self.planned_at = time.monotonic()
+
+        calls = sum(allocation.calls for allocation in self.allocations.values())
+        jobs = sum(allocation.jobs or 0 for allocation in self.allocations.values())
+        unmeasured = sum(allocation.jobs is None for allocation in self.allocations.values())
+        QUOTA_PLANNED_CALLS.set(calls)
+        logger.info("Quotaplan voor %s zoekopdrachten (%s nog niet gemeten): %.0f van %s calls per dag, "
+                    "%.0f nieuwe vacatures per dag verwacht", len(self.allocations), unmeasured, calls,
+                    self.daily_calls, jobs)
+        if calls > self.daily_calls:
+            logger.warning("Het quotabudget van %s calls per dag is te klein voor de langste intervallen "
+                           "(%.0f calls per dag)", self.daily_calls, calls)
+        return self.allocations
+
+    def allocation(self, key):
+        if self.allocations is None:
+            return None
+        return self.allocations.get(key)
+
+    def interval(self, key):
+        """Controle-interval van een zoekopdracht volgens het plan, of None zonder plan"""
+        allocation = self.allocation(key)
+        if allocation is None:
+            return None
+        return timedelta(hours=spread(allocation.hours, self.shortest[key]))
+
+    def pages(self, key):
+        """Hoeveel pagina's een zoekopdracht volgens het plan ophaalt"""
+        allocation = self.allocation(key)
+        return allocation.pages if allocation else MAX_PAGES
+
+    def observe(self, state, new_jobs, api_calls, previous_success, now, pages=MAX_PAGES):
+        """Werk de opbrengst van een SearchState bij na een geslaagde zoekopdracht
+
+        Het venster loopt vanaf de vorige geslaagde zoekopdracht
+        (`previous_success`), zodat elke vacature in precies één venster valt.
+        """
+        if previous_success is None:
+            hours = FIRST_WINDOW_HOURS
+        else:
+            hours = max((now - previous_success).total_seconds() / 3600, 1 / 60)
+        previous = None if state.yield_hours is None else Yield(state.yield_jobs, state.yield_calls,
+                                                                 state.yield_hours)
+        state.yield_jobs, state.yield_calls, state.yield_hours = observe(
+            previous, new_jobs, api_calls, hours, self.half_life_hours, pages
+        )
+
+
+_budget = None
+_budget_lock = threading.Lock()
+
+
+def get_quota_budget(config):
+    """De QuotaBudget van dit proces volgens QUOTA_* in de config, of None zonder dagbudget"""
+    global _budget
+    if config['QUOTA_DAILY_CALLS'] <= 0:
+        return None
+    with _budget_lock:
+        if _budget is None:
+            _budget = QuotaBudget(
+                config['QUOTA_DAILY_CALLS'],
+                half_life_hours=config['QUOTA_HALF_LIFE_DAYS'] * 24,
+                max_hours=config['QUOTA_MAX_INTERVAL_DAYS'] * 24,
+                freshness_hours=config['QUOTA_FRESHNESS_HOURS'],
+                min_gain=config['QUOTA_MIN_YIELD'],
+                plan_seconds=config['QUOTA_PLAN_SECONDS'],
+            )
+        return _budget
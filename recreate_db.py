@@ -1,6 +1,9 @@
-from app import app, db
+from app import create_app
+from models import db
 import os
 
+app = create_app()
+
 def recreate_database():
     with app.app_context():
         # Verwijder de oude database als deze bestaat
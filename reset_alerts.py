@@ -1,6 +1,9 @@
-from app import app, db, JobAlert
+from app import create_app
+from models import db, JobAlert
 from datetime import datetime, timedelta
 
+app = create_app()
+
 def reset_alerts():
     with app.app_context():
         # Haal alle alerts op
@@ -11,6 +14,7 @@ def reset_alerts():
         
         for alert in alerts:
             alert.last_check = two_days_ago
+            alert.next_check_at = datetime.utcnow()
             print(f"Reset alert: {alert.search_query}")
         
         # Sla de wijzigingen op
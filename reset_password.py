@@ -1,6 +1,9 @@
-from app import app, db, User
+from app import create_app
+from models import db, User
 from werkzeug.security import generate_password_hash
 
+app = create_app()
+
 def reset_password(email, new_password):
     with app.app_context():
         user = User.query.filter_by(email=email).first()
@@ -0,0 +1,164 @@
+import logging
+import random
+import threading
+import time
+
+from metrics import CIRCUIT_OPEN, RETRIES
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """De aanroep is niet gedaan omdat de circuit breaker van het doel open staat"""
+
+
+class TransientError(Exception):
+    """Tijdelijke fout van een doel (bijv. HTTP 429 of 5xx) die opnieuw geprobeerd mag worden
+
+    `retry_after` is de wachttijd in seconden die de server zelf opgaf, of None.
+    """
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Faalt direct zolang een doel (SerpApi, de SMTP server) onbereikbaar is
+
+    Na `failure_threshold` opeenvolgende mislukte aanroepen gaat de breaker
+    open en geeft `allow` meteen een CircuitOpenError. Na `reset_timeout`
+    seconden mag er één proefaanroep door (half open): slaagt die, dan gaat
+    de breaker weer dicht, anders blijft hij nog een periode open.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """Geef een CircuitOpenError als er nu niet aangeroepen mag worden"""
+        with self.lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self.probing = False
+            if self.state == HALF_OPEN and not self.probing:
+                self.probing = True
+                return
+        raise CircuitOpenError(f"{self.name} is onbereikbaar (circuit breaker open)")
+
+    def record_success(self):
+        with self.lock:
+            if self.state != CLOSED:
+                logger.info("%s is weer bereikbaar, circuit breaker dicht", self.name)
+                CIRCUIT_OPEN.labels(self.name).set(0)
+            self.state = CLOSED
+            self.failures = 0
+            self.probing = False
+
+    def release(self):
+        """Geef de proefaanroep vrij zonder uitkomst (een fout die niets over het doel zegt)
+
+        Zonder dit blijft een half open breaker na zo'n fout voor altijd
+        wachten op een proefaanroep die nooit terugmeldt.
+        """
+        with self.lock:
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                if self.state == CLOSED:
+                    logger.warning("%s faalde %d keer achter elkaar, circuit breaker open voor %ss",
+                                   self.name, self.failures, self.reset_timeout)
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.probing = False
+                CIRCUIT_OPEN.labels(self.name).set(1)
+
+
+class RetryPolicy:
+    """Aantal pogingen en exponentiële backoff met full jitter tussen de pogingen"""
+
+    def __init__(self, attempts=3, base_delay=0.5, max_delay=10):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, retry_after=None):
+        """Wachttijd na poging `attempt` (vanaf 0); een Retry-After van de server gaat voor, tot max_delay"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+def call_with_retries(function, breaker, policy, retryable):
+    """Roep `function()` aan via de circuit breaker, met retries voor tijdelijke fouten
+
+    `retryable(exceptie)` bepaalt of een fout tijdelijk is; alleen die tellen
+    mee voor de breaker. Een andere fout (bijv. een geweigerde ontvanger)
+    wordt direct doorgegeven. Na de laatste poging, of zodra de breaker open
+    gaat, komt de laatste fout (of een CircuitOpenError) naar de aanroeper.
+    """
+    for attempt in range(policy.attempts):
+        breaker.allow()
+        try:
+            result = function()
+        except Exception as e:
+            if not retryable(e):
+                breaker.release()
+                raise
+            breaker.record_failure()
+            if attempt == policy.attempts - 1:
+                raise
+            RETRIES.labels(breaker.name).inc()
+            delay = policy.delay(attempt, getattr(e, 'retry_after', None))
+            logger.debug("%s faalde (%s), nieuwe poging over %.2fs", breaker.name, e, delay)
+            time.sleep(delay)
+        else:
+            breaker.record_success()
+            return result
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name, config):
+    """De circuit breaker van een doel, gedeeld door alle batches en threads van dit proces"""
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(
+                name,
+                failure_threshold=config['CIRCUIT_FAILURE_THRESHOLD'],
+                reset_timeout=config['CIRCUIT_RESET_SECONDS'],
+            )
+        return breaker
+
+
+def create_retry_policy(config):
+    return RetryPolicy(
+        attempts=config['RETRY_ATTEMPTS'],
+        base_delay=config['RETRY_BASE_DELAY'],
+        max_delay=config['RETRY_MAX_DELAY'],
+    )
+
+
+def http_timeout(config):
+    """(connect, read) timeout voor requests"""
+    return config['HTTP_CONNECT_TIMEOUT'], config['HTTP_READ_TIMEOUT']
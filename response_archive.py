@@ -0,0 +1,315 @@
+import argparse
+import glob
+import gzip
+import io
+import ipaddress
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import Counter, defaultdict, deque
+
+from response_cache import cache_key
+from scheduler import utcnow
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_PREFIX = 'responses'
+EXTENSIONS = {'gzip': '.jsonl.gz', 'zstd': '.jsonl.zst'}
+
+# Bij het terugspelen horen de API key en de date_posted filter (die van de
+# vorige check afhangt) niet bij de zoekopdracht
+REPLAY_IGNORED_PARAMS = ('api_key', 'chips')
+
+
+def _zstandard():
+    """De optionele zstandard module, of None als die niet geïnstalleerd is"""
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+class ResponseArchive:
+    """Schrijft ruwe SerpApi responses naar roterende, gecomprimeerde JSONL segmenten
+
+    Elke regel is één request: tijdstip, parameters (zonder api_key), HTTP
+    status en de response (of het begin van de foutmelding). Segmenten
+    heten `responses-<datum>-<pid>-<volgnummer>.jsonl.gz` (of `.zst`); een
+    nieuw segment begint bij een nieuwe dag (UTC) en zodra het huidige
+    segment `segment_bytes` (gecomprimeerd) groot is. Een bestaand segment
+    van dit proces wordt aangevuld met een nieuw gzip member of zstd frame,
+    zodat elke run niet een eigen bestandje oplevert. Veilig voor gebruik
+    vanuit de threads van de fetch engine.
+    """
+
+    def __init__(self, directory, segment_bytes=64 * 1024 * 1024, compression='gzip'):
+        if compression == 'zstd' and _zstandard() is None:
+            logger.warning("zstandard is niet geïnstalleerd, archief wordt met gzip gecomprimeerd")
+            compression = 'gzip'
+        if compression not in EXTENSIONS:
+            raise ValueError(f"Onbekende compressie voor het archief: {compression} (kies uit gzip of zstd)")
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.compression = compression
+        self.lock = threading.Lock()
+        self.raw = None
+        self.stream = None
+        self.day = None
+        self.sequence = 0
+        self.records = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def segment_path(self, day, sequence):
+        name = f"{SEGMENT_PREFIX}-{day}-{os.getpid()}-{sequence:04d}{EXTENSIONS[self.compression]}"
+        return os.path.join(self.directory, name)
+
+    def _open(self, day):
+        """Open het laatste segment van vandaag van dit proces, of een nieuw als dat vol is"""
+        if self.day != day:
+            existing = glob.glob(self.segment_path(day, 0).replace('-0000.', '-*.'))
+            self.sequence = max((int(path.rsplit('-', 1)[1].split('.')[0]) for path in existing), default=1)
+            self.day = day
+        path = self.segment_path(day, self.sequence)
+        if os.path.exists(path) and os.path.getsize(path) >= self.segment_bytes:
+            self.sequence += 1
+            path = self.segment_path(day, self.sequence)
+
+        self.raw = open(path, 'ab')
+        if self.compression == 'zstd':
+            self.stream = _zstandard().ZstdCompressor(level=3).stream_writer(self.raw, closefd=False)
+        else:
+            self.stream = gzip.GzipFile(fileobj=self.raw, mode='ab', compresslevel=6)
+        logger.debug("Archief segment %s geopend", path)
+
+    def _close_segment(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.raw.close()
+            self.stream = self.raw = None
+
+    def write(self, params, status, response=None, error=None):
+        """Voeg één response toe aan het archief"""
+        now = utcnow()
+        record = {
+            'ts': now.isoformat(timespec='milliseconds'),
+            'params': {name: value for name, value in params.items() if name != 'api_key'},
+            'status': status,
+        }
+        if response is not None:
+            record['response'] = response
+        if error is not None:
+            record['error'] = error[:1000]
+        line = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+        day = now.strftime('%Y%m%d')
+        with self.lock:
+            # De positie in het ruwe bestand is de gecomprimeerde grootte tot nu toe
+            if self.stream is not None and (day != self.day or self.raw.tell() >= self.segment_bytes):
+                self._close_segment()
+            if self.stream is None:
+                self._open(day)
+            self.stream.write(line)
+            self.records += 1
+
+    def close(self):
+        with self.lock:
+            self._close_segment()
+        if self.records:
+            logger.info("%d responses gearchiveerd in %s", self.records, self.directory)
+
+
+def segment_paths(spec):
+    """Segmenten voor een map, bestand of glob patroon, op volgorde van naam (dus van tijd)"""
+    if os.path.isdir(spec):
+        spec = os.path.join(spec, f"{SEGMENT_PREFIX}-*.jsonl.*")
+    return sorted(glob.glob(spec))
+
+
+def open_segment(path):
+    """Open een segment als tekststroom, ongeacht de compressie"""
+    if path.endswith('.zst'):
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is nodig om {path} te lezen (pip install zstandard)")
+        raw = open(path, 'rb')
+        return io.TextIOWrapper(
+            zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True), encoding='utf-8'
+        )
+    return gzip.open(path, 'rt', encoding='utf-8')
+
+
+def read_lines(paths):
+    """Stream de ruwe JSON regels uit de segmenten
+
+    Een afgebroken laatste regel of frame (bijv. een segment waar nog in
+    geschreven wordt) beëindigt dat segment met een waarschuwing.
+    """
+    for path in paths:
+        with open_segment(path) as f:
+            try:
+                for line in f:
+                    if not line.endswith('\n'):
+                        raise ValueError("laatste regel is onvolledig")
+                    yield line
+            except (EOFError, ValueError) as e:
+                logger.warning("Segment %s is afgebroken: %s", path, e)
+
+
+def read_records(paths):
+    """Stream de records uit de segmenten, regel voor regel"""
+    for line in read_lines(paths):
+        yield json.loads(line)
+
+
+class ResponseReplay:
+    """Speelt gearchiveerde responses terug in plaats van het netwerk
+
+    De segmenten worden bij de eerste `load()` één keer gestreamd en
+    daarna door alle batches van het proces gedeeld. De regels met een
+    response gaan ongecomprimeerd naar een tijdelijk spoolbestand; in het
+    geheugen blijft per request alleen de positie (offset, lengte) in dat
+    bestand, zodat het geheugen niet meegroeit met het archief. Een request
+    wordt gematcht op zijn parameters zonder api_key en date_posted filter,
+    zodat de vervolgpagina's via hun next_page_token gevonden worden. Kwam
+    hetzelfde request meerdere keren voor, dan worden de responses op
+    volgorde teruggegeven en blijft de laatste staan.
+    """
+
+    def __init__(self, paths):
+        self.paths = paths
+        self.index = defaultdict(deque)
+        self.spool = None
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Indexeer het archief, alleen de eerste keer"""
+        with self.lock:
+            if self.spool is not None:
+                return
+            spool = tempfile.TemporaryFile()
+            for line in read_lines(self.paths):
+                record = json.loads(line)
+                key = cache_key(record['params'], REPLAY_IGNORED_PARAMS)
+                if record['status'] != 200 or record.get('response') is None:
+                    self.index[key].append(None)
+                    continue
+                data = line.encode('utf-8')
+                self.index[key].append((spool.tell(), len(data)))
+                spool.write(data)
+            spool.flush()
+            self.spool = spool
+        logger.info("%d gearchiveerde requests geïndexeerd uit %d segmenten", len(self.index), len(self.paths))
+
+    def get(self, params):
+        """De gearchiveerde response voor dit request, of None (niet gearchiveerd of een foutstatus)"""
+        key = cache_key(params, REPLAY_IGNORED_PARAMS)
+        with self.lock:
+            positions = self.index.get(key)
+            if not positions:
+                self.counts['missing'] += 1
+                return None
+            self.counts['replayed'] += 1
+            position = positions.popleft() if len(positions) > 1 else positions[0]
+            if position is None:
+                return None
+            offset, length = position
+            self.spool.seek(offset)
+            data = self.spool.read(length)
+        return json.loads(data)['response']
+
+    def stats(self):
+        with self.lock:
+            return {'replayed': self.counts['replayed'], 'missing': self.counts['missing']}
+
+
+def create_response_archive(config):
+    """ResponseArchive volgens SERPAPI_ARCHIVE_* in de config, of None als archiveren uit staat"""
+    if not config['SERPAPI_ARCHIVE_DIR'] or config['SERPAPI_REPLAY']:
+        return None
+    return ResponseArchive(
+        config['SERPAPI_ARCHIVE_DIR'],
+        segment_bytes=int(config['SERPAPI_ARCHIVE_SEGMENT_MB'] * 1024 * 1024),
+        compression=config['SERPAPI_ARCHIVE_COMPRESSION'],
+    )
+
+
+_replays = {}
+_replays_lock = threading.Lock()
+
+
+def is_local_host(host):
+    """Loopback adres of localhost"""
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == 'localhost'
+
+
+def check_replay_target(config):
+    """Weiger terugspelen tegen een echte mailserver of een database die niet als wegwerp aangewezen is
+
+    Een teruggespeelde run schrijft naar de database en verstuurt e-mail.
+    Dat mag alleen met een SMTP server op deze machine en als
+    SERPAPI_REPLAY_DATABASE gelijk is aan de database van de run, of met
+    SERPAPI_REPLAY_UNSAFE.
+    """
+    if config['SERPAPI_REPLAY_UNSAFE']:
+        return
+    if not is_local_host(config['MAIL_SERVER']):
+        raise ValueError(
+            f"Terugspelen zou echte e-mail versturen via {config['MAIL_SERVER']}; "
+            "gebruik een lokale SMTP server (MAIL_SERVER=127.0.0.1) of SERPAPI_REPLAY_UNSAFE=true"
+        )
+    if config['SERPAPI_REPLAY_DATABASE'] != config['SQLALCHEMY_DATABASE_URI']:
+        raise ValueError(
+            "Terugspelen schrijft naar de database; zet SERPAPI_REPLAY_DATABASE op dezelfde wegwerp "
+            "DATABASE_URL als deze run of gebruik SERPAPI_REPLAY_UNSAFE=true"
+        )
+
+
+def get_response_replay(config):
+    """De ResponseReplay voor SERPAPI_REPLAY (map, bestand of glob), gedeeld door alle batches van dit proces
+
+    Geeft None als er niet teruggespeeld wordt. Zie check_replay_target voor
+    de voorwaarden aan de database en de mailserver.
+    """
+    spec = config['SERPAPI_REPLAY']
+    if not spec:
+        return None
+    check_replay_target(config)
+    with _replays_lock:
+        replay = _replays.get(spec)
+        if replay is None:
+            paths = segment_paths(spec)
+            if not paths:
+                raise ValueError(f"Geen archief segmenten gevonden voor {spec}")
+            replay = _replays[spec] = ResponseReplay(paths)
+        return replay
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Overzicht van een archief met SerpApi responses")
+    parser.add_argument('spec', help="map, segment of glob patroon")
+    args = parser.parse_args()
+
+    paths = segment_paths(args.spec)
+    records = Counter()
+    searches = set()
+    first = last = None
+    for record in read_records(paths):
+        records[record['status']] += 1
+        searches.add((record['params'].get('q'), record['params'].get('location')))
+        first = first or record['ts']
+        last = record['ts']
+    size = sum(os.path.getsize(path) for path in paths)
+    print(f"{len(paths)} segmenten ({size / 1024 / 1024:.1f} MB), {sum(records.values())} responses "
+          f"voor {len(searches)} zoekopdrachten, van {first} tot {last}")
+    print(f"Per HTTP status: {dict(records)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+
+from metrics import CACHE_HITS, CACHE_MISSES
+
+logger = logging.getLogger(__name__)
+
+# Parameters die niet in de sleutel horen: de API key verandert het antwoord niet
+IGNORED_PARAMS = ('api_key',)
+
+FRESH = 'fresh'
+STALE = 'stale'
+MISS = 'miss'
+
+
+def cache_key(params, ignored=IGNORED_PARAMS):
+    """Sleutel van een request: sha256 over de gesorteerde parameters, zonder api_key (of `ignored`)"""
+    canonical = {
+        str(name): str(value) for name, value in params.items()
+        if name not in ignored and value is not None
+    }
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Persistente TTL cache voor JSON responses, in een eigen SQLite bestand
+
+    Een item is vers tot zijn TTL verloopt en daarna nog `stale_seconds`
+    bruikbaar als stale: `get` geeft het dan terug met status STALE, zodat de
+    aanroeper het op de achtergrond kan verversen (stale-while-revalidate).
+    Boven `max_bytes` (gecomprimeerd) worden eerst de onbruikbaar verlopen en
+    daarna de minst recent gebruikte items verwijderd. Het bestand staat in
+    WAL modus, zodat threads en meerdere worker processen het delen. Met
+    `bypass` wordt niets gelezen maar worden nieuwe responses wel opgeslagen.
+    """
+
+    def __init__(self, path, ttl=3600, stale_seconds=3600, max_bytes=200 * 1024 * 1024, bypass=False, name='serpapi'):
+        self.path = path
+        self.ttl = ttl
+        self.stale_seconds = stale_seconds
+        self.max_bytes = max_bytes
+        self.bypass = bypass
+        self.name = name
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Autocommit; elke statement is zijn eigen korte transactie
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS response ('
+            'key TEXT PRIMARY KEY, body BLOB NOT NULL, size INTEGER NOT NULL, '
+            'stored_at REAL NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS ix_response_accessed_at ON response (accessed_at)')
+        self.size = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM response').fetchone()[0]
+
+    def get(self, params):
+        """Geef (data, status) terug; status is FRESH, STALE of MISS (data is dan None)"""
+        if self.bypass:
+            self._count('bypassed')
+            return None, MISS
+
+        key = cache_key(params)
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute('SELECT body, expires_at FROM response WHERE key = ?', (key,)).fetchone()
+            if row is not None and row[1] + self.stale_seconds >= now:
+                self.conn.execute('UPDATE response SET accessed_at = ? WHERE key = ?', (now, key))
+        if row is None or row[1] + self.stale_seconds < now:
+            self._count('misses')
+            CACHE_MISSES.labels(self.name).inc()
+            return None, MISS
+
+        status = FRESH if now < row[1] else STALE
+        self._count('hits' if status == FRESH else 'stale_hits')
+        CACHE_HITS.labels(self.name).inc()
+        return json.loads(zlib.decompress(row[0])), status
+
+    def put(self, params, data, ttl=None):
+        """Sla een response op, vers gedurende `ttl` seconden (standaard de TTL van de cache)"""
+        body = zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO response (key, body, size, stored_at, expires_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (cache_key(params), body, len(body), now, expires_at, now)
+            )
+            # Een vervangen item telt hier dubbel; _evict telt opnieuw
+            self.size += len(body)
+            if self.size > self.max_bytes:
+                self._evict(now)
+        self._count('stores')
+
+    def _evict(self, now):
+        """Verwijder onbruikbaar verlopen items en daarna LRU tot 90% van max_bytes"""
+        expired = self.conn.execute(
+            'DELETE FROM response WHERE expires_at + ? < ?', (self.stale_seconds, now)
+        ).rowcount
+        total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM response').fetchone()[0]
+        evicted = []
+        excess = total - int(self.max_bytes * 0.9)
+        if excess > 0:
+            for key, size in self.conn.execute('SELECT key, size FROM response ORDER BY accessed_at'):
+                evicted.append((key,))
+                excess -= size
+                total -= size
+                if excess <= 0:
+                    break
+            self.conn.executemany('DELETE FROM response WHERE key = ?', evicted)
+        self.size = total
+        # De lock is al in handen (via put)
+        self.counts['evictions'] += expired + len(evicted)
+
+    def _count(self, name, amount=1):
+        with self.lock:
+            self.counts[name] += amount
+
+    def stats(self):
+        """Hits, stale hits, misses, opslagen en verwijderingen sinds het openen, en de hit ratio"""
+        with self.lock:
+            stats = dict.fromkeys(('hits', 'stale_hits', 'misses', 'bypassed', 'stores', 'evictions'), 0)
+            stats.update(self.counts)
+        lookups = stats['hits'] + stats['stale_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['hits'] + stats['stale_hits']) / lookups, 3) if lookups else 0.0
+        stats['bytes'] = self.size
+        return stats
+
+    def close(self):
+        self.conn.close()
+
+
+def create_response_cache(config):
+    """ResponseCache volgens SERPAPI_CACHE_* in de config, of None als de cache uit staat"""
+    if not config['SERPAPI_CACHE']:
+        return None
+    return ResponseCache(
+        config['SERPAPI_CACHE_PATH'],
+        ttl=config['SERPAPI_CACHE_TTL'],
+        stale_seconds=config['SERPAPI_CACHE_STALE'],
+        max_bytes=int(config['SERPAPI_CACHE_MAX_MB'] * 1024 * 1024),
+        bypass=config['SERPAPI_CACHE_BYPASS'],
+    )
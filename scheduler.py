@@ -0,0 +1,109 @@
+import heapq
+import time
+from datetime import datetime, timedelta, UTC
+
+# Wachttijd voordat een alert waarvan de controle mislukte opnieuw geprobeerd wordt
+RETRY_DELAY = timedelta(minutes=5)
+
+
+def utcnow():
+    """Huidige tijd in UTC, naive zoals de datetimes in de database"""
+    return datetime.now(UTC).replace(tzinfo=None)
+
+
+class AlertScheduler:
+    """Min-heap van due-tijden per alert
+
+    De heap wordt bij de start één keer gevuld; daarna worden alleen alerts
+    opgehaald waarvan `updated_at` veranderd is (nieuw, aan/uit gezet of
+    door de worker opnieuw ingepland). Het watermerk is het moment vóór de
+    vorige query min `sync_margin` seconden, zodat een transactie die later
+    commit of een server met een achterlopende klok niet gemist wordt. Elke
+    `full_sync_interval` seconden worden alle alerts opnieuw ingelezen, ook om
+    verwijderde alerts op te ruimen. Verouderde heap-entries worden lui
+    overgeslagen: alleen de entry die overeenkomt met `due_at` telt.
+    """
+
+    def __init__(self, alert_model, poll_interval=5, shard=None, sync_margin=60, full_sync_interval=900):
+        self.alert_model = alert_model
+        self.poll_interval = poll_interval
+        self.shard = shard
+        self.sync_margin = timedelta(seconds=sync_margin)
+        self.full_sync_interval = full_sync_interval
+        self.heap = []
+        self.due_at = {}
+        self.synced_at = None
+        self.full_synced_at = None
+
+    def schedule(self, alert_id, due):
+        self.due_at[alert_id] = due
+        heapq.heappush(self.heap, (due, alert_id))
+
+    def unschedule(self, alert_id):
+        self.due_at.pop(alert_id, None)
+
+    def sync(self):
+        """Verwerk nieuwe en gewijzigde alerts sinds de vorige sync (of alle alerts bij een volledige sync)"""
+        Alert = self.alert_model
+        full = self.synced_at is None or time.monotonic() - self.full_synced_at >= self.full_sync_interval
+        started = utcnow()
+        query = Alert.query.with_entities(Alert.id, Alert.is_active, Alert.next_check_at)
+        if not full:
+            query = query.filter(Alert.updated_at >= self.synced_at)
+        if self.shard is not None:
+            index, count = self.shard
+            query = query.filter(Alert.id % count == index)
+
+        changed = 0
+        seen = set()
+        for alert_id, is_active, next_check_at in query:
+            if is_active:
+                due = next_check_at or utcnow()
+                if self.due_at.get(alert_id) != due:
+                    self.schedule(alert_id, due)
+            else:
+                self.unschedule(alert_id)
+            seen.add(alert_id)
+            changed += 1
+        if full:
+            # Verwijderde alerts komen in geen enkele query meer terug
+            for alert_id in self.due_at.keys() - seen:
+                self.unschedule(alert_id)
+            self.full_synced_at = time.monotonic()
+        self.synced_at = started - self.sync_margin
+        return changed
+
+    def pop_due(self, now):
+        """Haal alle alerts op die nu aan de beurt zijn"""
+        due_ids = []
+        while self.heap and self.heap[0][0] <= now:
+            due, alert_id = heapq.heappop(self.heap)
+            if self.due_at.get(alert_id) == due:
+                del self.due_at[alert_id]
+                due_ids.append(alert_id)
+        return due_ids
+
+    def seconds_until_next(self, now):
+        """Seconden tot de eerstvolgende geldige due-tijd, of None als de heap leeg is"""
+        while self.heap and self.due_at.get(self.heap[0][1]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        if not self.heap:
+            return None
+        return max(0.0, (self.heap[0][0] - now).total_seconds())
+
+    def run(self, check):
+        """Roep `check(alert_ids)` aan zodra alerts due zijn; slaap daartussen"""
+        while True:
+            self.sync()
+            now = utcnow()
+            due_ids = self.pop_due(now)
+            if due_ids:
+                check(due_ids)
+                # Geslaagde alerts krijgen bij de volgende sync hun nieuwe
+                # next_check_at; mislukte alerts worden later opnieuw geprobeerd
+                for alert_id in due_ids:
+                    self.schedule(alert_id, now + RETRY_DELAY)
+                continue
+
+            wait = self.seconds_until_next(now)
+            time.sleep(self.poll_interval if wait is None else min(wait, self.poll_interval))
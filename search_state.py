@@ -0,0 +1,142 @@
+from datetime import timedelta
+
+from sqlalchemy import tuple_
+
+from models import db, SearchState, SearchSeenJob, SentJob, check_interval
+from fingerprint import job_fingerprint
+
+# De grofste date_posted filter die nog alles sinds het begin van het venster bevat
+DATE_POSTED_CHIPS = [
+    (timedelta(days=1), "date_posted:today"),
+    (timedelta(days=3), "date_posted:3days"),
+    (timedelta(weeks=1), "date_posted:week"),
+    (timedelta(days=30), "date_posted:month"),
+]
+# Een controle op schema is net iets later dan één interval na de vorige (pollen, retries)
+CHIP_MARGIN = timedelta(hours=1)
+
+
+def insert_ignore(model):
+    """INSERT dat rijen die al bestaan (unieke index) overslaat, veilig bij meerdere workers"""
+    dialect = db.engine.dialect.name
+    # Dialect modules pas hier importeren: de PostgreSQL dialect kost ~40 ms bij het opstarten
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects import postgresql
+        return postgresql.insert(model).on_conflict_do_nothing()
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects import sqlite
+        return sqlite.insert(model).on_conflict_do_nothing()
+    return model.__table__.insert().prefix_with('IGNORE')
+
+
+def alert_since(alert, now):
+    """Vanaf wanneer vacatures nieuw zijn voor deze alert
+
+    Minstens één interval terug, ook voor net aangemaakte alerts; eerder
+    verstuurde vacatures vallen daarna weg via sent_job. Na een mislukte
+    aflevering is last_check teruggezet, zodat het venster weer de
+    vacatures van die poging bevat.
+    """
+    window_start = now - check_interval(alert.frequency)
+    if alert.last_check and alert.last_check < window_start:
+        return alert.last_check
+    return window_start
+
+
+def group_since(alerts, now):
+    """Begin van het venster van een zoekopdracht: dat van zijn alert met het oudste venster"""
+    return min(alert_since(alert, now) for alert in alerts)
+
+
+def date_posted_chip(since, now):
+    """SerpApi `chips` filter die alles sinds `since` bevat
+
+    Zonder `since` houden we het oude gedrag aan (vacatures van vandaag);
+    voor meer dan een maand terug wordt er niet op datum gefilterd. Tot
+    CHIP_MARGIN over een filter heen telt nog als die filter.
+    """
+    if since is None:
+        return DATE_POSTED_CHIPS[0][1]
+    age = now - since
+    for window, chip in DATE_POSTED_CHIPS:
+        if age <= window + CHIP_MARGIN:
+            return chip
+    return None
+
+
+def chip_window(chip, history_days):
+    """Hoe ver een date_posted filter terug kan gaan (zonder filter de hele geschiedenis)"""
+    for window, name in DATE_POSTED_CHIPS:
+        if name == chip:
+            return window
+    return timedelta(days=history_days)
+
+
+def load_search_states(keys):
+    """Haal (of maak) de SearchState voor elke (zoekterm, locatie) sleutel"""
+    keys = list(keys)
+    if not keys:
+        return {}
+    db.session.execute(insert_ignore(SearchState), [
+        {'search_query': query, 'location': location} for query, location in keys
+    ])
+    states = SearchState.query.filter(
+        tuple_(SearchState.search_query, SearchState.location).in_(keys)
+    )
+    return {(state.search_query, state.location): state for state in states}
+
+
+def load_known_fingerprints(states, since):
+    """Fingerprints die elke zoekopdracht sinds `since` al heeft opgeleverd"""
+    known = {key: set() for key in states}
+    key_by_id = {state.id: key for key, state in states.items()}
+    if not key_by_id:
+        return known
+    rows = db.session.query(SearchSeenJob.search_state_id, SearchSeenJob.job_fingerprint).filter(
+        SearchSeenJob.search_state_id.in_(list(key_by_id)),
+        SearchSeenJob.seen_at >= since
+    )
+    for state_id, fingerprint in rows:
+        known[key_by_id[state_id]].add(fingerprint)
+    return known
+
+
+def load_delivered_fingerprints(groups, since):
+    """Per zoekopdracht de fingerprints die sinds `since` al naar al zijn alerts verstuurd zijn
+
+    `groups` is {sleutel: alerts}. Alleen een vacature die elke alert van de
+    zoekopdracht al heeft mag de paginering laten stoppen; zolang één alert
+    hem nog mist (nieuwe alert, mislukte aflevering) worden verdere
+    pagina's opgehaald.
+    """
+    key_by_alert = {alert.id: key for key, alerts in groups.items() for alert in alerts}
+    counts = {key: {} for key in groups}
+    if key_by_alert:
+        rows = db.session.query(SentJob.alert_id, SentJob.job_fingerprint).filter(
+            SentJob.alert_id.in_(list(key_by_alert)),
+            SentJob.sent_at >= since
+        )
+        for alert_id, fingerprint in rows:
+            group_counts = counts[key_by_alert[alert_id]]
+            group_counts[fingerprint] = group_counts.get(fingerprint, 0) + 1
+    return {
+        key: {fingerprint for fingerprint, count in counts[key].items() if count == len(groups[key])}
+        for key in groups
+    }
+
+
+def record_search_results(state, jobs, known, now):
+    """Verschuif de high-water mark na een geslaagde zoekopdracht"""
+    state.last_success_at = now
+    new_fingerprints = {job_fingerprint(job) for job in jobs} - known
+    if new_fingerprints:
+        db.session.execute(insert_ignore(SearchSeenJob), [
+            {'search_state_id': state.id, 'job_fingerprint': fingerprint, 'seen_at': now}
+            for fingerprint in new_fingerprints
+        ])
+    return len(new_fingerprints)
+
+
+def prune_search_history(before):
+    """Verwijder gezien-markeringen die buiten het venster van de date_posted filters vallen"""
+    return SearchSeenJob.query.filter(SearchSeenJob.seen_at < before).delete(synchronize_session=False)
@@ -0,0 +1,127 @@
+import json
+import logging
+import os
+import time
+
+from fingerprint import legacy_job_id_fingerprint
+
+logger = logging.getLogger(__name__)
+
+
+class SeenJobsJournal:
+    """Append-only journal van de fingerprints van al verstuurde vacatures
+
+    Elke regel is `fingerprint<TAB>tijdstip`; `add` voegt alleen de nieuwe
+    regels toe in plaats van de hele historie te herschrijven. Het journal
+    wordt pas bij het eerste gebruik ingelezen. Bij het inlezen wordt het
+    gecompacteerd (atomair herschreven) zodra minstens de helft van de
+    regels dubbel of ouder dan `retention_days` is. Een oud `seen_jobs.json`
+    (`legacy_path`) wordt bij de eerste keer overgenomen en hernoemd naar
+    `.bak`. Een afgebroken laatste regel wordt overgeslagen.
+    """
+
+    def __init__(self, path='seen_jobs.journal', legacy_path='seen_jobs.json', retention_days=365, min_compact=1000):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.retention_days = retention_days
+        self.min_compact = min_compact
+        self._seen = None
+        self._torn = False
+
+    @property
+    def seen(self):
+        """{fingerprint: tijdstip}, ingelezen bij het eerste gebruik"""
+        if self._seen is None:
+            self.load()
+        return self._seen
+
+    def __contains__(self, fingerprint):
+        return fingerprint in self.seen
+
+    def __len__(self):
+        return len(self.seen)
+
+    def load(self):
+        if not os.path.exists(self.path) and self.legacy_path and os.path.exists(self.legacy_path):
+            self._migrate()
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except FileNotFoundError:
+            content = ''
+
+        # Een laatste regel zonder newline is afgebroken tijdens het schrijven
+        self._torn = bool(content) and not content.endswith('\n')
+        lines = content.count('\n') + self._torn
+        if self._torn:
+            logger.warning("Afgebroken laatste regel in %s overgeslagen", self.path)
+            content = content[:content.rfind('\n') + 1]
+        try:
+            # Snelle route: het hele journal als één JSON lijst van getallen parsen (in C)
+            values = json.loads('[' + content.rstrip('\n').replace('\t', ',').replace('\n', ',') + ']')
+            if len(values) % 2:
+                raise ValueError("ongeldige regel")
+            seen = dict(zip(values[0::2], values[1::2]))
+        except ValueError:
+            seen = self._parse_lines(content)
+
+        if self.retention_days and seen:
+            cutoff = time.time() - self.retention_days * 86400
+            if min(seen.values()) < cutoff:
+                seen = {fingerprint: seen_at for fingerprint, seen_at in seen.items() if seen_at >= cutoff}
+        self._seen = seen
+        if lines - len(seen) >= max(self.min_compact, len(seen)):
+            self.compact()
+        return seen
+
+    def _parse_lines(self, content):
+        """Regel voor regel inlezen, met ongeldige regels overgeslagen (langzamer dan de snelle route)"""
+        seen = {}
+        for line in content.splitlines():
+            try:
+                fingerprint, seen_at = line.split('\t')
+                seen[int(fingerprint)] = float(seen_at)
+            except ValueError:
+                logger.warning("Ongeldige regel in %s overgeslagen: %r", self.path, line)
+        return seen
+
+    def _migrate(self):
+        with open(self.legacy_path, 'r', encoding='utf-8') as f:
+            # Oude bestanden bevatten tekst-IDs; die zetten we om naar fingerprints
+            fingerprints = {
+                job_id if isinstance(job_id, int) else legacy_job_id_fingerprint(job_id) for job_id in json.load(f)
+            }
+        now = time.time()
+        self._write(self.path, {fingerprint: now for fingerprint in fingerprints})
+        os.replace(self.legacy_path, self.legacy_path + '.bak')
+        logger.info("%d vacatures uit %s overgenomen in %s", len(fingerprints), self.legacy_path, self.path)
+
+    @staticmethod
+    def _write(path, seen):
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.writelines(f"{fingerprint}\t{seen_at:.0f}\n" for fingerprint, seen_at in seen.items())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def compact(self):
+        """Herschrijf het journal met alleen de actuele fingerprints"""
+        self._write(self.path, self.seen)
+        self._torn = False
+        logger.info("%s gecompacteerd tot %d vacatures", self.path, len(self._seen))
+
+    def add(self, fingerprints):
+        """Markeer fingerprints als gezien; alleen de nieuwe worden aan het journal toegevoegd"""
+        now = time.time()
+        new = [fingerprint for fingerprint in fingerprints if fingerprint not in self.seen]
+        if not new:
+            return 0
+        with open(self.path, 'a', encoding='utf-8') as f:
+            if self._torn:
+                f.write('\n')
+                self._torn = False
+            f.writelines(f"{fingerprint}\t{now:.0f}\n" for fingerprint in new)
+        for fingerprint in new:
+            self._seen[fingerprint] = now
+        return len(new)
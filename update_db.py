@@ -1,11 +1,116 @@
-from app import app, db
+import json
+from datetime import datetime
+from sqlalchemy import Integer, inspect, text
+from app import create_app
+from models import db, JobAlert, SentJob, check_interval
+from fingerprint import legacy_job_id_fingerprint
+from job_store import ensure_job_index
+
+app = create_app()
+
+def column_names(table):
+    return {column['name'] for column in inspect(db.engine).get_columns(table)}
+
+def add_column_if_missing(table, column, ddl):
+    """Voeg een kolom toe als die nog niet bestaat"""
+    if column not in column_names(table):
+        db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+        db.session.commit()
+        print(f"Kolom {table}.{column} toegevoegd")
+
+def migrate_sent_job_ids():
+    """Verplaats de oude JSON kolom job_alert.sent_job_ids naar de sent_job tabel"""
+    if 'sent_job_ids' not in column_names('job_alert'):
+        return
+
+    rows = db.session.execute(text('SELECT id, sent_job_ids FROM job_alert')).fetchall()
+    migrated = 0
+    for alert_id, sent_job_ids in rows:
+        try:
+            fingerprints = {legacy_job_id_fingerprint(job_id) for job_id in json.loads(sent_job_ids or '[]')}
+        except ValueError:
+            print(f"Ongeldige sent_job_ids voor alert {alert_id}, overgeslagen")
+            continue
+
+        existing = {
+            fingerprint for (fingerprint,) in db.session.execute(
+                text('SELECT job_fingerprint FROM sent_job WHERE alert_id = :alert_id'),
+                {'alert_id': alert_id}
+            )
+        }
+        new_rows = [
+            {'alert_id': alert_id, 'job_fingerprint': fingerprint}
+            for fingerprint in fingerprints - existing
+        ]
+        if new_rows:
+            db.session.execute(
+                text('INSERT INTO sent_job (alert_id, job_fingerprint) VALUES (:alert_id, :job_fingerprint)'),
+                new_rows
+            )
+            migrated += len(new_rows)
+
+    db.session.execute(text('ALTER TABLE job_alert DROP COLUMN sent_job_ids'))
+    db.session.commit()
+    print(f"{migrated} verstuurde vacatures gemigreerd naar sent_job")
+
+def convert_sent_job_fingerprints():
+    """Eenmalige conversie van tekst-IDs in sent_job naar 64-bit fingerprints"""
+    columns = {column['name']: column for column in inspect(db.engine).get_columns('sent_job')}
+    if isinstance(columns['job_fingerprint']['type'], Integer):
+        return
+
+    rows = db.session.execute(text('SELECT alert_id, job_fingerprint, sent_at FROM sent_job')).fetchall()
+    converted = {}
+    for alert_id, job_id, sent_at in rows:
+        converted.setdefault((alert_id, legacy_job_id_fingerprint(job_id)), sent_at)
+
+    SentJob.__table__.drop(db.engine)
+    SentJob.__table__.create(db.engine)
+    if converted:
+        db.session.execute(SentJob.__table__.insert(), [
+            {'alert_id': alert_id, 'job_fingerprint': fingerprint, 'sent_at': sent_at}
+            for (alert_id, fingerprint), sent_at in converted.items()
+        ])
+    db.session.commit()
+    print(f"{len(converted)} verstuurde vacatures omgezet naar fingerprints")
+
+def backfill_next_check_at():
+    """Plan bestaande alerts in op basis van hun laatste controle en frequentie"""
+    alerts = JobAlert.query.filter(JobAlert.next_check_at.is_(None)).all()
+    for alert in alerts:
+        if alert.last_check:
+            alert.next_check_at = alert.last_check + check_interval(alert.frequency)
+        else:
+            alert.next_check_at = datetime.utcnow()
+    db.session.commit()
+    if alerts:
+        print(f"{len(alerts)} alerts ingepland")
 
 def update_database():
     with app.app_context():
+        # Maak nieuwe tabellen aan
+        db.create_all()
+
         # Voeg nieuwe kolommen toe
-        db.engine.execute('ALTER TABLE user ADD COLUMN reset_token VARCHAR(100) UNIQUE')
-        db.engine.execute('ALTER TABLE user ADD COLUMN reset_token_expiry DATETIME')
+        add_column_if_missing('user', 'reset_token', 'VARCHAR(100) UNIQUE')
+        add_column_if_missing('user', 'reset_token_expiry', 'DATETIME')
+        add_column_if_missing('job_alert', 'next_check_at', 'DATETIME')
+        add_column_if_missing('job_alert', 'updated_at', 'DATETIME')
+        add_column_if_missing('job_alert', 'claimed_by', 'VARCHAR(64)')
+        add_column_if_missing('job_alert', 'lease_until', 'DATETIME')
+        add_column_if_missing('search_state', 'yield_jobs', 'FLOAT')
+        add_column_if_missing('search_state', 'yield_calls', 'FLOAT')
+        add_column_if_missing('search_state', 'yield_hours', 'FLOAT')
+        db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_job_alert_active_next_check ON job_alert (is_active, next_check_at)'))
+        db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_job_alert_updated_at ON job_alert (updated_at)'))
+        db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_job_alert_user_id ON job_alert (user_id)'))
+        db.session.commit()
+        backfill_next_check_at()
+        ensure_job_index()
+
+        convert_sent_job_fingerprints()
+        migrate_sent_job_ids()
         print("Database succesvol bijgewerkt!")
 
 if __name__ == "__main__":
-    update_database() 
\ No newline at end of file
+    update_database()
@@ -1,43 +1,63 @@
-import json
+import argparse
+import logging
 import os
+import socket
 import time
-import requests
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from datetime import datetime, timedelta, UTC
+from concurrent.futures import wait
+from datetime import timedelta
+from functools import lru_cache
 from dotenv import load_dotenv
-from app import app, db, JobAlert
+from flask import Flask
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import joinedload, lazyload, selectinload
+from config import config
+from email_templates import AlertEmailRenderer
+from fingerprint import job_fingerprint
+from job_sources import DEFAULT_LOCATION, create_job_source
+from job_store import ensure_job_index, match_searches, prune_jobs
+from models import db, JobAlert, SentJob, check_interval, count_due_alerts
+from metrics import ALERT_BACKLOG, ALERT_ERRORS, ALERTS_PROCESSED, REGISTRY, STAGE_SECONDS, start_http_server
+from near_duplicates import create_near_duplicate_index
+from outbox import create_outbox
+from profiling import create_profiler
+from quota_budget import get_quota_budget
+from response_archive import check_replay_target
+from scheduler import RETRY_DELAY, AlertScheduler, utcnow
+from search_state import alert_since, insert_ignore, prune_search_history
 
 # Laad environment variabelen
 load_dotenv()
 
-# Configuratie voor mock data
-USE_MOCK_DATA = True  # Zet dit op False om SerpApi te gebruiken
-MOCK_DATA_FILE = 'mock_jobs.json'
+logger = logging.getLogger(__name__)
 
-def generate_job_id(job):
-    """Genereer een unieke ID voor een vacature"""
-    return f"{job.get('title', '')}_{job.get('company_name', '')}_{job.get('location', '')}"
+def create_worker_app(config_name='production'):
+    """Minimale Flask app voor de worker: configuratie, database en Jinja voor de e-mails
+    
+    Zonder routes, login of andere web onderdelen, zodat kortlevende workers
+    (cron, containers) snel opstarten en weinig geheugen gebruiken.
+    """
+    app = Flask(__name__)
+    app.config.from_object(config[config_name])
+    db.init_app(app)
+    return app
 
-def get_jobs_from_mock():
-    """Haal vacatures op uit mock_jobs.json"""
-    try:
-        with open(MOCK_DATA_FILE, 'r', encoding='utf-8') as f:
-            mock_data = json.load(f)
-            print("Mock data succesvol geladen")
-            return mock_data  # Direct de lijst met vacatures teruggeven
-    except Exception as e:
-        print(f"Fout bij het laden van mock data: {str(e)}")
-        return []
+app = create_worker_app()
 
-def send_job_alert_email(user_email, search_query, location, jobs):
+@lru_cache(maxsize=None)
+def get_email_renderer():
+    """E-mail renderer op basis van de Jinja environment van de app, één keer per proces"""
+    return AlertEmailRenderer(app.jinja_env)
+
+def queue_email(outbox, user_email, render):
+    """Stel een e-mail op met de bodies van `render()` en zet hem in de outbox
+    
+    Geeft de Future van de aflevering terug.
+    """
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    
     try:
-        # E-mail configuratie
-        smtp_server = "smtp.gmail.com"
-        smtp_port = 587
-        sender_email = os.getenv("EMAIL_USER")
-        sender_password = os.getenv("EMAIL_PASSWORD")
+        sender_email = app.config['MAIL_DEFAULT_SENDER']
         
         # E-mail bericht samenstellen
         msg = MIMEMultipart('alternative')
@@ -45,248 +65,630 @@ def send_job_alert_email(user_email, search_query, location, jobs):
         msg['To'] = user_email
         msg['Subject'] = "Uw vacature leads van Kayak.jobs"
         
-        # HTML inhoud voor de e-mail
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <meta charset="utf-8">
-            <style>
-                body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                .job {{ margin-bottom: 20px; padding: 15px; border: 1px solid #ddd; border-radius: 5px; background-color: #f9f9f9; }}
-                .job-title {{ font-weight: bold; color: #2c3e50; font-size: 16px; margin-bottom: 5px; }}
-                .job-company {{ color: #7f8c8d; margin-bottom: 5px; }}
-                .job-location {{ color: #95a5a6; margin-bottom: 10px; }}
-                .button {{ 
-                    display: inline-block; 
-                    padding: 8px 15px; 
-                    background-color: #3498db; 
-                    color: #ffffff !important; 
-                    text-decoration: none !important; 
-                    border-radius: 3px;
-                    margin-top: 10px;
-                }}
-                .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                .header {{ background-color: #f8f9fa; padding: 20px; border-radius: 5px; margin-bottom: 20px; }}
-                .footer {{ margin-top: 20px; padding-top: 20px; border-top: 1px solid #ddd; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h2>Uw vacature leads van Kayak.jobs</h2>
-                    <p>Er zijn {len(jobs)} nieuwe vacatures gevonden die voldoen aan uw zoekcriteria.</p>
-                </div>
-                <div class="jobs">
-        """
-        
-        for job in jobs:
-            # Haal de link uit de apply_options als die er is
-            apply_link = None
-            if 'apply_options' in job and len(job['apply_options']) > 0:
-                apply_link = job['apply_options'][0].get('link', '')
-            
-            # Als er geen apply_link is, gebruik dan de job link
-            final_link = apply_link or job.get('link', '')
-            
-            # Maak de link URL veilig voor HTML
-            safe_link = final_link.replace('"', '&quot;')
-            html_content += f"""
-                    <div class="job">
-                        <div class="job-title">{job.get('title', 'Geen titel')}</div>
-                        <div class="job-company">{job.get('company_name', 'Onbekend bedrijf')}</div>
-                        <div class="job-location">{job.get('location', 'Onbekende locatie')}</div>
-                        <a href="{safe_link}" class="button">Bekijk vacature →</a>
-                    </div>
-            """
-        
-        html_content += """
-                </div>
-                <div class="footer">
-                    <p>Met vriendelijke groeten,<br>team Kayak.jobs</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-        # Voeg zowel HTML als plain text toe
-        text_content = f"""
-        Uw vacature leads van Kayak.jobs
-        
-        Er zijn {len(jobs)} nieuwe vacatures gevonden die voldoen aan uw zoekcriteria.
-        
-        """
-        
-        for job in jobs:
-            text_content += f"""
-        Titel: {job.get('title', 'Geen titel')}
-        Bedrijf: {job.get('company_name', 'Onbekend bedrijf')}
-        Locatie: {job.get('location', 'Onbekende locatie')}
-        Link: {job.get('link', '')}
-        
-        """
-        
-        text_content += """
-        Met vriendelijke groeten,
-        team Kayak.jobs
-        """
+        # Plain text en HTML inhoud via de gecachete templates
+        with STAGE_SECONDS.labels('render').time():
+            text_content, html_content = render()
         
         msg.attach(MIMEText(text_content, 'plain'))
         msg.attach(MIMEText(html_content, 'html'))
         
-        # E-mail versturen
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(sender_email, sender_password)
-            server.send_message(msg)
-        
-        print(f"E-mail succesvol verzonden naar {user_email}")
+        # E-mail in de wachtrij zetten
+        return outbox.put(msg)
         
     except Exception as e:
-        print(f"Fout bij het verzenden van de e-mail: {str(e)}")
+        logger.error("Fout bij het opstellen van de e-mail: %s", e)
 
-def check_jobs():
-    """Controleer alle actieve job alerts en stuur emails voor nieuwe vacatures"""
-    print("Start normale job check...")
+def send_job_alert_email(outbox, user_email, search_query, location, jobs):
+    """Stel de alert e-mail op en zet hem in de outbox; geeft de Future van de aflevering terug"""
+    return queue_email(outbox, user_email, lambda: get_email_renderer().render(jobs))
+
+def alert_title(alert):
+    """Kop van een alert in een digest"""
+    return f"{alert.search_query} in {alert.location or DEFAULT_LOCATION}"
+
+def send_digest_email(outbox, user_email, sections):
+    """Stel één e-mail op voor [(alert, vacatures)] van een gebruiker, met een kop per alert
     
-    with app.app_context():
-        # Haal alle actieve alerts op
-        active_alerts = JobAlert.query.filter_by(is_active=True).all()
-        print(f"Aantal actieve alerts gevonden: {len(active_alerts)}")
+    Een digest met maar één alert wordt een gewone alert e-mail.
+    """
+    if len(sections) == 1:
+        alert, jobs = sections[0]
+        return send_job_alert_email(outbox, user_email, alert.search_query, alert.location, jobs)
+    return queue_email(outbox, user_email, lambda: get_email_renderer().render_digest(
+        [(alert_title(alert), jobs) for alert, jobs in sections]
+    ))
+
+def send_digests(outbox, digests, deliveries):
+    """Stuur per gebruiker één e-mail met de nieuwe vacatures van al diens due alerts
+    
+    `digests` is {user_id: (e-mail adres, [(alert, vacatures)])}, gevuld door
+    process_alert. Een vacature die bij meerdere alerts nieuw is (zelfde
+    fingerprint) staat alleen onder de eerste alert. Elke e-mail komt met
+    al zijn alerts in `deliveries`. Geeft het aantal weggelaten dubbele
+    vacatures terug.
+    """
+    duplicates = 0
+    for user_email, entries in digests.values():
+        seen = set()
+        sections = []
+        for alert, jobs in entries:
+            unique = []
+            for job in jobs:
+                fingerprint = job_fingerprint(job)
+                if fingerprint in seen:
+                    duplicates += 1
+                    continue
+                seen.add(fingerprint)
+                unique.append(job)
+            if unique:
+                sections.append((alert, unique))
+        deliveries.add(send_digest_email(outbox, user_email, sections), entries)
+        logger.debug("Digest met %s alerts in wachtrij gezet voor %s", len(sections), user_email)
+    return duplicates
+
+def search_key(alert):
+    """Genormaliseerde sleutel (zoekterm, locatie) waarmee alerts gegroepeerd worden"""
+    query = " ".join((alert.search_query or "").split()).lower()
+    location = " ".join((alert.location or DEFAULT_LOCATION).split()).lower()
+    return query, location
+
+def active_searches():
+    """{sleutel: kortste controle-interval} van alle actieve alerts, voor het quotaplan"""
+    rows = db.session.query(JobAlert.search_query, JobAlert.location, JobAlert.frequency).filter_by(
+        is_active=True
+    ).distinct()
+    intervals = {}
+    for row in rows:
+        key = search_key(row)
+        interval = check_interval(row.frequency)
+        if key not in intervals or interval < intervals[key]:
+            intervals[key] = interval
+    return intervals
+
+def plan_searches(alerts):
+    """Groepeer alerts per zoekopdracht zodat elke unieke zoekopdracht maar één keer wordt opgehaald"""
+    groups = {}
+    for alert in alerts:
+        groups.setdefault(search_key(alert), []).append(alert)
+    return groups
+
+# Laadstrategieën voor de gebruiker van een alert, te kiezen via ALERT_USER_LOADING
+USER_LOADERS = {
+    'selectin': selectinload,
+    'joined': joinedload,
+    'select': lazyload,
+}
+
+def current_worker_id():
+    """Unieke naam van dit worker proces, gebruikt als claimed_by"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def shard_filter(shard):
+    """Filter voor statische sharding: shard = (index, aantal) selecteert id % aantal == index"""
+    index, count = shard
+    return JobAlert.id % count == index
+
+def claim_due_alerts(worker_id, now, batch_size=500, alert_ids=None, shard=None, user_loading='selectin',
+                     whole_users=False):
+    """Claim atomisch een batch due alerts met een lease en geef ze terug
+    
+    Eén UPDATE zet claimed_by/lease_until op alerts die due zijn en geen
+    geldige lease hebben; de lease-voorwaarde staat ook in de buitenste
+    WHERE, zodat twee workers nooit dezelfde alert krijgen. Leases van een
+    gecrashte worker verlopen na WORKER_LEASE_SECONDS en worden dan opnieuw
+    geclaimd. Het due-filter draait op de (is_active, next_check_at) index
+    en de gebruikers worden per batch mee geladen. Met `whole_users` komen
+    ook de overige due alerts van de gebruikers in de batch mee (voor
+    digests), zodat een batch iets groter dan `batch_size` kan worden.
+    """
+    lease_until = now + timedelta(seconds=app.config['WORKER_LEASE_SECONDS'])
+    lease_free = or_(JobAlert.lease_until.is_(None), JobAlert.lease_until < now)
+    
+    due = select(JobAlert.id).filter_by(is_active=True).where(JobAlert.next_check_at <= now, lease_free)
+    if alert_ids is not None:
+        due = due.where(JobAlert.id.in_(alert_ids))
+    if shard is not None:
+        due = due.where(shard_filter(shard))
+    candidates = due.order_by(JobAlert.next_check_at, JobAlert.id).limit(batch_size)
+    candidates = candidates.with_for_update(skip_locked=True)
+    if whole_users:
+        users = select(JobAlert.user_id).where(JobAlert.id.in_(candidates))
+        candidates = due.where(JobAlert.user_id.in_(users))
+    
+    claimed = db.session.execute(
+        update(JobAlert)
+        .where(JobAlert.id.in_(candidates), lease_free)
+        # updated_at ongewijzigd laten: een claim is geen wijziging voor de scheduler
+        .values(claimed_by=worker_id, lease_until=lease_until, updated_at=JobAlert.updated_at)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.session.commit()
+    if not claimed:
+        return []
+    
+    return (
+        JobAlert.query.options(USER_LOADERS[user_loading](JobAlert.user))
+        .filter_by(claimed_by=worker_id, lease_until=lease_until)
+        .order_by(JobAlert.next_check_at, JobAlert.id)
+        .all()
+    )
+
+def due_search_alerts(now, alert_ids=None, shard=None):
+    """{sleutel: [alert rijen]} van alle alerts die deze run aan de beurt zijn
+    
+    Een zoekopdracht wordt één keer per run opgehaald, dus zijn venster en
+    vroeg stoppen moeten ook kloppen voor alerts die pas in een latere batch
+    geclaimd worden. Alleen de kolommen die het venster bepalen.
+    """
+    lease_free = or_(JobAlert.lease_until.is_(None), JobAlert.lease_until < now)
+    query = db.session.query(
+        JobAlert.id, JobAlert.search_query, JobAlert.location, JobAlert.frequency, JobAlert.last_check
+    ).filter(JobAlert.is_active.is_(True), JobAlert.next_check_at <= now, lease_free)
+    if alert_ids is not None:
+        query = query.filter(JobAlert.id.in_(alert_ids))
+    if shard is not None:
+        query = query.filter(shard_filter(shard))
+    return plan_searches(query)
+
+def fetch_searches(groups):
+    """Haal alle unieke zoekopdrachten op bij de geconfigureerde job source
+    
+    Geeft {sleutel: (vacatures, api_calls) of exceptie} terug.
+    """
+    source = create_job_source(app.config)
+    logger.debug("Vacatures ophalen via %s", source.name)
+    try:
+        return source.search(groups)
+    finally:
+        source.close()
+
+def match_store(groups, now):
+    """Match alle zoekopdrachten in één pass tegen de lokale job store
+    
+    Geeft {sleutel: ([(ingested_at, vacature)], 0)} terug, in dezelfde vorm
+    als fetch_searches maar zonder API calls.
+    """
+    searches = {
+        key: min(alert_since(alert, now) for alert in alerts)
+        for key, alerts in groups.items()
+    }
+    return {key: (matches, 0) for key, matches in match_searches(searches).items()}
+
+def collapse_near_duplicates(index, results, keys, store_mode=False):
+    """Voeg in de resultaten van `keys` bijna-dubbele vacatures samen tot één vacature per cluster
+    
+    Werkt `results` in place bij en geeft het aantal weggevallen varianten
+    terug. In store mode krijgt een cluster het laatste ingested_at van zijn
+    varianten.
+    """
+    collapsed = 0
+    for key in keys:
+        result = results.get(key)
+        if result is None or isinstance(result, Exception):
+            continue
+        jobs, api_calls = result
+        if store_mode:
+            groups = index.collapse_groups([job for _, job in jobs])
+            merged = [(max(jobs[position][0] for position in positions), record) for record, positions in groups]
+        else:
+            merged = index.collapse(jobs)
+        collapsed += len(jobs) - len(merged)
+        results[key] = (merged, api_calls)
+    return collapsed
+
+def filter_new_jobs(alert, jobs):
+    """Geef de vacatures terug die nog niet naar deze alert zijn verstuurd
+    
+    Eén bulk query op de (alert_id, job_fingerprint) index, onafhankelijk van
+    de lengte van de geschiedenis. Dubbele vacatures binnen `jobs` vallen weg.
+    """
+    jobs_by_fingerprint = {}
+    for job in jobs:
+        jobs_by_fingerprint.setdefault(job_fingerprint(job), job)
+    if not jobs_by_fingerprint:
+        return []
+    
+    already_sent = {
+        fingerprint for (fingerprint,) in db.session.query(SentJob.job_fingerprint).filter(
+            SentJob.alert_id == alert.id,
+            SentJob.job_fingerprint.in_(list(jobs_by_fingerprint))
+        )
+    }
+    return [job for fingerprint, job in jobs_by_fingerprint.items() if fingerprint not in already_sent]
+
+def record_sent_jobs(alert, jobs):
+    """Registreer vacatures als verstuurd voor deze alert, in één INSERT statement"""
+    now = utcnow()
+    db.session.execute(insert_ignore(SentJob), [
+        {'alert_id': alert.id, 'job_fingerprint': job_fingerprint(job), 'sent_at': now}
+        for job in jobs
+    ])
+
+class PendingDeliveries:
+    """E-mails van een batch met de alerts en vacatures die erin staan
+    
+    Vacatures gelden pas als verstuurd als hun e-mail afgeleverd is; een
+    alert waarvan de e-mail mislukte houdt zijn vorige last_check en wordt
+    na RETRY_DELAY opnieuw gecontroleerd.
+    """
+    
+    def __init__(self):
+        self.emails = []
+        self.previous_checks = {}
+    
+    def track(self, alert):
+        """Onthoud de last_check van een alert voordat process_alert hem bijwerkt"""
+        self.previous_checks[alert.id] = alert.last_check
+    
+    def add(self, future, sections):
+        """Een e-mail in de outbox (None als opstellen mislukte) met zijn [(alert, vacatures)]"""
+        self.emails.append((future, sections))
+    
+    def alert_groups(self):
+        """De alerts per e-mail, om de tijd van de aflevering aan toe te rekenen"""
+        return [[alert for alert, _ in sections] for _, sections in self.emails]
+    
+    def confirm(self, timeout):
+        """Wacht op de aflevering; registreer afgeleverde vacatures en plan mislukte alerts opnieuw in
         
-        for alert in active_alerts:
-            print(f"\nControleren alert: {alert.search_query} in {alert.location}")
-            
-            # Controleer of de alert recent is gecontroleerd
-            if alert.last_check:
-                # Converteer last_check naar UTC als het naive is
-                if alert.last_check.tzinfo is None:
-                    last_check_utc = alert.last_check.replace(tzinfo=UTC)
+        Geeft (afgeleverd, mislukt) terug, geteld in e-mails.
+        """
+        futures = [future for future, _ in self.emails if future is not None]
+        wait(futures, timeout=timeout)
+        delivered = failed = 0
+        retry_at = utcnow() + RETRY_DELAY
+        for future, sections in self.emails:
+            if future is not None and future.done() and future.exception() is None:
+                delivered += 1
+                for alert, jobs in sections:
+                    record_sent_jobs(alert, jobs)
+                continue
+            failed += 1
+            error = future.exception() if future is not None and future.done() else "geen bevestiging"
+            logger.warning("E-mail voor %s alert(s) niet afgeleverd (%s), opnieuw over %s",
+                           len(sections), error, RETRY_DELAY)
+            for alert, _ in sections:
+                alert.last_check = self.previous_checks[alert.id]
+                alert.next_check_at = retry_at
+        self.emails = []
+        return delivered, failed
+
+def retry_later(alerts, now):
+    """Geef de claim op alerts vrij en controleer ze na RETRY_DELAY opnieuw (bijv. na een mislukte fetch)"""
+    for alert in alerts:
+        alert.next_check_at = now + RETRY_DELAY
+        alert.claimed_by = None
+        alert.lease_until = None
+
+def process_alert(alert, all_jobs, outbox, checked_at=None, digests=None, deliveries=None, interval=None):
+    """Filter de gedeelde resultaten op nieuwe vacatures voor één alert en stuur de e-mail
+    
+    `checked_at` is het moment waarop de resultaten golden (standaard nu);
+    dat wordt de nieuwe last_check van de alert. Met een `interval` (uit het
+    quotaplan) wordt de volgende controle later ingepland dan de frequentie
+    van de alert, nooit eerder. Met `digests` wordt de
+    e-mail niet direct verstuurd maar komen de nieuwe vacatures in de digest
+    van de gebruiker (zie send_digests). Met `deliveries` (PendingDeliveries)
+    worden de vacatures pas na de aflevering als verstuurd geregistreerd,
+    anders direct.
+    """
+    logger.debug("Verwerken alert %s: %s in %s", alert.id, alert.search_query, alert.location)
+    
+    if all_jobs:
+        # Filter nieuwe vacatures
+        with STAGE_SECONDS.labels('dedupe').time():
+            new_jobs = filter_new_jobs(alert, all_jobs)
+        logger.debug("Aantal nieuwe vacatures: %s", len(new_jobs))
+        
+        if new_jobs:
+            # Haal de gebruiker op via de relatie
+            user = alert.user
+            if user and user.email:
+                if deliveries is not None:
+                    deliveries.track(alert)
+                else:
+                    record_sent_jobs(alert, new_jobs)
+                if digests is not None:
+                    digests.setdefault(user.id, (user.email, []))[1].append((alert, new_jobs))
+                else:
+                    # Stuur email met de nieuwe vacatures
+                    future = send_job_alert_email(outbox, user.email, alert.search_query, alert.location, new_jobs)
+                    if deliveries is not None:
+                        deliveries.add(future, [(alert, new_jobs)])
+                    logger.debug("Email in wachtrij gezet voor %s", user.email)
+            else:
+                logger.warning("Geen geldig email adres gevonden voor alert %s", alert.id)
+    
+    # Update last_check tijd en plan de volgende controle volgens de frequentie;
+    # check_jobs commit dit per batch
+    now = checked_at or utcnow()
+    alert.last_check = now
+    alert.next_check_at = now + max(check_interval(alert.frequency), interval or timedelta(0))
+    alert.claimed_by = None
+    alert.lease_until = None
+
+def check_jobs(alert_ids=None, shard=None, profiler=None, outbox=None):
+    """Controleer alle actieve job alerts en stuur emails voor nieuwe vacatures
+    
+    Zonder `alert_ids` worden alle due alerts gecontroleerd; de scheduler
+    geeft de alerts mee die op dit moment due zijn. Alerts worden in batches
+    van WORKER_BATCH_SIZE geclaimd en gecommit, zodat meerdere workers
+    naast elkaar kunnen draaien. Met `shard` = (index, aantal) neemt deze
+    worker alleen alerts met id % aantal == index.
+    
+    Alerts met dezelfde zoekopdracht worden gegroepeerd: elke unieke
+    (zoekterm, locatie) wordt één keer per run opgehaald en het resultaat wordt
+    gedeeld met alle alerts die die zoekopdracht gebruiken, ook over batches
+    heen. Met JOB_MATCHING = 'store' worden de zoekopdrachten per batch in
+    één pass tegen de lokale job store gematcht in plaats van remote
+    opgehaald. Met NEAR_DUPLICATES worden bijna-dubbele vacatures in de
+    resultaten samengevoegd tot één vacature met alle links, ook als een
+    variant in een eerdere run al gezien is. Met QUOTA_DAILY_CALLS bepaalt
+    het quotaplan per zoekopdracht het aantal pagina's en hoe lang de alerts
+    tot hun volgende controle wachten. Met ALERT_EMAIL_MODE = 'digest'
+    krijgt elke gebruiker per batch één e-mail met de nieuwe vacatures van
+    al diens alerts. Elke batch wacht op de aflevering van zijn e-mails
+    voordat hij commit: alleen afgeleverde vacatures gelden als verstuurd, en
+    alerts waarvan de fetch of de e-mail mislukte worden na RETRY_DELAY
+    opnieuw geprobeerd. Met een `profiler` (standaard volgens PROFILE_MODE)
+    wordt de run geprofileerd en de tijd per alert gemeten. Met een `outbox`
+    (die van het worker proces) blijven de SMTP sessies tussen runs open;
+    zonder maakt de run een eigen outbox en sluit die aan het eind. Geeft
+    een samenvatting van de run terug.
+    """
+    logger.info("Start job check")
+    stats = {"alerts": 0, "searches": 0, "api_calls": 0, "api_calls_saved": 0, "commits": 0,
+             "digests": 0, "digest_duplicates": 0, "alerts_retried": 0, "deliveries_failed": 0,
+             "near_duplicates": 0}
+    profiler = profiler or create_profiler(app.config)
+    
+    with app.app_context(), profiler.run():
+        worker_id = current_worker_id()
+        batch_size = app.config['WORKER_BATCH_SIZE']
+        own_outbox = outbox is None
+        if own_outbox:
+            outbox = create_outbox(app.config)
+        mail_before = outbox.stats()
+        store_mode = app.config['JOB_MATCHING'] == 'store'
+        digest_mode = app.config['ALERT_EMAIL_MODE'] == 'digest'
+        near_duplicates = create_near_duplicate_index(app.config)
+        # Lokaal matchen kost geen API calls, dus dan geen quotaplan
+        budget = None if store_mode else get_quota_budget(app.config)
+        if budget:
+            budget.plan(active_searches)
+        if store_mode:
+            ensure_job_index()
+        results = {}
+        # Per opgehaalde zoekopdracht de alerts waarvoor zijn venster berekend is
+        fetched_for = {}
+        run_alerts = {} if store_mode else due_search_alerts(utcnow(), alert_ids, shard)
+        
+        while True:
+            batch = claim_due_alerts(
+                worker_id, utcnow(), batch_size, alert_ids, shard, app.config['ALERT_USER_LOADING'],
+                whole_users=digest_mode
+            )
+            # Na elke batch, en na de laatste (lege) claim, zonder dat de web app gescrapet hoeft te worden
+            if REGISTRY.enabled:
+                ALERT_BACKLOG.set(count_due_alerts(utcnow()))
+            if not batch:
+                break
+            logger.info("Batch van %s due alerts", len(batch))
+            groups = plan_searches(batch)
+            digests = {} if digest_mode else None
+            deliveries = PendingDeliveries()
+            # Matchen is lokaal en goedkoop; per batch opnieuw zodat elke alert zijn eigen venster krijgt.
+            # Remote opnieuw ophalen als een alert niet in het venster van de eerdere fetch zat
+            # (bijv. pas tijdens de run aan de beurt gekomen)
+            new_groups = groups if store_mode else {
+                key: alerts for key, alerts in groups.items()
+                if key not in results or any(alert.id not in fetched_for[key] for alert in alerts)
+            }
+            with STAGE_SECONDS.labels('fetch').time(), profiler.phase('fetch', new_groups.values()):
+                if store_mode:
+                    now = utcnow()
+                    results.update(match_store(groups, now))
                 else:
-                    last_check_utc = alert.last_check
+                    windows = {}
+                    for key, alerts in new_groups.items():
+                        ids = {alert.id for alert in alerts}
+                        windows[key] = alerts + [alert for alert in run_alerts.get(key, ()) if alert.id not in ids]
+                    results.update(fetch_searches(windows))
+                    fetched_for.update({key: {alert.id for alert in alerts} for key, alerts in windows.items()})
+            if near_duplicates:
+                with STAGE_SECONDS.labels('near_duplicates').time(), profiler.phase('near_duplicates', new_groups.values()):
+                    stats["near_duplicates"] += collapse_near_duplicates(near_duplicates, results, new_groups, store_mode)
+            
+            for (query, location), alerts in groups.items():
+                logger.debug("Controleren zoekopdracht: %s in %s (%s alerts)", query, location, len(alerts))
                 
-                if (datetime.now(UTC) - last_check_utc) < timedelta(hours=24):
-                    print("Alert is te recent gecontroleerd, overslaan...")
+                result = results[(query, location)]
+                if isinstance(result, Exception):
+                    logger.error("Fout bij het ophalen van zoekopdracht %s in %s: %s", query, location, result)
+                    retry_later(alerts, utcnow())
+                    stats["alerts_retried"] += len(alerts)
                     continue
+                all_jobs, api_calls = result
                 
-            try:
-                if USE_MOCK_DATA:
-                    print("Gebruik mock data in plaats van SerpApi")
-                    all_jobs = get_jobs_from_mock()
+                logger.debug("Totaal aantal gevonden vacatures: %s", len(all_jobs))
+                interval = budget.interval((query, location)) if budget else None
+                # Zonder groepering had elke alert dezelfde calls opnieuw gedaan
+                if (query, location) in new_groups:
+                    stats["searches"] += 1
+                    stats["api_calls"] += api_calls
+                    stats["api_calls_saved"] += api_calls * (len(alerts) - 1)
                 else:
-                    # SerpApi parameters
-                    location = alert.location if alert.location else "Netherlands"
-                    params = {
-                        "engine": "google_jobs",
-                        "q": f"{alert.search_query}",
-                        "location": location,
-                        "hl": "nl",
-                        "gl": "nl",
-                        "api_key": os.getenv("SERPAPI_KEY"),
-                        "num": "25",
-                        "lrad": "50",  # Zoekradius in kilometers
-                        "chips": "date_posted:today"  # Alleen vacatures van vandaag
-                    }
-                    
-                    print(f"Zoeken naar: {params['q']} in {params['location']}")
-                    print(f"API Key aanwezig: {'Ja' if os.getenv('SERPAPI_KEY') else 'Nee'}")
-                    
-                    # Verzamel resultaten van meerdere pagina's
-                    all_jobs = []
-                    next_page_token = None
-                    max_pages = 3  # Maximum aantal pagina's om te controleren
-                    max_jobs = 25  # Maximum aantal resultaten
-                    
-                    for page in range(max_pages):
-                        if next_page_token:
-                            params["next_page_token"] = next_page_token
-                        
-                        print(f"Versturen request naar SerpApi...")
-                        response = requests.get("https://serpapi.com/search", params=params)
-                        print(f"Response status code: {response.status_code}")
-                        
-                        if response.status_code != 200:
-                            print(f"Error response: {response.text}")
-                            break
-                            
-                        response.raise_for_status()
-                        data = response.json()
-                        
-                        # Debug informatie
-                        print(f"Response keys: {list(data.keys())}")
-                        
-                        if "jobs_results" in data:
-                            jobs = data["jobs_results"]
-                            print(f"Gevonden {len(jobs)} vacatures op pagina {page + 1}")
-                            all_jobs.extend(jobs)
-                            
-                            # Controleer of we genoeg resultaten hebben
-                            if len(all_jobs) >= max_jobs:
-                                all_jobs = all_jobs[:max_jobs]
-                                break
-                            
-                            # Controleer of er een volgende pagina is
-                            next_page_token = data.get("serpapi_pagination", {}).get("next_page_token")
-                            if not next_page_token:
-                                print("Geen volgende pagina beschikbaar")
-                                break
-                                
-                            # Wacht even tussen requests
-                            time.sleep(2)
-                        else:
-                            print("Geen vacatures gevonden in response")
-                            print(f"Beschikbare data: {data}")
-                            break
-                
-                print(f"Totaal aantal gevonden vacatures: {len(all_jobs)}")
-                
-                if all_jobs:
-                    # Haal de verzonden job IDs op
-                    sent_job_ids = json.loads(alert.sent_job_ids)
-                    
-                    # Filter nieuwe vacatures
-                    new_jobs = []
-                    for job in all_jobs:
-                        job_id = generate_job_id(job)
-                        if job_id not in sent_job_ids:
-                            new_jobs.append(job)
-                    
-                    print(f"Aantal nieuwe vacatures: {len(new_jobs)}")
-                    
-                    if new_jobs:
-                        # Haal de gebruiker op via de relatie
-                        user = alert.user
-                        if user and user.email:
-                            # Stuur email met de nieuwe vacatures
-                            send_job_alert_email(user.email, alert.search_query, alert.location, new_jobs)
-                            print(f"Email verzonden naar {user.email}")
-                            
-                            # Update sent_job_ids
-                            new_job_ids = [generate_job_id(job) for job in new_jobs]
-                            sent_job_ids.extend(new_job_ids)
-                            
-                            # Beperk de lijst tot 10.000 tekens
-                            if len(json.dumps(sent_job_ids)) > 10000:
-                                sent_job_ids = sent_job_ids[-100:]  # Houd de laatste 100 IDs
-                            
-                            alert.sent_job_ids = json.dumps(sent_job_ids)
-                            db.session.commit()
-                        else:
-                            print(f"Geen geldig email adres gevonden voor alert {alert.id}")
-                
-                # Update last_check tijd
-                alert.last_check = datetime.now(UTC)
-                db.session.commit()
+                    stats["api_calls_saved"] += api_calls * len(alerts)
                 
+                for alert in alerts:
+                    try:
+                        with profiler.alert(alert):
+                            if store_mode:
+                                since = alert_since(alert, now)
+                                jobs = [job for ingested_at, job in all_jobs if ingested_at >= since]
+                                process_alert(alert, jobs, outbox, checked_at=now, digests=digests,
+                                              deliveries=deliveries)
+                            else:
+                                process_alert(alert, all_jobs, outbox, digests=digests, deliveries=deliveries,
+                                              interval=interval)
+                        stats["alerts"] += 1
+                        ALERTS_PROCESSED.inc()
+                    except Exception as e:
+                        logger.error("Fout bij het controleren van alert %s: %s", alert.id, e)
+                        ALERT_ERRORS.inc()
+                        continue
+            
+            if digests:
+                with profiler.phase('digest', ([alert for alert, _ in entries] for _, entries in digests.values())):
+                    stats["digest_duplicates"] += send_digests(outbox, digests, deliveries)
+                stats["digests"] += len(digests)
+            
+            # Pas na bevestigde aflevering gelden de vacatures als verstuurd
+            with STAGE_SECONDS.labels('delivery').time(), profiler.phase('delivery', deliveries.alert_groups()):
+                _, failed = deliveries.confirm(app.config['WORKER_DELIVERY_TIMEOUT'])
+            stats["deliveries_failed"] += failed
+            
+            try:
+                with STAGE_SECONDS.labels('commit').time(), profiler.phase('commit'):
+                    db.session.commit()
+                stats["commits"] += 1
             except Exception as e:
-                print(f"Fout bij het controleren van alert {alert.id}: {str(e)}")
-                if hasattr(e, 'response'):
-                    print(f"Response body: {e.response.text}")
-                continue
+                logger.error("Fout bij het opslaan van batch: %s", e)
+                db.session.rollback()
+            # Houd de identity map klein bij grote aantallen alerts
+            db.session.expunge_all()
+        
+        history_start = utcnow() - timedelta(days=app.config['SEARCH_HISTORY_DAYS'])
+        prune_search_history(history_start)
+        if store_mode:
+            prune_jobs(history_start)
+        db.session.commit()
+        if near_duplicates:
+            near_duplicates.prune(time.time() - app.config['SEARCH_HISTORY_DAYS'] * 86400)
+            near_duplicates.close()
+        
+        # Wacht tot alle e-mails zijn afgeleverd; een gedeelde outbox houdt zijn sessies open
+        if own_outbox:
+            outbox.close()
+        else:
+            outbox.flush()
+        mail_stats = outbox.stats()
+        stats["emails_sent"] = mail_stats["sent"] - mail_before["sent"]
+        stats["emails_failed"] = mail_stats["failed"] - mail_before["failed"]
+        logger.info("E-mails verstuurd: %s, mislukt: %s (%.1f berichten/s)",
+                    stats['emails_sent'], stats['emails_failed'], mail_stats['messages_per_second'])
+    
+    logger.info("Run klaar: %s alerts, %s zoekopdrachten, %s API calls (%s bespaard door groepering), %s commits, "
+                "%s bijna-dubbele vacatures samengevoegd, %s digests (%s dubbele vacatures weggelaten), "
+                "%s alerts later opnieuw, %s e-mails niet afgeleverd",
+                stats['alerts'], stats['searches'], stats['api_calls'], stats['api_calls_saved'], stats['commits'],
+                stats['near_duplicates'], stats['digests'], stats['digest_duplicates'], stats['alerts_retried'],
+                stats['deliveries_failed'])
+    return stats
+
+def enable_sqlite_wal():
+    """Zet SQLite in WAL modus zodat meerdere worker processen naast elkaar kunnen lezen en schrijven"""
+    if db.engine.dialect.name == 'sqlite':
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql('PRAGMA journal_mode=WAL')
+
+def setup_worker(metrics_port=None):
+    """Logging en (met METRICS_ENABLED) de metrics listener van dit worker proces"""
+    logging.basicConfig(
+        level=app.config['LOG_LEVEL'],
+        format="%(asctime)s %(processName)s %(levelname)s %(name)s: %(message)s",
+    )
+    if app.config['METRICS_ENABLED']:
+        REGISTRY.enable()
+        host, port = app.config['WORKER_METRICS_HOST'], metrics_port or app.config['WORKER_METRICS_PORT']
+        start_http_server(port, host, token=app.config['METRICS_TOKEN'])
+        logger.info("Metrics op http://%s:%s/metrics", host, port)
+
+def run_worker(shard=None, once=False, metrics_port=None, overrides=None):
+    """Controleer alerts zodra ze volgens hun frequentie aan de beurt zijn
+    
+    Met `once` wordt er één run gedaan (bijvoorbeeld vanuit cron). Elk
+    worker proces krijgt zijn eigen metrics poort. `overrides` overschrijft
+    instellingen uit de config (vanaf de command line).
+    """
+    app.config.update(overrides or {})
+    setup_worker(metrics_port)
+    profiler = create_profiler(app.config)
+    with app.app_context():
+        enable_sqlite_wal()
+        if once:
+            return check_jobs(shard=shard, profiler=profiler)
+        scheduler = AlertScheduler(
+            JobAlert, poll_interval=app.config['WORKER_POLL_INTERVAL'], shard=shard,
+            sync_margin=app.config['WORKER_SYNC_MARGIN'], full_sync_interval=app.config['WORKER_FULL_SYNC_INTERVAL']
+        )
+        # Eén outbox voor alle runs van dit proces, zodat de SMTP sessies tussen runs open blijven
+        outbox = create_outbox(app.config)
+        logger.info("Worker %s gestart, wachten op alerts die aan de beurt zijn", current_worker_id())
+        try:
+            scheduler.run(lambda alert_ids: check_jobs(alert_ids, shard, profiler, outbox))
+        finally:
+            outbox.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Controleer job alerts en verstuur e-mails met nieuwe vacatures")
+    parser.add_argument('--workers', type=int, default=1, help="aantal worker processen")
+    parser.add_argument('--shard-mode', choices=['lease', 'static'], default='lease',
+                        help="lease: alle workers claimen uit alle alerts; static: worker k neemt id %% N == k")
+    parser.add_argument('--once', action='store_true', help="één run doen en stoppen")
+    parser.add_argument('--profile', nargs='?', const='stacks', choices=['stacks', 'cprofile'],
+                        help="profileer elke run: collapsed stacks (standaard) of cProfile stats")
+    parser.add_argument('--profile-dir', help="map voor de profielen (standaard PROFILE_DIR)")
+    parser.add_argument('--profile-sample-rate', type=float, help="fractie van de runs die geprofileerd wordt")
+    parser.add_argument('--profile-interval', type=float, help="sample interval van de stack sampler in ms")
+    parser.add_argument('--profile-alert-files', type=int, help="schrijf ook stacks van de N traagste alerts weg")
+    parser.add_argument('--profile-all-threads', action='store_true', default=None,
+                        help="bemonster ook SMTP en fetch threads (duurder)")
+    parser.add_argument('--cache-bypass', action='store_true', default=None,
+                        help="lees SerpApi responses niet uit de cache (nieuwe responses worden wel opgeslagen)")
+    parser.add_argument('--record', metavar='MAP', help="archiveer alle ruwe SerpApi responses in deze map")
+    parser.add_argument('--replay', metavar='ARCHIEF',
+                        help="speel SerpApi responses terug uit een archief (map, segment of glob) in plaats van het netwerk")
+    args = parser.parse_args()
+    
+    overrides = {
+        key: value for key, value in {
+            'PROFILE_MODE': args.profile,
+            'PROFILE_DIR': args.profile_dir,
+            'PROFILE_SAMPLE_RATE': args.profile_sample_rate,
+            'PROFILE_INTERVAL_MS': args.profile_interval,
+            'PROFILE_ALERT_FILES': args.profile_alert_files,
+            'PROFILE_ALL_THREADS': args.profile_all_threads,
+            'SERPAPI_CACHE_BYPASS': args.cache_bypass,
+            'SERPAPI_ARCHIVE_DIR': args.record,
+            'SERPAPI_REPLAY': args.replay,
+        }.items() if value is not None
+    }
+    if args.replay:
+        # Terugspelen gaat altijd via de zoekopdrachten van de SerpApi bron
+        overrides.update(JOB_SOURCE='serpapi', JOB_MATCHING='search')
+    if overrides.get('SERPAPI_REPLAY', app.config['SERPAPI_REPLAY']):
+        try:
+            check_replay_target({**app.config, **overrides})
+        except ValueError as e:
+            parser.error(str(e))
+    
+    if args.workers == 1:
+        run_worker(once=args.once, overrides=overrides)
+        return
+    
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import get_context
+    
+    shards = [(index, args.workers) if args.shard_mode == 'static' else None for index in range(args.workers)]
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=get_context('spawn')) as pool:
+        base_port = app.config['WORKER_METRICS_PORT']
+        futures = [
+            pool.submit(run_worker, shard, args.once, base_port + index, overrides)
+            for index, shard in enumerate(shards)
+        ]
+        for future in futures:
+            future.result()
 
 if __name__ == "__main__":
-    while True:
-        check_jobs()
-        print("\nWachten op volgende check...")
-        time.sleep(300)  # Wacht 5 minuten
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -9,5 +9,6 @@ if path not in sys.path:
 # Stel de environment variabelen in
 os.environ['FLASK_ENV'] = 'production'
 
-# Importeer de Flask app
-from app import app as application 
\ No newline at end of file
+# Maak de Flask app
+from app import create_app
+application = create_app() 
\ No newline at end of file